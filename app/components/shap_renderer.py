@@ -2,7 +2,6 @@
 
 from typing import Dict, Any, Optional
 import streamlit as st
-import shap
 import streamlit.components.v1 as components
 
 
@@ -15,6 +14,7 @@ class SHAPRenderer:
 
     def render(self, plot: Any, height: Optional[int] = None) -> None:
         """Renderiza un gráfico SHAP adaptado al tema actual."""
+        import shap
 
         bg_color = (
             self.theme_config["dark_bg"] if st.context.theme.type == "dark" else self.theme_config["light_bg"]
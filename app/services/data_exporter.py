@@ -8,11 +8,11 @@ from typing import Dict, Optional, Tuple
 import pandas as pd
 import numpy as np
 import joblib
-import shap
 
 # Add parent directory to path for imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
-from src import data_processing
+
+# src.data_processing y shap se importan al exportar, no al cargar la página
 
 
 class DataExporter:
@@ -43,35 +43,23 @@ class DataExporter:
             Tuple con (éxito, mensaje)
         """
         try:
+            from src import data_processing
+
             # Create exports directory
             os.makedirs(self.exports_dir, exist_ok=True)
 
-            # Load data
-            train, val, test, tscv = data_processing.prepare_full_pipeline()
+            # Load data (con las mismas ventanas y features del modelo: sólo se calculan
+            # esas columnas y se reutilizan las etapas cacheadas)
             rolling_windows = joblib.load(os.path.join(self.models_dir, "rolling_windows.pkl"))
+            features_path = os.path.join(self.models_dir, "features.pkl")
+            if os.path.exists(features_path):
+                features = joblib.load(features_path)
+            else:
+                features = data_processing.get_model_features(rolling_windows)
 
-            # Define features
-            features = [
-                "shop_cluster",
-                "item_category_id",
-                "item_price_log",
-                "item_cnt_lag_1_log",
-                "item_cnt_lag_2_log",
-                "item_cnt_lag_3_log",
-                "price_rel_category",
-                "price_rel_category_log",
-                "price_discount",
-                "is_new_price",
-                "price_change_pct",
-                "price_change_2m_pct",
-                "revenue_potential_log",
-                "price_demand_elasticity",
-            ]
-
-            # Add rolling window features
-            for window in rolling_windows:
-                features.append(f"rolling_mean_{window}")
-                features.append(f"rolling_std_{window}")
+            train, val, test, tscv = data_processing.prepare_full_pipeline(
+                rolling_windows=rolling_windows, cache_stages=True, features=features
+            )
 
             target = "target_log"
             X_val = val[features]
@@ -84,6 +72,7 @@ class DataExporter:
                 "features": self._export_features(X_val, y_val, val),
                 "shap": self._export_shap(X_val, y_val),
                 "segments": self._export_segments(val),
+                "profile": self._export_profile(),
             }
 
             success_count = sum(1 for v in stats.values() if v)
@@ -111,6 +100,8 @@ class DataExporter:
                 for item in metrics_list:
                     if "split" not in item:
                         item["split"] = "val"
+                    # train_models registra train_time (s de pared del fit)
+                    item["train_time_s"] = item.pop("train_time", item.get("train_time_s"))
                     if "model_size_mb" not in item:
                         item["model_size_mb"] = None
             elif isinstance(metrics_data, dict):
@@ -129,9 +120,11 @@ class DataExporter:
 
             metrics_df = pd.DataFrame(metrics_list)
 
-            # Calculate model sizes
+            # Calculate model sizes (si train_models no registró el tamaño del artefacto)
             for idx, row in metrics_df.iterrows():
                 model_name = row["model"]
+                if pd.notna(row["model_size_mb"]):
+                    continue
 
                 if model_name in self.model_file_map:
                     model_file = os.path.join(self.models_dir, self.model_file_map[model_name])
@@ -152,6 +145,31 @@ class DataExporter:
             print(f"Error exporting metrics: {e}")
             return False
 
+    def _export_profile(self) -> bool:
+        """Exporta el perfil de tiempos y memoria de la última corrida (run_profile.json)."""
+        try:
+            profile_path = os.path.join(self.models_dir, "run_profile.json")
+            if not os.path.exists(profile_path):
+                return False
+
+            with open(profile_path, "r") as f:
+                profile = json.load(f)
+
+            profile_df = pd.DataFrame(profile["stages"])
+            # "fit:<modelo>" / "predict:<modelo>"; el resto son etapas de datos
+            parts = profile_df["stage"].str.split(":", n=1, expand=True)
+            has_model = parts[1].notna() if parts.shape[1] > 1 else False
+            profile_df["scope"] = np.where(has_model, parts[0], "pipeline")
+            profile_df["model"] = parts[1] if parts.shape[1] > 1 else None
+
+            output_path = os.path.join(self.exports_dir, "profile_stages.csv")
+            profile_df.to_csv(output_path, index=False)
+            return True
+
+        except Exception as e:
+            print(f"Error exporting profile: {e}")
+            return False
+
     def _export_predictions(self, X_val: pd.DataFrame, y_val: pd.Series, val: pd.DataFrame) -> bool:
         """Exporta predicciones con residuales."""
         try:
@@ -225,6 +243,8 @@ class DataExporter:
     def _export_shap(self, X_val: pd.DataFrame, y_val: pd.Series) -> bool:
         """Exporta análisis SHAP para RandomForest y XGBoost."""
         try:
+            import shap
+
             # Models to generate SHAP for
             models_for_shap = []
 
@@ -8,6 +8,7 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
+from plotly.subplots import make_subplots
 from typing import Dict, List, Tuple, Optional
 import json
 
@@ -28,6 +29,7 @@ class ModelAnalyzer:
         self.features = None
         self.shap_summary = {}
         self.segments_map = None
+        self.profile_df = None
 
         self._load_data()
 
@@ -60,6 +62,11 @@ class ModelAnalyzer:
         if os.path.exists(segments_path):
             self.segments_map = pd.read_csv(segments_path)
 
+        # Load training run profile (stage timings and memory)
+        profile_path = os.path.join(self.exports_dir, "profile_stages.csv")
+        if os.path.exists(profile_path):
+            self.profile_df = pd.read_csv(profile_path)
+
     def get_metrics_comparison(self) -> pd.DataFrame:
         """
         Get metrics comparison table.
@@ -107,6 +114,101 @@ class ModelAnalyzer:
 
         return fig
 
+    def plot_model_costs(self) -> go.Figure:
+        """
+        Create bar charts of training time and inference latency per model.
+
+        Returns:
+            Plotly Figure object (empty if metrics have no profile columns)
+        """
+        columns = ["train_time_s", "inference_ms_per_1k"]
+        if self.metrics_df is None or not set(columns).issubset(self.metrics_df.columns):
+            return go.Figure()
+
+        df = self.metrics_df.dropna(subset=columns, how="all").sort_values("train_time_s")
+        if df.empty:
+            return go.Figure()
+
+        fig = make_subplots(
+            rows=1,
+            cols=2,
+            subplot_titles=(
+                "Tiempo de Entrenamiento (s)",
+                "Latencia de Inferencia (ms / 1k filas)",
+            ),
+        )
+        fig.add_trace(
+            go.Bar(
+                x=df["model"],
+                y=df["train_time_s"],
+                marker_color="#3498db",
+                text=df["train_time_s"].round(2),
+                textposition="outside",
+                name="Entrenamiento",
+            ),
+            row=1,
+            col=1,
+        )
+        fig.add_trace(
+            go.Bar(
+                x=df["model"],
+                y=df["inference_ms_per_1k"],
+                marker_color="#e67e22",
+                text=df["inference_ms_per_1k"].round(2),
+                textposition="outside",
+                name="Inferencia",
+            ),
+            row=1,
+            col=2,
+        )
+
+        fig.update_layout(title="Costo de Entrenamiento e Inferencia", showlegend=False, height=450)
+
+        return fig
+
+    def plot_stage_profile(self) -> go.Figure:
+        """
+        Create horizontal bar chart of wall and CPU time per training run stage.
+
+        Returns:
+            Plotly Figure object (empty if no run profile was exported)
+        """
+        if self.profile_df is None or self.profile_df.empty:
+            return go.Figure()
+
+        df = self.profile_df.iloc[::-1]
+        # rss_delta_mb no existe en perfiles exportados por versiones anteriores
+        delta = df.get("rss_delta_mb", pd.Series(0.0, index=df.index)).fillna(0)
+        hover = [
+            f"Filas: {rows:,.0f}<br>Filas/s: {rps:,.0f}<br>Pico RSS: {rss:,.0f} MB (+{inc:,.0f} MB)"
+            for rows, rps, rss, inc in zip(
+                df["rows"].fillna(0), df["rows_per_s"].fillna(0), df["peak_rss_mb"].fillna(0), delta
+            )
+        ]
+
+        fig = go.Figure()
+        for column, label, color in [("wall_s", "Pared", "#3498db"), ("cpu_s", "CPU", "#95a5a6")]:
+            fig.add_trace(
+                go.Bar(
+                    y=df["stage"],
+                    x=df[column],
+                    orientation="h",
+                    name=label,
+                    marker_color=color,
+                    hovertext=hover,
+                )
+            )
+
+        fig.update_layout(
+            title="Perfil de la Corrida de Entrenamiento por Etapa",
+            xaxis_title="Segundos",
+            yaxis_title="Etapa",
+            barmode="group",
+            height=max(400, 28 * len(df)),
+        )
+
+        return fig
+
     def plot_residuals_distribution(self, model_name: str = "randomforest") -> go.Figure:
         """
         Create histogram with KDE of residuals.
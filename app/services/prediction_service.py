@@ -1,14 +1,17 @@
 """Servicio para predicciones de demanda vía API REST."""
 
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Dict, Any, Optional
 import pandas as pd
 import numpy as np
-import shap
 import httpx
 import os
 import joblib
 import streamlit as st
 
+# shap se importa al calcular la explicación (no al cargar la página)
+if TYPE_CHECKING:
+    import shap
+
 
 class PredictionService:
     """Servicio para predicciones de demanda usando API REST exclusivamente."""
@@ -49,7 +52,7 @@ class PredictionService:
             st.error(f"❌ Error inesperado: {e}", icon=":material/error:")
             st.stop()
 
-    def calculate_shap_values(self, input_data: Dict) -> shap.Explanation:
+    def calculate_shap_values(self, input_data: Dict) -> "shap.Explanation":
         """Calcula los valores SHAP para explicar la predicción.
 
         Retorna un objeto shap.Explanation completo que permite visualizaciones
@@ -182,6 +185,8 @@ class PredictionService:
                         model_to_explain = self.shap_model
 
             # Ahora SÍ usar TreeExplainer con el modelo apropiado
+            import shap
+
             explainer = shap.TreeExplainer(model_to_explain)
             shap_explanation = explainer(feat_df)
         except Exception as e:
@@ -430,12 +435,22 @@ class PredictionService:
         except Exception as e:
             return False, f"Error inesperado: {str(e)}"
 
-    def retrain_model(self, rolling_windows: list, use_balancing: bool = False) -> tuple[bool, str]:
+    def retrain_model(
+        self,
+        rolling_windows: list,
+        use_balancing: bool = False,
+        use_window_bank: bool = False,
+        balance_mode: str = "smote",
+        models: Optional[list] = None,
+    ) -> tuple[bool, str]:
         """Solicita a la API reentrenar el modelo con nuevas configuraciones.
 
         Args:
             rolling_windows: Lista de ventanas rolling (ej: [3, 6])
             use_balancing: Si se debe aplicar SMOTE para balanceo de clases
+            use_window_bank: Seleccionar las ventanas desde el banco precalculado
+            balance_mode: "smote" (filas sintéticas) o "weights" (pesos por muestra)
+            models: Modelos a reentrenar (ej: ["stacking", "xgb_shap"]; None = todos)
 
         Returns:
             tuple: (success, message)
@@ -444,7 +459,11 @@ class PredictionService:
             payload = {
                 "rolling_windows": rolling_windows,
                 "use_balancing": use_balancing,
+                "use_window_bank": use_window_bank,
+                "balance_mode": balance_mode,
             }
+            if models is not None:
+                payload["models"] = models
 
             with httpx.Client(timeout=600.0) as client:  # 10 minutos timeout
                 response = client.post(f"{self.api_url}/retrain", json=payload)
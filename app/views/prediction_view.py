@@ -1,9 +1,8 @@
 """Vista de predicción de demanda."""
 
-from typing import Dict, Any, Literal, Optional
+from typing import TYPE_CHECKING, Dict, Any, Literal, Optional
 import pandas as pd
 import streamlit as st
-import shap
 import numpy as np
 
 from app.ui_components import Table
@@ -12,6 +11,9 @@ from ..components import ChartBuilder, SHAPRenderer, DataFrameBuilder
 from ..services import PredictionService, TrendAnalyzer
 from ..config import CHART_COLORS
 
+if TYPE_CHECKING:
+    import shap
+
 
 class PredictionView:
     """Vista de predicción de demanda."""
@@ -114,7 +116,7 @@ class PredictionView:
         self,
         prediction: float,
         last_value: float,
-        shap_explanation: Optional[shap.Explanation] = None,
+        shap_explanation: Optional["shap.Explanation"] = None,
     ) -> None:
         """Renderiza la sección de KPIs."""
         st.markdown("#### Proyección")
@@ -142,7 +144,7 @@ class PredictionView:
         if shap_explanation is not None:
             self._render_textual_interpretation(shap_explanation)
 
-    def _calculate_shap_explanation(self, input_data: Dict[str, Any]) -> Optional[shap.Explanation]:
+    def _calculate_shap_explanation(self, input_data: Dict[str, Any]) -> Optional["shap.Explanation"]:
         """Calcula el objeto SHAP Explanation con todas las features necesarias."""
         from ..state_manager import SessionStateManager
 
@@ -178,7 +180,7 @@ class PredictionView:
             return None
 
     def _render_shap_section(
-        self, input_data: Dict[str, Any], shap_explanation: Optional[shap.Explanation] = None
+        self, input_data: Dict[str, Any], shap_explanation: Optional["shap.Explanation"] = None
     ) -> None:
         """Renderiza la sección de análisis SHAP."""
         from ..state_manager import SessionStateManager
@@ -208,6 +210,7 @@ class PredictionView:
             st.markdown("**:material/waterfall_chart: Análisis de Contribución por Variable**")
 
             import matplotlib.pyplot as plt
+            import shap
             from PIL import Image
             
             # Aumentar límite de PIL para imágenes grandes generadas por SHAP
@@ -344,7 +347,7 @@ class PredictionView:
 
         st.caption(info_text)
 
-    def _render_textual_interpretation(self, explanation: shap.Explanation) -> None:
+    def _render_textual_interpretation(self, explanation: "shap.Explanation") -> None:
         """Genera una interpretación en lenguaje natural de los valores SHAP.
 
         Analiza las contribuciones más significativas y las traduce a insights
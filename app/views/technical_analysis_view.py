@@ -190,6 +190,12 @@ class TechnicalAnalysisView:
                 format_dict["train_time_s"] = "{:.2f}"
             if "model_size_mb" in metrics_df.columns:
                 format_dict["model_size_mb"] = "{:.2f}"
+            for col in ["train_cpu_s", "inference_ms_per_1k"]:
+                if col in metrics_df.columns:
+                    format_dict[col] = "{:.2f}"
+            for col in ["train_rows_per_s", "peak_rss_mb"]:
+                if col in metrics_df.columns:
+                    format_dict[col] = "{:,.0f}"
 
             styled_df = metrics_df.style.format(format_dict)
 
@@ -214,12 +220,18 @@ class TechnicalAnalysisView:
             # Optional columns
             if "train_time_s" in best_model.index and not pd.isna(best_model["train_time_s"]):
                 st.metric("Tiempo (s)", f"{best_model['train_time_s']:.2f}")
+            if "inference_ms_per_1k" in best_model.index and not pd.isna(
+                best_model["inference_ms_per_1k"]
+            ):
+                st.metric("Inferencia (ms / 1k filas)", f"{best_model['inference_ms_per_1k']:.2f}")
 
         # RMSE comparison chart
         st.markdown("**📈 Comparación Visual de RMSE**")
         fig_metrics = self.analyzer.plot_metrics_comparison()
         st.plotly_chart(fig_metrics, use_container_width=True)
 
+        self._render_run_profile()
+
         # Interpretation
         st.info(
             f"""
@@ -231,6 +243,28 @@ class TechnicalAnalysisView:
         """
         )
 
+    def _render_run_profile(self) -> None:
+        """Renderiza el perfil de tiempos y memoria de la última corrida de entrenamiento."""
+        st.markdown("**⏱️ Perfil de Entrenamiento**")
+
+        if (
+            "train_time_s" not in self.analyzer.metrics_df.columns
+            or self.analyzer.metrics_df["train_time_s"].isna().all()
+        ):
+            st.caption(
+                "Sin perfil de entrenamiento: reentrena los modelos y vuelve a exportar los datos."
+            )
+            return
+
+        st.plotly_chart(self.analyzer.plot_model_costs(), use_container_width=True)
+
+        if self.analyzer.profile_df is not None:
+            st.plotly_chart(self.analyzer.plot_stage_profile(), use_container_width=True)
+            st.caption(
+                "Tiempo de pared y de CPU por etapa del pipeline de datos y por fit / predicción de cada modelo. "
+                "El pico de RSS es el acumulado del proceso que ejecutó la etapa."
+            )
+
     def _render_error_distribution(self, model_name: str) -> None:
         """
         Renderiza distribución de errores.
@@ -0,0 +1,189 @@
+"""
+Benchmarks de los motores vectorizados de src/data_processing.py.
+
+Compara cada motor contra la implementación original basada en
+callbacks de pandas sobre un panel mensual sintético.
+
+Uso:
+    python -m benchmarks.bench_features [--shops 20] [--items 2000] [--months 34]
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.data_processing import (
+    compute_lag_features,
+    compute_price_rolling_max,
+    compute_rolling_stats,
+    feature_engineering,
+    group_start_positions,
+)
+
+BENCH_WINDOWS = [3, 6]
+BENCH_LAGS = [1, 2, 3]
+
+
+def make_monthly_panel(
+    n_shops: int, n_items: int, n_months: int, density: float = 0.3, seed: int = 42
+) -> pd.DataFrame:
+    """Genera ventas mensuales sintéticas (con meses faltantes) por tienda e item."""
+    rng = np.random.default_rng(seed)
+    n_rows = int(n_shops * n_items * n_months * density)
+
+    panel = pd.DataFrame(
+        {
+            "date_block_num": rng.integers(0, n_months, n_rows).astype(np.int16),
+            "shop_id": rng.integers(0, n_shops, n_rows).astype(np.int16),
+            "item_id": rng.integers(0, n_items, n_rows).astype(np.int16),
+        }
+    ).drop_duplicates()
+    panel["item_cnt_day"] = rng.poisson(3, len(panel)).clip(0, 20).astype(np.float32)
+    panel["item_price"] = rng.uniform(50, 5000, len(panel)).astype(np.float32)
+    return panel.sort_values(["date_block_num", "shop_id", "item_id"]).reset_index(drop=True)
+
+
+def _time(func: Callable[[], object], repeat: int = 3) -> float:
+    """Mejor tiempo (segundos) de `repeat` ejecuciones."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def rolling_reference(df: pd.DataFrame, windows: List[int]) -> pd.DataFrame:
+    """Implementación original: un callback de pandas por grupo y ventana."""
+    df = df.sort_values(["shop_id", "item_id", "date_block_num"])
+    for window in windows:
+        grouped = df.groupby(["shop_id", "item_id"])["item_cnt_day"]
+        df[f"rolling_mean_{window}"] = grouped.transform(
+            lambda x: x.rolling(window=window, min_periods=1).mean()
+        )
+        df[f"rolling_std_{window}"] = grouped.transform(
+            lambda x: x.rolling(window=window, min_periods=1).std()
+        )
+    return df
+
+
+def rolling_vectorized(df: pd.DataFrame, windows: List[int]) -> pd.DataFrame:
+    """Motor vectorizado de compute_rolling_stats."""
+    df = df.sort_values(["shop_id", "item_id", "date_block_num"])
+    group_start = group_start_positions(df, ["shop_id", "item_id"])
+    for window, (mean, std) in compute_rolling_stats(
+        df["item_cnt_day"].to_numpy(), group_start, windows
+    ).items():
+        df[f"rolling_mean_{window}"] = mean
+        df[f"rolling_std_{window}"] = std
+    return df
+
+
+def bench_rolling(panel: pd.DataFrame) -> Dict[str, float]:
+    """Rolling mean/std: callbacks por grupo vs sumas acumuladas."""
+    return {
+        "reference": _time(lambda: rolling_reference(panel, BENCH_WINDOWS), repeat=1),
+        "vectorized": _time(lambda: rolling_vectorized(panel, BENCH_WINDOWS)),
+    }
+
+
+def lags_reference(df: pd.DataFrame, lags: List[int]) -> pd.DataFrame:
+    """Implementación original: un self-merge por lag y columna."""
+    keys = ["date_block_num", "shop_id", "item_id"]
+    data = df.copy()
+    for col, prefix in [("item_cnt_day", "item_cnt"), ("item_price", "item_price")]:
+        for lag in lags:
+            shifted = df[keys + [col]].copy()
+            shifted.columns = keys + [f"{prefix}_lag_{lag}"]
+            shifted["date_block_num"] += lag
+            data = data.merge(shifted, on=keys, how="left")
+    return data
+
+
+def lags_vectorized(df: pd.DataFrame, lags: List[int]) -> pd.DataFrame:
+    """Motor de compute_lag_features (una búsqueda por lag sobre claves ordenadas)."""
+    data = df.sort_values(["shop_id", "item_id", "date_block_num"]).reset_index(drop=True)
+    group_start = group_start_positions(data, ["shop_id", "item_id"])
+    lagged = compute_lag_features(data, {"item_cnt_day": lags, "item_price": lags}, group_start)
+    for name, values in lagged.items():
+        data[name] = values
+    return data
+
+
+def bench_lags(panel: pd.DataFrame) -> Dict[str, float]:
+    """Lags de ventas y precio: self-merges vs búsqueda sobre clave compuesta."""
+    return {
+        "reference": _time(lambda: lags_reference(panel, BENCH_LAGS)),
+        "vectorized": _time(lambda: lags_vectorized(panel, BENCH_LAGS)),
+    }
+
+
+def bench_price_max(panel: pd.DataFrame) -> Dict[str, float]:
+    """Máximo histórico de precio: expanding().max() por item vs cummax agrupado."""
+
+    def reference() -> pd.Series:
+        data = panel.sort_values(["item_id", "date_block_num"])
+        return data.groupby("item_id")["item_price"].transform(lambda x: x.expanding().max())
+
+    return {
+        "reference": _time(reference, repeat=1),
+        "vectorized": _time(lambda: compute_price_rolling_max(panel)),
+    }
+
+
+def bench_parallel_features(panel: pd.DataFrame) -> Dict[str, float]:
+    """feature_engineering completo: un proceso vs shards por tienda en todos los núcleos."""
+    items = pd.DataFrame({"item_id": np.arange(panel["item_id"].max() + 1)})
+    items["item_category_id"] = items["item_id"] % 40
+    clusters = pd.DataFrame({"shop_id": np.arange(panel["shop_id"].max() + 1)})
+    clusters["shop_cluster"] = clusters["shop_id"] % 3
+
+    def run(n_jobs: int) -> pd.DataFrame:
+        return feature_engineering(
+            panel,
+            items,
+            clusters,
+            rolling_windows=BENCH_WINDOWS,
+            monthly_aggregated=True,
+            n_jobs=n_jobs,
+        )
+
+    return {
+        "reference": _time(lambda: run(1), repeat=1),
+        "vectorized": _time(lambda: run(-1), repeat=1),
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[pd.DataFrame], Dict[str, float]]] = {
+    "rolling_windows": bench_rolling,
+    "lags": bench_lags,
+    "price_rolling_max": bench_price_max,
+    "parallel_features": bench_parallel_features,
+}
+
+
+def main() -> None:
+    """Ejecuta todos los benchmarks e imprime la tabla de resultados."""
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline de features")
+    parser.add_argument("--shops", type=int, default=20)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--months", type=int, default=34)
+    args = parser.parse_args()
+
+    panel = make_monthly_panel(args.shops, args.items, args.months)
+    print(f"📊 Panel sintético: {len(panel):,} filas ({args.shops} tiendas × {args.items} items)")
+    print(f"{'benchmark':20s} {'referencia (s)':>15s} {'vectorizado (s)':>16s} {'speedup':>9s}")
+
+    for name, bench in BENCHMARKS.items():
+        result = bench(panel)
+        speedup = result["reference"] / max(result["vectorized"], 1e-9)
+        print(
+            f"{name:20s} {result['reference']:15.3f} {result['vectorized']:16.3f} {speedup:8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark de memoria de feature_engineering: modo normal vs low_memory.
+
+Cada modo corre en un proceso nuevo para que el pico de RSS de uno no
+contamine al otro. Se reporta el pico adicional durante feature_engineering
+(pico durante la etapa − RSS al empezar, ver sample_peak_rss) sobre un panel del tamaño de Kaggle
+(~1.6M filas mensuales).
+
+Uso:
+    python -m benchmarks.bench_memory [--shops 60] [--items 22000] [--months 34]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_features import make_monthly_panel
+from src.data_processing import feature_engineering, sample_peak_rss
+
+MODES = {"normal": False, "low_memory": True}
+
+
+def run_mode(low_memory: bool, n_shops: int, n_items: int, n_months: int) -> Dict[str, float]:
+    """Pico adicional de RSS (MB) y tamaño del resultado para un modo."""
+    panel = make_monthly_panel(n_shops, n_items, n_months, density=0.04)
+    items = pd.DataFrame({"item_id": np.arange(n_items, dtype=np.int16)})
+    items["item_category_id"] = (items["item_id"] % 84).astype(np.int16)
+    clusters = pd.DataFrame({"shop_id": np.arange(n_shops, dtype=np.int16)})
+    clusters["shop_cluster"] = clusters["shop_id"] % 3
+
+    with sample_peak_rss() as memory:
+        result = feature_engineering(
+            panel, items, clusters, monthly_aggregated=True, low_memory=low_memory
+        )
+    return {
+        "rows": len(result),
+        "peak_delta_mb": memory["delta_mb"],
+        "result_mb": result.memory_usage(deep=True).sum() / 1024**2,
+    }
+
+
+def main() -> None:
+    """Ejecuta ambos modos en subprocesos e imprime la comparación."""
+    parser = argparse.ArgumentParser(description="Benchmark de memoria del feature engineering")
+    parser.add_argument("--shops", type=int, default=60)
+    parser.add_argument("--items", type=int, default=22000)
+    parser.add_argument("--months", type=int, default=34)
+    parser.add_argument("--mode", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        result = run_mode(MODES[args.mode], args.shops, args.items, args.months)
+        print("RESULT " + json.dumps(result))
+        return
+
+    results = {}
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", "--mode", mode]
+            + ["--shops", str(args.shops), "--items", str(args.items)]
+            + ["--months", str(args.months)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        line = next(l for l in output.splitlines() if l.startswith("RESULT "))
+        results[mode] = json.loads(line[len("RESULT ") :])
+
+    print(f"📊 Panel sintético: {results['normal']['rows']:,} filas")
+    print(f"{'modo':12s} {'pico extra (MB)':>16s} {'resultado (MB)':>15s}")
+    for mode, result in results.items():
+        print(f"{mode:12s} {result['peak_delta_mb']:16.0f} {result['result_mb']:15.0f}")
+
+    ratio = results["low_memory"]["peak_delta_mb"] / max(results["normal"]["peak_delta_mb"], 1e-9)
+    print(f"low_memory usa el {ratio:.0%} del pico del modo normal")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,23 @@ Módulo de procesamiento de datos y entrenamiento del modelo.
 
 Este módulo contiene:
 - data_processing: Pipeline de ETL y feature engineering
+- pipeline: Ejecución por etapas con caché en disco
 - train: Entrenamiento del modelo ensemble
 - inference: Carga del modelo y predicciones
 """
 
-from src import data_processing
-from src import inference
-from src import train
+import importlib
 
 __all__ = [
     "data_processing",
     "inference",
+    "pipeline",
     "train",
 ]
+
+
+def __getattr__(name: str):
+    """Importa los submódulos al primer acceso (`src.train` carga TensorFlow)."""
+    if name in __all__:
+        return importlib.import_module(f"src.{name}")
+    raise AttributeError(f"module 'src' has no attribute '{name}'")
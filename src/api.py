@@ -8,7 +8,7 @@ de Machine Learning para realizar predicciones de demanda.
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, create_model
-from typing import Dict, Optional, List
+from typing import Dict, Literal, Optional, List
 import joblib
 import numpy as np
 import pandas as pd
@@ -28,6 +28,7 @@ class ModelState:
     features: Optional[List[str]] = None
     scaler = None
     category_prices: Optional[Dict] = None
+    item_price_max: Optional[Dict] = None
     metrics: Optional[List[Dict]] = None
     rolling_windows: Optional[List[int]] = None
     PredictionInputDynamic: Optional[type] = None  # Schema dinámico
@@ -50,6 +51,14 @@ def create_prediction_input_schema(rolling_windows: List[int]) -> type[BaseModel
         "item_cnt_lag_1": (float, Field(..., ge=0, description="Ventas del mes anterior")),
         "item_cnt_lag_2": (float, Field(..., ge=0, description="Ventas de hace 2 meses")),
         "item_cnt_lag_3": (float, Field(..., ge=0, description="Ventas de hace 3 meses")),
+        "item_id": (
+            Optional[int],
+            Field(None, ge=0, description="ID del producto (usa su máximo histórico de precio)"),
+        ),
+        "item_price_lag_1": (
+            Optional[float],
+            Field(None, gt=0, description="Precio del mes anterior"),
+        ),
     }
 
     # Generar campos dinámicos para cada ventana rolling
@@ -109,6 +118,54 @@ class RetrainRequest(BaseModel):
     use_balancing: bool = Field(
         default=False, description="Si se debe aplicar balanceo de clases con SMOTE"
     )
+    balance_mode: Literal["smote", "weights"] = Field(
+        default="smote",
+        description="Balanceo con SMOTE (filas sintéticas) o con pesos por muestra (más rápido)",
+    )
+    use_window_bank: bool = Field(
+        default=False,
+        description="Seleccionar las ventanas desde el banco precalculado (ventanas 2-12)",
+    )
+    use_tuned_hyperparams: bool = Field(
+        default=False,
+        description="Usar los hiperparámetros de exports/hyperparams_*.json (pipenv run tune)",
+    )
+    models: Optional[
+        List[Literal["randomforest", "xgboost", "mlp", "lstm", "stacking", "xgb_shap"]]
+    ] = Field(
+        default=None,
+        min_length=1,
+        description=(
+            "Modelos a reentrenar (None = todos). Con ['stacking', 'xgb_shap'] se refrescan "
+            "sólo los modelos de producción, sin TensorFlow; el resto conserva sus artefactos, "
+            "así que rolling_windows debe ser el de la corrida anterior (si no, error 400)"
+        ),
+        example=["stacking", "xgb_shap"],
+    )
+    resume: bool = Field(
+        default=False,
+        description="Reanudar el reentrenamiento interrumpido con la misma configuración",
+    )
+    cache_stages: bool = Field(
+        default=False,
+        description=(
+            "Cachear en disco las etapas del pipeline de datos y las predicciones OOF del "
+            "Stacking (data/pipeline_cache/, data/oof_cache/)"
+        ),
+    )
+    lazy_features: bool = Field(
+        default=False, description="Calcular sólo las features que usan los modelos"
+    )
+    n_jobs: int = Field(
+        default=1,
+        ge=-1,
+        description="Procesos para entrenar los modelos en paralelo (-1 = todos los núcleos)",
+    )
+    feature_n_jobs: int = Field(
+        default=1,
+        ge=-1,
+        description="Procesos para el feature engineering por tienda (-1 = todos los núcleos)",
+    )
 
     @classmethod
     def model_validate(cls, value):
@@ -229,6 +286,12 @@ def load_models():
             f"✅ Precios de categorías cargados: {len(ModelState.category_prices) if ModelState.category_prices else 0}"
         )
 
+        # Cargar máximo histórico de precios por item (opcional, modelos antiguos no lo tienen)
+        price_max_path = os.path.join(MODELS_DIR, "item_price_max.pkl")
+        if os.path.exists(price_max_path):
+            ModelState.item_price_max = joblib.load(price_max_path)
+            print(f"✅ Máximos históricos de precio cargados: {len(ModelState.item_price_max)}")
+
         # Cargar métricas
         metrics_path = os.path.join(MODELS_DIR, "metrics.json")
         if os.path.exists(metrics_path):
@@ -295,6 +358,7 @@ def calculate_pricing_features(
     item_cnt_lag_1: float = 0.0,
     item_cnt_lag_2: float = 0.0,
     item_cnt_lag_3: float = 0.0,
+    item_id: Optional[int] = None,
 ) -> Dict:
     """Calcula features de pricing dinámicamente (backward compatible).
 
@@ -305,6 +369,8 @@ def calculate_pricing_features(
         item_cnt_lag_1: Ventas del mes anterior
         item_cnt_lag_2: Ventas de hace 2 meses
         item_cnt_lag_3: Ventas de hace 3 meses
+        item_id: ID del producto (opcional). Si existe en item_price_max.pkl,
+            price_discount usa su máximo histórico real en lugar de item_price_lag_1
 
     Returns:
         Diccionario con features (básicas o pricing según el modelo)
@@ -330,7 +396,12 @@ def calculate_pricing_features(
 
     # Features de pricing
     pricing_features["price_rel_category"] = item_price / (category_avg + 1e-5)
-    price_max = item_price_lag_1 if item_price_lag_1 else item_price
+    item_price_max = ModelState.item_price_max or {}
+    if item_id is not None and item_id in item_price_max:
+        # El máximo histórico incluye el precio actual (igual que en entrenamiento)
+        price_max = max(item_price_max[item_id], item_price)
+    else:
+        price_max = item_price_lag_1 if item_price_lag_1 else item_price
     pricing_features["price_discount"] = (item_price / (price_max + 1e-5)) - 1
     pricing_features["is_new_price"] = (
         1 if item_price_lag_1 and item_price != item_price_lag_1 else 0
@@ -474,6 +545,7 @@ async def predict(request: Request):
             item_cnt_lag_1=validated_input.item_cnt_lag_1,  # type: ignore
             item_cnt_lag_2=validated_input.item_cnt_lag_2,  # type: ignore
             item_cnt_lag_3=validated_input.item_cnt_lag_3,  # type: ignore
+            item_id=getattr(validated_input, "item_id", None),
         )
 
         # Construir diccionario de features (orden importante para el modelo)
@@ -602,7 +674,19 @@ async def retrain_model(request: RetrainRequest):
         print(f"\n🔄 Iniciando reentrenamiento con rolling_windows={request.rolling_windows}...")
 
         # Ejecutar entrenamiento
-        train_models(use_balancing=request.use_balancing, rolling_windows=request.rolling_windows)
+        train_models(
+            use_balancing=request.use_balancing,
+            balance_mode=request.balance_mode,
+            rolling_windows=request.rolling_windows,
+            window_bank=request.use_window_bank,
+            tuned_hyperparams=request.use_tuned_hyperparams,
+            models=request.models,
+            resume=request.resume,
+            cache_stages=request.cache_stages,
+            lazy_features=request.lazy_features,
+            n_jobs=request.n_jobs,
+            feature_n_jobs=request.feature_n_jobs,
+        )
 
         # Recargar modelos
         print("\n📥 Recargando modelos...")
@@ -615,6 +699,9 @@ async def retrain_model(request: RetrainRequest):
             metrics=ModelState.metrics,
         )
 
+    except ValueError as ve:
+        # Configuración inválida (ej. un subconjunto de modelos con otras ventanas rolling)
+        raise HTTPException(status_code=400, detail=f"Error de validación: {str(ve)}") from ve
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error durante el reentrenamiento: {str(e)}")
 
@@ -0,0 +1,235 @@
+"""
+Backtesting walk-forward (rolling origin) de los modelos de src/train.py.
+
+Cada fold entrena con los meses anteriores a su mes de prueba y evalúa en ese mes
+(TimeSeriesSplit sobre los date_block_num distintos). La matriz de features se
+obtiene una sola vez del pipeline por etapas (caché en disco), se ordena por mes y
+se escribe como arreglos .npy que los procesos abren mapeados en memoria: cada
+fold es un rango contiguo de filas, sin re-ejecutar el pipeline ni copiar el frame.
+
+Uso:
+    python -m src.backtest [--windows 3 6] [--splits 5] [--n-jobs -1] [--models XGBoost MLP]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import TimeSeriesSplit
+
+from src.data_processing import (
+    DEFAULT_ROLLING_WINDOWS,
+    get_model_features,
+    sort_by_composite_key,
+    validate_rolling_windows,
+)
+
+EXPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exports")
+BACKTEST_METRICS_PATH = os.path.join(EXPORTS_DIR, "backtest_metrics.csv")
+
+
+def walk_forward_folds(
+    months: np.ndarray, n_splits: int = 5, max_train_size: Optional[int] = None
+) -> List[Dict[str, int]]:
+    """Folds rolling-origin sobre los meses distintos: un mes de prueba por fold.
+
+    Parámetros:
+        months: date_block_num de las filas (se usan los valores distintos)
+        n_splits: cantidad de folds (los últimos `n_splits` meses son de prueba)
+        max_train_size: meses máximos de entrenamiento (None = ventana expansiva)
+
+    Raises:
+        ValueError: si no hay suficientes meses para los folds pedidos
+    """
+    unique_months = np.unique(months)
+    if len(unique_months) <= n_splits:
+        raise ValueError(
+            f"Se necesitan más de {n_splits} meses para {n_splits} folds "
+            f"(hay {len(unique_months)})"
+        )
+
+    splitter = TimeSeriesSplit(n_splits=n_splits, test_size=1, max_train_size=max_train_size)
+    return [
+        {
+            "fold": fold,
+            "train_start": int(unique_months[train_idx[0]]),
+            "train_end": int(unique_months[train_idx[-1]]),
+            "test_month": int(unique_months[test_idx[0]]),
+        }
+        for fold, (train_idx, test_idx) in enumerate(splitter.split(unique_months))
+    ]
+
+
+def write_backtest_matrix(df: pd.DataFrame, features: List[str], path: str) -> None:
+    """Escribe X (float32), y y los meses ordenados por date_block_num como .npy."""
+    ordered = sort_by_composite_key(df, ["date_block_num"])
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "X.npy"), ordered[features].to_numpy(dtype=np.float32))
+    np.save(os.path.join(path, "y.npy"), ordered["target_log"].to_numpy(dtype=np.float64))
+    np.save(os.path.join(path, "months.npy"), ordered["date_block_num"].to_numpy())
+
+
+def _month_rows(months: np.ndarray, first: int, last: int) -> slice:
+    """Rango contiguo de filas con first <= date_block_num <= last (meses ordenados)."""
+    return slice(
+        int(np.searchsorted(months, first, side="left")),
+        int(np.searchsorted(months, last, side="right")),
+    )
+
+
+def _fit_and_score(
+    matrix_path: str, fold: Dict[str, int], model_name: str, features: List[str], n_jobs: int
+) -> Dict:
+    """Entrena un modelo en un fold y retorna sus métricas sobre el mes de prueba."""
+    from src.orchestrator import KERAS_MODELS, limit_tensorflow_threads
+    from src.train import build_estimator, evaluate_model
+
+    X = np.load(os.path.join(matrix_path, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(matrix_path, "y.npy"), mmap_mode="r")
+    months = np.load(os.path.join(matrix_path, "months.npy"))
+    train_rows = _month_rows(months, fold["train_start"], fold["train_end"])
+    test_rows = _month_rows(months, fold["test_month"], fold["test_month"])
+
+    estimator = build_estimator(model_name, features)
+    if n_jobs != 1:
+        # Cada proceso entrena un modelo: sin paralelismo anidado dentro del estimador
+        estimator.set_params(
+            **{name: 1 for name in estimator.get_params() if name.endswith("n_jobs")}
+        )
+        if model_name in KERAS_MODELS:
+            # TensorFlow no tiene n_jobs: sin esto cada proceso usa todos los núcleos
+            limit_tensorflow_threads(1)
+
+    start = time.perf_counter()
+    estimator.fit(X[train_rows], y[train_rows])
+    fit_seconds = time.perf_counter() - start
+
+    y_test = y[test_rows]
+    preds = estimator.predict(X[test_rows])
+    metrics = evaluate_model(
+        np.expm1(y_test), np.expm1(preds), f"{model_name} (mes {fold['test_month']})"
+    )
+    metrics.update(
+        model=model_name,
+        **fold,
+        n_train=train_rows.stop - train_rows.start,
+        n_test=test_rows.stop - test_rows.start,
+        fit_seconds=round(fit_seconds, 3),
+    )
+    return metrics
+
+
+def run_backtest(
+    rolling_windows: Optional[List[int]] = None,
+    n_splits: int = 5,
+    models: Optional[List[str]] = None,
+    n_jobs: int = -1,
+    max_train_size: Optional[int] = None,
+    df_final: Optional[pd.DataFrame] = None,
+    output_path: Optional[str] = BACKTEST_METRICS_PATH,
+) -> pd.DataFrame:
+    """Evalúa cada modelo en cada fold walk-forward, con los folds en procesos paralelos.
+
+    Parámetros:
+        rolling_windows: tamaños de ventanas rolling (None = usar DEFAULT_ROLLING_WINDOWS)
+        n_splits: folds rolling-origin (un mes de prueba cada uno)
+        models: subconjunto de MODEL_NAMES (None = todos)
+        n_jobs: procesos para los pares (fold, modelo) (-1 = todos los núcleos)
+        max_train_size: meses máximos de entrenamiento por fold (None = ventana expansiva)
+        df_final: matriz de features con target_log; None = etapa window_features del
+            pipeline por etapas (reutiliza el caché en disco)
+        output_path: CSV de métricas por fold y modelo (None = no escribir)
+
+    Retorna:
+        DataFrame con una fila por (fold, modelo): meses, tamaños, rmse, mae, r2 y
+        segundos de entrenamiento
+    """
+    from src.train import MODEL_NAMES
+
+    if rolling_windows is None:
+        rolling_windows = DEFAULT_ROLLING_WINDOWS
+    rolling_windows = validate_rolling_windows(rolling_windows)
+    features = get_model_features(rolling_windows)
+
+    models = models or MODEL_NAMES
+    unknown = [name for name in models if name not in MODEL_NAMES]
+    if unknown:
+        raise ValueError(f"Modelos desconocidos: {unknown}. Opciones: {MODEL_NAMES}")
+
+    if df_final is None:
+        # Importación diferida: src.pipeline importa el stack de datos completo
+        from src.pipeline import build_data_pipeline
+
+        pipeline = build_data_pipeline(rolling_windows=rolling_windows, features=features)
+        df_final = pipeline.get("window_features")
+
+    folds = walk_forward_folds(df_final["date_block_num"].to_numpy(), n_splits, max_train_size)
+    tasks: List[Tuple[Dict[str, int], str]] = list(product(folds, models))
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(tasks))
+
+    print(
+        f"🔁 Backtesting walk-forward: {len(folds)} folds × {len(models)} modelos "
+        f"en {n_jobs} procesos"
+    )
+    with tempfile.TemporaryDirectory(prefix="backtest-") as matrix_path:
+        write_backtest_matrix(df_final, features, matrix_path)
+        args = [(matrix_path, fold, name, features, n_jobs) for fold, name in tasks]
+
+        if n_jobs == 1:
+            rows = [_fit_and_score(*task) for task in args]
+        else:
+            # spawn: TensorFlow no es seguro tras un fork del proceso padre
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context) as executor:
+                rows = list(executor.map(_fit_and_score, *zip(*args)))
+
+    columns = ["fold", "train_start", "train_end", "test_month", "model", "n_train", "n_test"]
+    results = pd.DataFrame(rows)
+    results = results[columns + [c for c in results.columns if c not in columns]]
+    results = results.sort_values(["fold", "model"], ignore_index=True)
+
+    if output_path is not None:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        results.to_csv(output_path, index=False)
+        print(f"📊 Métricas por fold guardadas en: {output_path}")
+
+    summary = results.groupby("model")[["rmse", "mae", "r2"]].mean().sort_values("rmse")
+    print("\n🏆 Promedio por modelo (walk-forward):")
+    for name, row in summary.iterrows():
+        print(f"  {name:20s} -> RMSE: {row.rmse:.4f} | MAE: {row.mae:.4f} | R²: {row.r2:.4f}")
+
+    return results
+
+
+def main() -> None:
+    """CLI del backtesting walk-forward."""
+    parser = argparse.ArgumentParser(description="Backtesting walk-forward de los modelos")
+    parser.add_argument("--windows", type=int, nargs=2, default=DEFAULT_ROLLING_WINDOWS)
+    parser.add_argument("--splits", type=int, default=5)
+    parser.add_argument("--models", nargs="+", default=None)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--max-train-months", type=int, default=None)
+    parser.add_argument("--output", default=BACKTEST_METRICS_PATH)
+    args = parser.parse_args()
+
+    run_backtest(
+        rolling_windows=args.windows,
+        n_splits=args.splits,
+        models=args.models,
+        n_jobs=args.n_jobs,
+        max_train_size=args.max_train_months,
+        output_path=args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
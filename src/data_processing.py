@@ -1,25 +1,145 @@
 import pandas as pd
 import numpy as np
-import kagglehub
 import os
+import json
 import shutil
-from sklearn.cluster import KMeans
-from sklearn.model_selection import TimeSeriesSplit
-from imblearn.over_sampling import SMOTE
-from typing import Tuple, List
+import hashlib
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Tuple, List, Optional, Set
+
+# kagglehub, sklearn.cluster, imblearn y sklearn.model_selection se importan dentro de las
+# funciones que los usan: importar este módulo (API, app, CLIs) no paga su costo de carga
+if TYPE_CHECKING:
+    from sklearn.model_selection import TimeSeriesSplit
+
+try:
+    import psutil
+except ImportError:  # sin psutil no se reporta el pico de memoria
+    psutil = None
 
 # Configuración de directorios
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+FEATURE_STORE_DIR = os.path.join(DATA_DIR, "feature_store")
+PANEL_STORE_DIR = os.path.join(DATA_DIR, "panel_store")
 
 # Archivos requeridos del dataset
 REQUIRED_FILES = ["sales_train.csv", "items.csv", "shops.csv", "item_categories.csv"]
 
+# Tipos reducidos por archivo (ids enteros pequeños, precios y ventas en float32)
+CSV_DTYPES = {
+    "sales_train.csv": {
+        "date_block_num": "int16",
+        "shop_id": "int16",
+        "item_id": "int16",
+        "item_price": "float32",
+        "item_cnt_day": "float32",
+    },
+    "items.csv": {"item_id": "int16", "item_category_id": "int16"},
+    "shops.csv": {"shop_id": "int16"},
+    "item_categories.csv": {"item_category_id": "int16"},
+}
+
+# Modo de bajo consumo de memoria: ids como enteros pequeños, features en float32
+LOW_MEMORY_INT_DTYPES = {
+    "date_block_num": "int16",
+    "shop_id": "int16",
+    "item_id": "int16",
+    "item_category_id": "int16",
+    "shop_cluster": "int8",
+    "is_new_price": "int8",
+}
+
 # Configuración de rolling windows (ventanas temporales)
 DEFAULT_ROLLING_WINDOWS = [3, 6]  # Ventanas de 3 y 6 meses por defecto
 MIN_ROLLING_WINDOW = 2  # Mínimo tamaño de ventana
 MAX_ROLLING_WINDOW = 12  # Máximo tamaño de ventana
 
+# Banco de ventanas: todas las ventanas permitidas, precalculadas una sola vez
+WINDOW_BANK = list(range(MIN_ROLLING_WINDOW, MAX_ROLLING_WINDOW + 1))
+WINDOW_FEATURE_PREFIXES = [
+    "rolling_mean",
+    "rolling_std",
+    "diff_to_mean",
+    "zscore",
+    "volatility_coef",
+]
+
+# Lags base (t-1, t-2, t-3): requeridos por las features de momentum y precio
+COUNT_LAGS = [1, 2, 3]
+PRICE_LAGS = [1, 2, 3]
+
+# Prefijo de las columnas de lag por columna de origen
+LAG_PREFIXES = {"item_cnt_day": "item_cnt", "item_price": "item_price"}
+
+# Formato de la columna `date` de sales_train.csv (ej: 02.01.2013)
+DATE_FORMAT = "%d.%m.%Y"
+
+# Reglas de limpieza (clipping de outliers)
+MAX_DAILY_SALES = 20
+MAX_ITEM_PRICE = 300000
+
+# Modos de balanceo del train: sobremuestreo SMOTE o pesos por muestra
+BALANCE_MODES = ["smote", "weights"]
+
+# Claves de agregación mensual y tamaño de bloque del modo streaming
+MONTHLY_KEYS = ["date_block_num", "shop_id", "item_id"]
+STREAMING_CHUNKSIZE = 500_000
+
+# Orden canónico de la matriz de features (invariante: las etapas posteriores no re-ordenan)
+SORT_KEYS = ["shop_id", "item_id", "date_block_num"]
+
+# Clave compuesta int64: cada id ocupa un rango fijo, así el orden numérico de la clave
+# coincide con el orden lexicográfico de las columnas y ordenar es un solo argsort
+KEY_SPANS = {"shop_id": 1 << 10, "item_id": 1 << 16, "date_block_num": 1 << 12}
+
+# Features que usan los modelos (más rolling_mean/std de cada ventana, ver get_model_features)
+MODEL_FEATURES = [
+    "shop_cluster",
+    "item_category_id",
+    "item_price_log",  # Precio normalizado con log
+    "item_cnt_lag_1_log",  # Lags de ventas normalizados
+    "item_cnt_lag_2_log",
+    "item_cnt_lag_3_log",
+    "price_rel_category",  # Precio relativo a categoría
+    "price_rel_category_log",  # Versión normalizada
+    "price_discount",  # Ratio de descuento
+    "is_new_price",  # Indicador de cambio de precio
+    "price_change_pct",  # Cambio porcentual de precio
+    "price_change_2m_pct",  # Cambio de precio en 2 meses
+    "revenue_potential_log",  # Ingreso potencial normalizado
+    "price_demand_elasticity",  # Elasticidad precio-demanda
+]
+
+# Columnas que siempre se conservan al pedir un subconjunto de features
+# (claves, target y atributos usados por el entrenamiento y las exportaciones)
+PASSTHROUGH_COLUMNS = MONTHLY_KEYS + [
+    "item_cnt_day",
+    "item_price",
+    "shop_cluster",
+    "item_category_id",
+]
+
+# Grafo de dependencias entre features derivadas (las columnas *_log dependen de su
+# columna base y las de desviación de las estadísticas de su ventana)
+FEATURE_DEPENDENCIES: Dict[str, List[str]] = {
+    "price_discount": ["item_price_rolling_max"],
+    "is_new_price": ["item_price_lag_1"],
+    "delta_1_2": ["item_cnt_lag_1", "item_cnt_lag_2"],
+    "evolution_3m": ["item_cnt_lag_1", "item_cnt_lag_3"],
+    "momentum_avg": ["delta_1_2", "evolution_3m"],
+    "trend_direction": ["delta_1_2"],
+    "price_change_pct": ["item_price_lag_1"],
+    "price_change_2m_pct": ["item_price_lag_2"],
+    "revenue_potential": ["item_cnt_lag_1"],
+    "price_demand_elasticity": ["price_change_pct", "delta_1_2"],
+}
+
 
 def validate_rolling_windows(window_sizes: List[int]) -> List[int]:
     """Valida que las ventanas rolling sean válidas.
@@ -69,6 +189,64 @@ def validate_rolling_windows(window_sizes: List[int]) -> List[int]:
     return window_sizes_sorted
 
 
+def get_model_features(rolling_windows: List[int]) -> List[str]:
+    """Lista de features de los modelos para un par de ventanas rolling."""
+    features = list(MODEL_FEATURES)
+    for window in rolling_windows:
+        features.append(f"rolling_mean_{window}")
+        features.append(f"rolling_std_{window}")
+    return features
+
+
+def _feature_inputs(col: str) -> List[str]:
+    """Entradas directas de una feature según FEATURE_DEPENDENCIES y los patrones de nombre."""
+    if col in FEATURE_DEPENDENCIES:
+        return FEATURE_DEPENDENCIES[col]
+    if col.endswith("_log"):
+        return [col[: -len("_log")]]
+
+    prefix, _, window = col.rpartition("_")
+    if window.isdigit():
+        mean_col, std_col = f"rolling_mean_{window}", f"rolling_std_{window}"
+        if prefix == "diff_to_mean":
+            return ["item_cnt_lag_1", mean_col]
+        if prefix == "zscore":
+            return ["item_cnt_lag_1", mean_col, std_col]
+        if prefix == "volatility_coef":
+            return [mean_col, std_col]
+    return []
+
+
+def resolve_feature_dependencies(features: Optional[List[str]]) -> Optional[Set[str]]:
+    """Cierre transitivo de `features` en el grafo de dependencias.
+
+    Retorna None si `features` es None (calcular todas las columnas).
+    """
+    if features is None:
+        return None
+
+    required: Set[str] = set()
+    pending = list(features)
+    while pending:
+        col = pending.pop()
+        if col not in required:
+            required.add(col)
+            pending.extend(_feature_inputs(col))
+    return required
+
+
+def _needs(col: str, required: Optional[Set[str]]) -> bool:
+    return required is None or col in required
+
+
+def keep_requested_features(data: pd.DataFrame, features: Optional[List[str]]) -> pd.DataFrame:
+    """Descarta las columnas intermedias: conserva PASSTHROUGH_COLUMNS y `features`."""
+    if features is None:
+        return data
+    keep = set(PASSTHROUGH_COLUMNS) | set(features)
+    return data.drop(columns=[col for col in data.columns if col not in keep])
+
+
 def get_data_path() -> str:
     """
     Obtiene la ruta de los datos con sistema de respaldo:
@@ -85,6 +263,8 @@ def get_data_path() -> str:
 
     # Intentar descargar desde KaggleHub
     try:
+        import kagglehub
+
         print("⏳ Descargando dataset desde KaggleHub...")
         kaggle_path = kagglehub.dataset_download(
             "jaklinmalkoc/predict-future-sales-retail-dataset-en"
@@ -129,19 +309,119 @@ def get_data_path() -> str:
             )
 
 
-def load_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def compute_data_fingerprint(path: str) -> str:
+    """Calcula un hash del contenido de los CSV requeridos.
+
+    Se usa como clave del caché columnar: si cualquier archivo cambia,
+    el hash cambia y el caché anterior deja de ser válido.
+    """
+    digest = hashlib.sha256()
+    for file in REQUIRED_FILES:
+        digest.update(file.encode("utf-8"))
+        with open(os.path.join(path, file), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def clear_data_cache() -> None:
+    """Elimina el caché columnar de data/cache/."""
+    if os.path.isdir(CACHE_DIR):
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print("   ✓ Caché columnar eliminado")
+
+
+def _read_csv_files(path: str, files: Optional[List[str]] = None) -> List[pd.DataFrame]:
+    """Lee los CSV requeridos aplicando los tipos reducidos de CSV_DTYPES."""
+    files = files if files is not None else REQUIRED_FILES
+    return [pd.read_csv(os.path.join(path, file), dtype=CSV_DTYPES[file]) for file in files]
+
+
+def load_catalogs(path: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Carga sólo los catálogos (items, shops, item_categories) con tipos reducidos."""
+    items, shops, cats = _read_csv_files(path, REQUIRED_FILES[1:])
+    return items, shops, cats
+
+
+def _read_cache(cache_path: str) -> List[pd.DataFrame]:
+    """Lee el caché Parquet (ventas particionadas por date_block_num)."""
+    with open(os.path.join(cache_path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    sales = pd.read_parquet(os.path.join(cache_path, "sales_train"))[manifest["sales_columns"]]
+    # La columna de partición vuelve como categórica: restaurar el tipo entero
+    sales["date_block_num"] = sales["date_block_num"].astype(
+        CSV_DTYPES["sales_train.csv"]["date_block_num"]
+    )
+    sales = sales.sort_values("date_block_num", kind="stable").reset_index(drop=True)
+
+    others = [
+        pd.read_parquet(os.path.join(cache_path, file.replace(".csv", ".parquet")))
+        for file in REQUIRED_FILES[1:]
+    ]
+    return [sales, *others]
+
+
+def _write_cache(cache_path: str, frames: List[pd.DataFrame]) -> None:
+    """Escribe el caché Parquet y su manifiesto (el manifiesto marca la escritura completa)."""
+    # Eliminar cachés de versiones anteriores de los datos
+    clear_data_cache()
+    os.makedirs(cache_path, exist_ok=True)
+
+    sales, *others = frames
+    sales.to_parquet(
+        os.path.join(cache_path, "sales_train"), partition_cols=["date_block_num"], index=False
+    )
+    for file, df in zip(REQUIRED_FILES[1:], others):
+        df.to_parquet(os.path.join(cache_path, file.replace(".csv", ".parquet")), index=False)
+
+    manifest = {
+        "rows": {file: len(df) for file, df in zip(REQUIRED_FILES, frames)},
+        "sales_columns": list(sales.columns),
+    }
+    with open(os.path.join(cache_path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_data(
+    use_cache: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Carga los datasets con sistema de respaldo automático.
     Intenta KaggleHub primero, si falla usa data/ local.
+
+    Parámetros:
+        use_cache: usar el caché columnar (Parquet) en data/cache/. La primera carga
+            lee los CSV con tipos reducidos y escribe el caché; las siguientes lo
+            reutilizan mientras el hash de contenido de los CSV no cambie.
     """
     path = get_data_path()
 
-    # Cargar archivos
-    print("📂 Cargando archivos CSV...")
-    sales = pd.read_csv(os.path.join(path, "sales_train.csv"))
-    items = pd.read_csv(os.path.join(path, "items.csv"))
-    shops = pd.read_csv(os.path.join(path, "shops.csv"))
-    cats = pd.read_csv(os.path.join(path, "item_categories.csv"))
+    frames = None
+    cache_path = None
+    if use_cache:
+        try:
+            cache_path = os.path.join(CACHE_DIR, compute_data_fingerprint(path))
+            if os.path.exists(os.path.join(cache_path, "manifest.json")):
+                print("⚡ Cargando datos desde caché columnar...")
+                frames = _read_cache(cache_path)
+        except Exception as e:
+            print(f"⚠️  Caché columnar no disponible ({e}). Leyendo CSV...")
+            frames = None
+
+    if frames is None:
+        # Cargar archivos
+        print("📂 Cargando archivos CSV...")
+        frames = _read_csv_files(path)
+
+        if use_cache and cache_path is not None:
+            try:
+                _write_cache(cache_path, frames)
+                print(f"💾 Caché columnar creado en: {cache_path}")
+            except Exception as e:
+                print(f"⚠️  No se pudo escribir el caché columnar: {e}")
+
+    sales, items, shops, cats = frames
 
     # Validar que no estén vacíos
     if any(df.empty for df in [sales, items, shops, cats]):
@@ -168,6 +448,16 @@ def force_download_datasets() -> bool:
                 os.remove(file_path)
                 print(f"   ✓ {file} eliminado")
 
+        # Invalidar el caché columnar, las features y las etapas de los archivos anteriores
+        from src.pipeline import clear_pipeline_cache
+
+        clear_data_cache()
+        clear_feature_store()
+        clear_panel_store()
+        clear_pipeline_cache()
+
+        import kagglehub
+
         print("⏳ Descargando dataset fresco desde KaggleHub...")
         kaggle_path = kagglehub.dataset_download(
             "jaklinmalkoc/predict-future-sales-retail-dataset-en"
@@ -204,22 +494,119 @@ def force_download_datasets() -> bool:
         return False
 
 
-def clean_data(sales: pd.DataFrame) -> pd.DataFrame:
-    """Limpieza básica y tratamiento de outliers (Clipping)."""
+def _clip_sales(sales: pd.DataFrame) -> pd.DataFrame:
+    """Aplica las reglas de limpieza: elimina precios <= 0 y recorta outliers."""
     # Eliminar precios negativos o cero
     sales = sales[sales["item_price"] > 0]
 
     # Clipping: Limitar ventas extremas (Balanceo de datos) para evitar sesgos
-    sales["item_cnt_day"] = sales["item_cnt_day"].clip(0, 20)
-    sales["item_price"] = sales["item_price"].clip(0, 300000)
+    return sales.assign(
+        item_cnt_day=sales["item_cnt_day"].clip(0, MAX_DAILY_SALES),
+        item_price=sales["item_price"].clip(0, MAX_ITEM_PRICE),
+    )
+
+
+def parse_sales_dates(dates: pd.Series) -> pd.Series:
+    """Convierte fechas DATE_FORMAT a datetime parseando sólo los valores distintos.
+
+    Las ventas diarias repiten ~1.000 fechas en millones de filas: se factorizan y se
+    parsea cada fecha una vez con formato fijo (sin inferencia), NaN → NaT.
+    """
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.DatetimeIndex(pd.to_datetime(uniques, format=DATE_FORMAT))
+    return pd.Series(
+        parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=dates.index, name=dates.name
+    )
 
-    # Convertir fecha
-    if "date" in sales.columns:
-        sales["date"] = pd.to_datetime(sales["date"], dayfirst=True)
+
+def clean_data(sales: pd.DataFrame, parse_dates: bool = False) -> pd.DataFrame:
+    """Limpieza básica y tratamiento de outliers (Clipping).
+
+    Retorna una copia filtrada; `sales` no se modifica.
+
+    Parámetros:
+        sales: ventas diarias
+        parse_dates: convertir `date` a datetime (ver parse_sales_dates). Ninguna
+            feature usa la fecha (todas trabajan con date_block_num), por lo que por
+            defecto se conserva como texto y no se parsea
+    """
+    sales = _clip_sales(sales)
+
+    # Convertir fecha sólo si se pide (sobre la copia, sin asignación encadenada)
+    if parse_dates and "date" in sales.columns:
+        sales = sales.assign(date=parse_sales_dates(sales["date"]))
 
     return sales
 
 
+def aggregate_monthly_sales(sales: pd.DataFrame) -> pd.DataFrame:
+    """Agrupa las ventas diarias por mes (date_block_num), tienda e item.
+
+    Retorna la suma de ventas y el precio promedio del mes (sin recortar el total mensual).
+    """
+    return (
+        sales.groupby(MONTHLY_KEYS)
+        .agg({"item_cnt_day": "sum", "item_price": "mean"})  # Precio promedio del mes
+        .reset_index()
+    )
+
+
+def aggregate_monthly_sales_streaming(
+    sales_path: str, chunksize: int = STREAMING_CHUNKSIZE
+) -> pd.DataFrame:
+    """Agregación mensual out-of-core de un archivo de ventas diarias.
+
+    Lee el CSV por bloques, aplica las reglas de clean_data a cada bloque y acumula
+    sumas de ventas, sumas de precio y conteos por (mes, tienda, item). La memoria
+    máxima depende de la cantidad de claves distintas, no del número de filas diarias.
+
+    Parámetros:
+        sales_path: ruta a sales_train.csv (o export diario con las mismas columnas)
+        chunksize: filas por bloque de lectura
+
+    Retorna:
+        DataFrame equivalente a aggregate_monthly_sales(clean_data(sales))
+    """
+    sales_dtypes = CSV_DTYPES["sales_train.csv"]
+    accumulated = None
+    n_rows = 0
+
+    reader = pd.read_csv(
+        sales_path, usecols=list(sales_dtypes), dtype=sales_dtypes, chunksize=chunksize
+    )
+    for chunk in reader:
+        n_rows += len(chunk)
+        chunk = _clip_sales(chunk)
+
+        # Sumas parciales en float64 para no acumular error de redondeo entre bloques
+        partial = (
+            chunk.astype({"item_cnt_day": "float64", "item_price": "float64"})
+            .groupby(MONTHLY_KEYS)
+            .agg(
+                item_cnt_day=("item_cnt_day", "sum"),
+                price_sum=("item_price", "sum"),
+                price_count=("item_price", "count"),
+            )
+        )
+
+        if accumulated is None:
+            accumulated = partial
+        else:
+            accumulated = pd.concat([accumulated, partial]).groupby(level=MONTHLY_KEYS).sum()
+
+    if accumulated is None or accumulated.empty:
+        raise ValueError(f"El archivo de ventas está vacío: {sales_path}")
+
+    monthly = accumulated.reset_index()
+    monthly["item_price"] = monthly["price_sum"] / monthly["price_count"]
+    monthly = monthly[MONTHLY_KEYS + ["item_cnt_day", "item_price"]].astype(
+        {"item_cnt_day": "float32", "item_price": "float32"}
+    )
+
+    print(f"✅ Agregación streaming: {n_rows:,} filas diarias → {len(monthly):,} filas mensuales")
+    return monthly
+
+
 def generate_clusters(
     shops: pd.DataFrame, sales: pd.DataFrame, n_clusters: int = 3
 ) -> pd.DataFrame:
@@ -230,6 +617,8 @@ def generate_clusters(
     # Agrupar ventas totales por tienda
     shop_sales = sales.groupby("shop_id")["item_cnt_day"].sum().reset_index()
 
+    from sklearn.cluster import KMeans
+
     # K-Means para agrupar tiendas por volumen de venta
     kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
     shop_sales["shop_cluster"] = kmeans.fit_predict(shop_sales[["item_cnt_day"]])
@@ -248,6 +637,28 @@ def create_demand_bins(target: pd.Series, n_bins: int = 5) -> pd.Series:
     return bins
 
 
+def compute_balance_weights(y: pd.Series, n_bins: int = 5) -> np.ndarray:
+    """Pesos por muestra inversamente proporcionales a la frecuencia de su bin de demanda.
+
+    Alternativa rápida a SMOTE: el train conserva su tamaño y cada bin pesa lo mismo
+    en total. Los pesos se normalizan a media 1 (filas sin bin reciben peso 1).
+
+    Parámetros:
+        y: target continuo
+        n_bins: cantidad de bins (ver create_demand_bins)
+    """
+    y_bins = create_demand_bins(y, n_bins=n_bins)
+    counts = y_bins.map(y_bins.value_counts()).to_numpy(dtype=np.float64)
+
+    weights = np.ones(len(y), dtype=np.float64)
+    has_bin = ~np.isnan(counts)
+    weights[has_bin] = 1.0 / counts[has_bin]
+    weights[has_bin] *= has_bin.sum() / weights[has_bin].sum()
+
+    print(f"⚖️ Pesos de balanceo por bin de demanda: {y_bins.nunique()} bins")
+    return weights
+
+
 def balance_data_smote(
     X: pd.DataFrame, y: pd.Series, use_balancing: bool = True, sampling_strategy: str = "auto"
 ) -> Tuple[pd.DataFrame, pd.Series]:
@@ -273,15 +684,18 @@ def balance_data_smote(
     print(y_bins.value_counts().sort_index())
 
     # Aplicar SMOTE
+    from imblearn.over_sampling import SMOTE
+
     smote = SMOTE(sampling_strategy=sampling_strategy, random_state=42, k_neighbors=3)
 
     try:
         X_balanced, y_bins_balanced = smote.fit_resample(X, y_bins)
 
-        # Reconstruir target continuo: usar valores promedio de cada bin
-        bin_means = y.groupby(y_bins).mean().to_dict()
+        # Reconstruir target continuo: usar valores promedio de cada bin (lookup vectorizado)
+        bin_means = y.groupby(y_bins).mean()
         y_balanced = pd.Series(
-            [bin_means.get(b, y.mean()) for b in y_bins_balanced], index=X_balanced.index
+            bin_means.reindex(np.asarray(y_bins_balanced)).fillna(y.mean()).to_numpy(),
+            index=X_balanced.index,
         )
 
         print(f"✅ Balanceo SMOTE aplicado: {len(X)} → {len(X_balanced)} muestras")
@@ -295,6 +709,653 @@ def balance_data_smote(
         return X, y
 
 
+# Intervalo de muestreo del RSS en sample_peak_rss (picos más cortos pueden no verse)
+RSS_SAMPLE_INTERVAL_S = 0.02
+
+
+@contextmanager
+def sample_peak_rss(
+    interval: float = RSS_SAMPLE_INTERVAL_S,
+) -> Iterator[Dict[str, Optional[float]]]:
+    """Mide el pico de memoria residente (RSS) del proceso mientras dura el bloque.
+
+    Un hilo muestrea el RSS cada `interval` segundos (además de al entrar y al salir).
+    Entrega un dict que al salir tiene `peak_mb` (RSS máximo observado en el bloque) y
+    `delta_mb` (ese pico menos el RSS al entrar); ambos None sin psutil. A diferencia
+    de ru_maxrss no arrastra el pico de etapas anteriores. No incluye procesos hijos.
+    """
+    result: Dict[str, Optional[float]] = {"peak_mb": None, "delta_mb": None}
+    if psutil is None:
+        yield result
+        return
+    process = psutil.Process()
+    start = peak = process.memory_info().rss
+    stop = threading.Event()
+
+    def _sample() -> None:
+        nonlocal peak
+        while not stop.wait(interval):
+            peak = max(peak, process.memory_info().rss)
+
+    sampler = threading.Thread(target=_sample, daemon=True)
+    sampler.start()
+    try:
+        yield result
+    finally:
+        stop.set()
+        sampler.join()
+        peak = max(peak, process.memory_info().rss)
+        result.update(peak_mb=peak / (1024 * 1024), delta_mb=(peak - start) / (1024 * 1024))
+
+
+@contextmanager
+def track_peak_memory(stage: str, report: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """Imprime (y opcionalmente registra en `report`) el pico de RSS durante una etapa.
+
+    Ver sample_peak_rss: el pico es el de la etapa, sin incluir procesos hijos (n_jobs > 1).
+    """
+    with sample_peak_rss() as memory:
+        yield
+    if memory["peak_mb"] is None:
+        return
+    if report is not None:
+        report[stage] = memory["peak_mb"]
+    print(
+        f"🧠 Pico de RSS durante '{stage}': {memory['peak_mb']:,.0f} MB "
+        f"(+{memory['delta_mb']:,.0f} MB)"
+    )
+
+
+def _cpu_seconds() -> float:
+    """Tiempo de CPU (usuario + sistema) del proceso y de sus hijos ya terminados."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+@contextmanager
+def profile_stage(
+    stage: str, profile: Optional[List[Dict[str, Any]]] = None, rows: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """Mide una etapa: tiempo de pared, tiempo de CPU, pico de RSS y filas por segundo.
+
+    Entrega el registro de la etapa; si las filas se conocen recién al terminar, la etapa
+    puede fijar `rows` en él. Al salir se completa, se imprime y se agrega a `profile`.
+    El tiempo de CPU incluye a los procesos hijos ya terminados (pools con n_jobs > 1);
+    el pico de RSS (peak_rss_mb) y su aumento sobre el RSS al entrar (rss_delta_mb) son
+    los del proceso actual durante la etapa (ver sample_peak_rss).
+    """
+    entry: Dict[str, Any] = {"stage": stage, "rows": rows}
+    with sample_peak_rss() as memory:
+        start_wall, start_cpu = time.perf_counter(), _cpu_seconds()
+        yield entry
+        wall = time.perf_counter() - start_wall
+        cpu = _cpu_seconds() - start_cpu
+    peak, delta = memory["peak_mb"], memory["delta_mb"]
+    entry.update(
+        wall_s=round(wall, 4),
+        cpu_s=round(cpu, 4),
+        peak_rss_mb=round(peak, 1) if peak is not None else None,
+        rss_delta_mb=round(delta, 1) if delta is not None else None,
+        rows_per_s=round(entry["rows"] / wall, 1) if entry["rows"] and wall > 0 else None,
+    )
+    if profile is not None:
+        profile.append(entry)
+    memory_note = f" | pico RSS {peak:,.0f} MB (+{delta:,.0f} MB)" if peak is not None else ""
+    print(f"⏱️  '{stage}': {wall:.2f}s de pared | {cpu:.2f}s de CPU{memory_note}")
+
+
+def fill_non_finite(data: pd.DataFrame, include_inf: bool = True) -> pd.DataFrame:
+    """Reemplaza NaN (e infinitos) por 0 columna a columna, sin copiar el frame completo.
+
+    Equivale a `data.replace([np.inf, -np.inf], 0).fillna(0)` (o sólo `fillna(0)`
+    con include_inf=False) pero modifica `data` en el lugar.
+    """
+    for col in data.columns:
+        values = data[col].to_numpy()
+        if values.dtype.kind != "f":
+            continue
+        invalid = ~np.isfinite(values) if include_inf else np.isnan(values)
+        if invalid.any():
+            data[col] = np.where(invalid, 0, values).astype(values.dtype)
+    return data
+
+
+def downcast_features(data: pd.DataFrame) -> pd.DataFrame:
+    """Ids y flags a enteros pequeños (LOW_MEMORY_INT_DTYPES) y floats a float32, en el lugar.
+
+    Las columnas con NaN no se convierten a entero.
+    """
+    for col in data.columns:
+        dtype = data[col].dtype
+        if col in LOW_MEMORY_INT_DTYPES:
+            if dtype != LOW_MEMORY_INT_DTYPES[col] and not data[col].isna().any():
+                data[col] = data[col].astype(LOW_MEMORY_INT_DTYPES[col])
+        elif dtype == np.float64:
+            data[col] = data[col].astype(np.float32)
+    return data
+
+
+def encode_composite_key(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+    """Codifica columnas de ids enteros no negativos en una clave int64 que preserva el orden.
+
+    Raises:
+        ValueError: si algún id está fuera del rango de KEY_SPANS
+    """
+    key = np.zeros(len(df), dtype=np.int64)
+    for col in cols:
+        values = df[col].to_numpy().astype(np.int64)
+        span = KEY_SPANS[col]
+        if len(values) and (values.min() < 0 or values.max() >= span):
+            raise ValueError(f"{col} fuera del rango de la clave compuesta [0, {span})")
+        key = key * span + values
+    return key
+
+
+def sort_by_composite_key(
+    df: pd.DataFrame, cols: List[str] = None, ignore_index: bool = False
+) -> pd.DataFrame:
+    """Ordena por `cols` (por defecto SORT_KEYS) con un único argsort estable sobre la clave."""
+    order = np.argsort(encode_composite_key(df, cols or SORT_KEYS), kind="stable")
+    ordered = df.take(order)
+    if ignore_index:
+        ordered.index = pd.RangeIndex(len(ordered))
+    return ordered
+
+
+def is_sorted_by_key(df: pd.DataFrame, cols: List[str] = None) -> bool:
+    """True si `df` ya respeta el orden de `cols` (por defecto SORT_KEYS)."""
+    key = encode_composite_key(df, cols or SORT_KEYS)
+    return bool((key[1:] >= key[:-1]).all())
+
+
+def dense_lookup(ids: np.ndarray, dim_ids: np.ndarray, dim_values: np.ndarray) -> np.ndarray:
+    """Busca atributos de una dimensión indexando un arreglo denso por id.
+
+    Equivale a un left merge contra una tabla con ids únicos: ids sin fila en la
+    dimensión quedan como NaN (y el resultado pasa a float64).
+    """
+    ids = np.asarray(ids).astype(np.int64)
+    dim_ids = np.asarray(dim_ids).astype(np.int64)
+    dim_values = np.asarray(dim_values)
+
+    size = int(max(ids.max(initial=-1), dim_ids.max(initial=-1))) + 1
+    table = np.zeros(size, dtype=dim_values.dtype)
+    found = np.zeros(size, dtype=bool)
+    table[dim_ids] = dim_values
+    found[dim_ids] = True
+
+    result = table[ids]
+    missing = ~found[ids]
+    if missing.any():
+        result = result.astype(np.float64)
+        result[missing] = np.nan
+    return result
+
+
+def join_dimension(data: pd.DataFrame, dimension: pd.DataFrame, on: str) -> pd.DataFrame:
+    """Agrega a `data` las columnas de `dimension` por `on` (left join) con dense_lookup.
+
+    Si la dimensión tiene ids repetidos o negativos se usa un merge normal.
+    """
+    dim_ids = dimension[on]
+    if dim_ids.duplicated().any() or (dim_ids < 0).any() or (data[on] < 0).any():
+        return data.merge(dimension, on=on, how="left")
+
+    ids = data[on].to_numpy()
+    for col in dimension.columns:
+        if col != on:
+            data[col] = dense_lookup(ids, dim_ids.to_numpy(), dimension[col].to_numpy())
+    return data
+
+
+def group_start_positions(df: pd.DataFrame, group_cols: List[str]) -> np.ndarray:
+    """Retorna, para cada fila, la posición de la primera fila de su grupo.
+
+    Requiere que `df` esté ordenado de forma que cada grupo sea contiguo.
+    """
+    n = len(df)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Una fila inicia grupo si cualquiera de las claves cambia respecto a la anterior
+    is_start = np.zeros(n, dtype=bool)
+    is_start[0] = True
+    for col in group_cols:
+        values = df[col].to_numpy()
+        is_start[1:] |= values[1:] != values[:-1]
+
+    positions = np.arange(n)
+    return np.maximum.accumulate(np.where(is_start, positions, 0))
+
+
+def compute_rolling_stats(
+    values: np.ndarray, group_start: np.ndarray, window_sizes: List[int]
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Media y desviación estándar móviles para varias ventanas en una sola pasada.
+
+    Usa sumas acumuladas (y de cuadrados) reiniciadas en los límites de grupo,
+    reproduciendo `rolling(window, min_periods=1)` de pandas: la media usa las
+    observaciones disponibles y la std (ddof=1) es NaN con una sola observación.
+
+    Parámetros:
+        values: serie ordenada por grupo y tiempo (sin NaN)
+        group_start: posición de inicio de grupo por fila (ver group_start_positions)
+        window_sizes: tamaños de ventana
+
+    Retorna:
+        Diccionario {ventana: (media, std)}
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    positions = np.arange(n)
+
+    cum_sum = np.concatenate(([0.0], np.cumsum(values)))
+    cum_sq = np.concatenate(([0.0], np.cumsum(values * values)))
+    # Cambios de valor entre filas consecutivas: ventanas sin cambios tienen varianza 0 exacta
+    changes = np.zeros(n + 1, dtype=np.int64)
+    changes[2:] = np.cumsum(values[1:] != values[:-1])
+
+    stats = {}
+    for window in window_sizes:
+        lower = np.maximum(group_start, positions - window + 1)
+        count = (positions - lower + 1).astype(np.float64)
+
+        window_sum = cum_sum[positions + 1] - cum_sum[lower]
+        window_sq = cum_sq[positions + 1] - cum_sq[lower]
+        mean = window_sum / count
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = (window_sq - window_sum * window_sum / count) / (count - 1)
+        var = np.where(count > 1, np.maximum(var, 0.0), np.nan)
+        constant = (changes[positions + 1] - changes[lower + 1]) == 0
+        var[constant & (count > 1)] = 0.0
+
+        stats[window] = (mean, np.sqrt(var))
+
+    return stats
+
+
+def compute_price_rolling_max(
+    data: pd.DataFrame, initial_max: Optional[pd.Series] = None
+) -> pd.Series:
+    """Máximo histórico (expanding max) de precio por item con un cummax agrupado.
+
+    Recorre cada item en orden (date_block_num, shop_id), sin callbacks por grupo.
+
+    Parámetros:
+        data: datos mensuales con item_id, date_block_num, shop_id e item_price
+        initial_max: máximo previo por item_id (estado de corridas anteriores)
+
+    Retorna:
+        Serie alineada con el índice de `data`
+    """
+    order = np.argsort(
+        encode_composite_key(data, ["item_id", "date_block_num", "shop_id"]), kind="stable"
+    )
+    ordered = data[["item_id", "item_price"]].take(order)
+    running_max = ordered.groupby("item_id", sort=False)["item_price"].cummax().to_numpy()
+
+    if initial_max is not None:
+        previous = dense_lookup(
+            ordered["item_id"].to_numpy(), initial_max.index.to_numpy(), initial_max.to_numpy()
+        )
+        running_max = np.fmax(running_max.astype(np.float64), previous).astype(running_max.dtype)
+
+    # Devolver cada valor a la posición original de su fila (sin reindex por etiquetas)
+    result = np.empty_like(running_max)
+    result[order] = running_max
+    return pd.Series(result, index=data.index, name="item_price")
+
+
+def build_item_price_max(data: pd.DataFrame, previous: Optional[pd.Series] = None) -> pd.Series:
+    """Estado reutilizable: precio máximo histórico por item_id.
+
+    Parámetros:
+        data: datos con item_id e item_price (mensuales o diarios)
+        previous: estado anterior a combinar (ej: meses ya procesados)
+    """
+    item_max = data.groupby("item_id")["item_price"].max()
+    if previous is not None:
+        item_max = item_max.combine(previous, max, fill_value=-np.inf)
+    return item_max.rename("item_price_max")
+
+
+def compute_lag_features(
+    df: pd.DataFrame,
+    lag_spec: Dict[str, List[int]],
+    group_start: np.ndarray,
+    time_col: str = "date_block_num",
+) -> Dict[str, np.ndarray]:
+    """Calcula lags por grupo respetando meses faltantes, sin self-merges.
+
+    Cada (grupo, mes) se codifica como una clave entera creciente; el lag k de una
+    fila es la fila cuya clave es `clave - k` (búsqueda binaria sobre el arreglo
+    ya ordenado). Si ese mes no existe en el grupo, el lag es NaN.
+
+    Parámetros:
+        df: datos ordenados por grupo y `time_col` (grupos contiguos)
+        lag_spec: {columna origen: lista de lags}, ej: {"item_cnt_day": [1, 2, 3]}
+        group_start: posición de inicio de grupo por fila (ver group_start_positions)
+        time_col: columna temporal entera
+
+    Retorna:
+        Diccionario {"<prefijo>_lag_<k>": valores} con un arreglo por columna
+    """
+    n = len(df)
+    max_lag = max((lag for lags in lag_spec.values() for lag in lags), default=0)
+    time = df[time_col].to_numpy().astype(np.int64)
+
+    # Id denso de grupo y clave compuesta (el margen max_lag evita colisiones entre grupos)
+    group_id = np.cumsum(group_start == np.arange(n)) - 1
+    span = (int(time.max()) - int(time.min()) + 1 + max_lag) if n else 1
+    keys = group_id * span + (time - (int(time.min()) if n else 0)) + max_lag
+
+    lag_features = {}
+    for col, lags in lag_spec.items():
+        values = df[col].to_numpy()
+        prefix = LAG_PREFIXES.get(col, col)
+        out_dtype = np.result_type(values.dtype, np.float32)
+
+        for lag in lags:
+            target = keys - lag
+            idx = np.minimum(np.searchsorted(keys, target), max(n - 1, 0))
+            found = keys[idx] == target
+
+            lagged = np.full(n, np.nan, dtype=out_dtype)
+            lagged[found] = values[idx[found]]
+            lag_features[f"{prefix}_lag_{lag}"] = lagged
+
+    return lag_features
+
+
+class MonthlyPanel:
+    """Panel denso mes × (tienda, item) con las ventas y precios mensuales.
+
+    Cada serie (tienda, item) es una fila contigua de `counts`/`prices` con una columna
+    por mes, así el lag k de una fila es la columna `mes - k` de su serie y una ventana
+    es un rango de columnas. Los meses sin ventas valen 0 en `counts` y NaN en `prices`.
+    Sólo se guardan las series observadas (no el producto completo tiendas × items).
+
+    Atributos:
+        series_keys: clave compuesta (shop_id, item_id) de cada serie, ordenada
+        first_month: columna del primer mes con ventas de cada serie
+        first_block: date_block_num de la columna 0
+        counts, prices: arreglos (series, meses); memmap si el panel viene de disco
+        path: directorio del panel persistido (None = sólo en memoria)
+    """
+
+    FILES = ["series_keys", "first_month", "counts", "prices"]
+
+    def __init__(
+        self,
+        series_keys: np.ndarray,
+        first_month: np.ndarray,
+        first_block: int,
+        counts: np.ndarray,
+        prices: np.ndarray,
+        path: Optional[str] = None,
+    ):
+        self.series_keys = series_keys
+        self.first_month = first_month
+        self.first_block = first_block
+        self.counts = counts
+        self.prices = prices
+        self.path = path
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(series, meses)."""
+        return self.counts.shape
+
+    def values(self, col: str) -> np.ndarray:
+        """Arreglo del panel para una columna origen (item_cnt_day o item_price)."""
+        return {"item_cnt_day": self.counts, "item_price": self.prices}[col]
+
+    def locate(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """(serie, columna de mes) de cada fila de `df`.
+
+        Raises:
+            ValueError: si alguna fila no pertenece al panel
+        """
+        keys = encode_composite_key(df, ["shop_id", "item_id"])
+        series = np.minimum(np.searchsorted(self.series_keys, keys), len(self.series_keys) - 1)
+        month = df["date_block_num"].to_numpy().astype(np.int64) - self.first_block
+
+        if (
+            (self.series_keys[series] != keys).any()
+            or (month < self.first_month[series]).any()
+            or (month >= self.shape[1]).any()
+        ):
+            raise ValueError("Hay filas fuera del panel mensual (¿panel de otros datos?)")
+        return series, month
+
+    def save(self, path: str) -> None:
+        """Escribe los arreglos como .npy (escritura atómica del directorio)."""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name in self.FILES:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+
+        meta = {"first_block": int(self.first_block), "shape": list(self.shape)}
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        if os.path.isdir(path):
+            # Otro proceso ya lo escribió: el contenido es idéntico
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        else:
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "MonthlyPanel":
+        """Abre un panel persistido; counts/prices quedan mapeados en memoria (sólo lectura)."""
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(
+                os.path.join(path, f"{name}.npy"),
+                mmap_mode="r" if name in ("counts", "prices") else None,
+            )
+            for name in cls.FILES
+        }
+        return cls(first_block=meta["first_block"], path=path, **arrays)
+
+    def __getstate__(self) -> Dict:
+        # Un panel en disco viaja a los procesos hijos como su ruta (sin copiar arreglos)
+        if self.path is not None:
+            return {"path": self.path}
+        return self.__dict__.copy()
+
+    def __setstate__(self, state: Dict) -> None:
+        if set(state) == {"path"}:
+            state = MonthlyPanel.load(state["path"]).__dict__
+        self.__dict__.update(state)
+
+
+def build_monthly_panel(data: pd.DataFrame) -> MonthlyPanel:
+    """Construye el panel denso a partir de ventas mensuales (una fila por mes, tienda, item).
+
+    Los arreglos son float32 (o el dtype de la columna si es más ancho, para no perder
+    precisión respecto al frame).
+
+    Raises:
+        ValueError: si hay más de una fila por (date_block_num, shop_id, item_id)
+    """
+    pair_keys = encode_composite_key(data, ["shop_id", "item_id"])
+    series_keys, series = np.unique(pair_keys, return_inverse=True)
+    blocks = data["date_block_num"].to_numpy().astype(np.int64)
+    first_block = int(blocks.min())
+    n_months = int(blocks.max()) - first_block + 1
+    month = blocks - first_block
+
+    cells = series * n_months + month
+    order = np.argsort(cells, kind="stable")
+    sorted_cells = cells[order]
+    if (sorted_cells[1:] == sorted_cells[:-1]).any():
+        raise ValueError("El panel requiere ventas agregadas por mes (filas duplicadas)")
+
+    # Primer mes observado de cada serie: primera celda de cada serie en el orden de celdas
+    sorted_series = series[order]
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = sorted_series[1:] != sorted_series[:-1]
+    first_month = np.zeros(len(series_keys), dtype=np.int16)
+    first_month[sorted_series[is_first]] = month[order][is_first]
+
+    shape = (len(series_keys), n_months)
+    counts_values = data["item_cnt_day"].to_numpy()
+    price_values = data["item_price"].to_numpy()
+    counts = np.zeros(shape, dtype=np.result_type(counts_values.dtype, np.float32))
+    prices = np.full(shape, np.nan, dtype=np.result_type(price_values.dtype, np.float32))
+    counts[series, month] = counts_values
+    prices[series, month] = price_values
+
+    return MonthlyPanel(series_keys, first_month, first_block, counts, prices)
+
+
+def _panel_fingerprint(data: pd.DataFrame) -> str:
+    """Huella del contenido que define el panel (claves, ventas y precios)."""
+    cols = MONTHLY_KEYS + ["item_cnt_day", "item_price"]
+    digest = hashlib.sha256(pd.util.hash_pandas_object(data[cols], index=False).to_numpy())
+    digest.update(str([str(data[col].dtype) for col in cols[3:]]).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def load_or_build_panel(data: pd.DataFrame) -> MonthlyPanel:
+    """Panel de `data` desde data/panel_store/<hash>/ (se construye y persiste la primera vez).
+
+    La clave es un hash del contenido, así base_features y window_features (que reciben
+    las mismas filas) comparten el mismo panel mapeado en memoria.
+    """
+    path = os.path.join(PANEL_STORE_DIR, _panel_fingerprint(data))
+    if not os.path.isdir(path):
+        panel = build_monthly_panel(data)
+        os.makedirs(PANEL_STORE_DIR, exist_ok=True)
+        panel.save(path)
+        print(f"🧊 Panel mensual {panel.shape[0]} series × {panel.shape[1]} meses guardado")
+    return MonthlyPanel.load(path)
+
+
+def clear_panel_store() -> None:
+    """Elimina los paneles mensuales persistidos."""
+    if os.path.isdir(PANEL_STORE_DIR):
+        shutil.rmtree(PANEL_STORE_DIR, ignore_errors=True)
+        print("   ✓ Panel store eliminado")
+
+
+def panel_lag_features(
+    panel: MonthlyPanel, df: pd.DataFrame, lag_spec: Dict[str, List[int]]
+) -> Dict[str, np.ndarray]:
+    """Equivalente a compute_lag_features leyendo la columna `mes - k` de cada serie.
+
+    Los lags de meses sin ventas valen 0 en las ventas y NaN en el precio; los anteriores
+    al inicio del panel son NaN.
+    """
+    series, month = panel.locate(df)
+
+    lag_features = {}
+    for col, lags in lag_spec.items():
+        values = panel.values(col)
+        prefix = LAG_PREFIXES.get(col, col)
+
+        for lag in lags:
+            source = month - lag
+            valid = source >= 0
+            lagged = np.full(len(df), np.nan, dtype=values.dtype)
+            lagged[valid] = values[series[valid], source[valid]]
+            lag_features[f"{prefix}_lag_{lag}"] = lagged
+
+    return lag_features
+
+
+def panel_rolling_stats(
+    panel: MonthlyPanel, df: pd.DataFrame, window_sizes: List[int]
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Media y std móviles sobre meses calendario: los meses sin ventas cuentan como 0.
+
+    La ventana de cada fila cubre los últimos `w` meses desde el primer mes con ventas
+    de su serie (como min_periods=1); la std (ddof=1) es NaN con un solo mes.
+    """
+    if not window_sizes:
+        return {}
+
+    series, month = panel.locate(df)
+    start = panel.first_month[series].astype(np.int64)
+    # Sumas desplazadas por el valor del mes actual: ventanas constantes dan varianza 0 exacta
+    current = panel.counts[series, month].astype(np.float64)
+    n = len(df)
+    total = np.zeros(n)
+    total_sq = np.zeros(n)
+    count = np.zeros(n, dtype=np.int64)
+
+    stats = {}
+    for offset in range(max(window_sizes)):
+        source = month - offset
+        valid = source >= start
+        shifted = np.where(valid, panel.counts[series, np.maximum(source, 0)] - current, 0.0)
+
+        total += shifted
+        total_sq += shifted * shifted
+        count += valid
+
+        window = offset + 1
+        if window in window_sizes:
+            mean_shift = total / count
+            with np.errstate(divide="ignore", invalid="ignore"):
+                var = np.maximum(total_sq - total * mean_shift, 0.0) / (count - 1)
+            std = np.sqrt(var)
+            std[count == 1] = np.nan
+            stats[window] = (current + mean_shift, std)
+
+    return {window: stats[window] for window in window_sizes}
+
+
+def _rolling_window_columns(
+    df: pd.DataFrame,
+    window_sizes: List[int],
+    low_memory: bool = False,
+    required: Optional[Set[str]] = None,
+    panel: Optional[MonthlyPanel] = None,
+) -> pd.DataFrame:
+    """rolling_mean_w / rolling_std_w para cualquier lista de ventanas (sin validar).
+
+    Con low_memory, si `df` ya está ordenado (SORT_KEYS) se modifica en el lugar y
+    las estadísticas se guardan en float32. Con `panel` las ventanas son meses
+    calendario (ver panel_rolling_stats).
+    """
+    if not is_sorted_by_key(df):
+        # Ordenar por fecha para asegurar continuidad temporal (ya retorna una copia)
+        df_rolled = sort_by_composite_key(df)
+    else:
+        # Invariante de orden: la salida de build_base_features no se re-ordena
+        df_rolled = df if low_memory else df.copy()
+
+    # Todas las ventanas en una pasada vectorizada (sin callbacks por grupo)
+    window_sizes = [
+        window
+        for window in window_sizes
+        if _needs(f"rolling_mean_{window}", required) or _needs(f"rolling_std_{window}", required)
+    ]
+    if panel is not None:
+        stats = panel_rolling_stats(panel, df_rolled, window_sizes)
+    else:
+        group_start = group_start_positions(df_rolled, ["shop_id", "item_id"])
+        stats = compute_rolling_stats(
+            df_rolled["item_cnt_day"].to_numpy(), group_start, window_sizes
+        )
+
+    stat_dtype = np.float32 if low_memory else np.float64
+    for window, (mean, std) in stats.items():
+        if _needs(f"rolling_mean_{window}", required):
+            df_rolled[f"rolling_mean_{window}"] = mean.astype(stat_dtype, copy=False)
+        if _needs(f"rolling_std_{window}", required):
+            df_rolled[f"rolling_std_{window}"] = std.astype(stat_dtype, copy=False)
+
+    # Llenar NaN con 0
+    if low_memory:
+        return fill_non_finite(df_rolled, include_inf=False)
+    return df_rolled.fillna(0)
+
+
 def create_rolling_window_features(
     df: pd.DataFrame, window_sizes: List[int] = None
 ) -> pd.DataFrame:
@@ -314,163 +1375,309 @@ def create_rolling_window_features(
     # Validar ventanas
     window_sizes = validate_rolling_windows(window_sizes)
 
-    df_rolled = df.copy()
+    df_rolled = _rolling_window_columns(df, window_sizes)
 
-    # Ordenar por fecha para asegurar continuidad temporal
-    df_rolled = df_rolled.sort_values(["shop_id", "item_id", "date_block_num"])
+    print(f"✅ Features de rolling window creadas (ventanas: {window_sizes})")
+    return df_rolled
 
-    for window in window_sizes:
-        # Rolling mean de ventas
-        df_rolled[f"rolling_mean_{window}"] = df_rolled.groupby(["shop_id", "item_id"])[
-            "item_cnt_day"
-        ].transform(lambda x: x.rolling(window=window, min_periods=1).mean())
 
-        # Rolling std de ventas
-        df_rolled[f"rolling_std_{window}"] = df_rolled.groupby(["shop_id", "item_id"])[
-            "item_cnt_day"
-        ].transform(lambda x: x.rolling(window=window, min_periods=1).std())
+def _shard_bounds(shop_ids: np.ndarray, n_shards: int) -> List[Tuple[int, int]]:
+    """Cortes contiguos por tienda con una cantidad de filas similar por shard.
 
-    # Llenar NaN con 0
-    df_rolled = df_rolled.fillna(0)
+    Requiere `shop_ids` ordenado; una tienda nunca queda repartida entre shards.
+    """
+    n = len(shop_ids)
+    boundaries = np.flatnonzero(shop_ids[1:] != shop_ids[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
 
-    print(f"✅ Features de rolling window creadas (ventanas: {window_sizes})")
-    return df_rolled
+    # Asignar cada tienda al shard según la fracción de filas acumuladas antes de ella
+    shard_of_shop = np.minimum((starts * n_shards) // max(n, 1), n_shards - 1)
+    shard_starts = starts[np.concatenate(([True], shard_of_shop[1:] != shard_of_shop[:-1]))]
+    cuts = np.concatenate((shard_starts, [n]))
+    return list(zip(cuts[:-1], cuts[1:]))
 
 
-def feature_engineering(
+def run_sharded_by_shop(
+    data: pd.DataFrame, func: Callable[..., pd.DataFrame], n_jobs: int = 1, **kwargs
+) -> pd.DataFrame:
+    """Aplica `func` por shards de tiendas en un ProcessPoolExecutor y concatena.
+
+    Válido sólo para features calculadas dentro de grupos (shop_id, item_id) o por
+    fila. `data` debe estar ordenado por shop_id; el índice y el orden de filas del
+    resultado coinciden con los de `func(data, **kwargs)`.
+
+    Parámetros:
+        data: frame ordenado por shop_id
+        func: función de nivel de módulo (serializable) que recibe un shard
+        n_jobs: procesos a usar (-1 = todos los núcleos; 1 = sin paralelismo)
+
+    Raises:
+        ValueError: si `data` no está ordenado por shop_id
+    """
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+
+    if not data["shop_id"].is_monotonic_increasing:
+        raise ValueError("run_sharded_by_shop requiere datos ordenados por shop_id")
+
+    bounds = _shard_bounds(data["shop_id"].to_numpy(), n_jobs) if len(data) else []
+    if n_jobs <= 1 or len(bounds) <= 1:
+        return func(data, **kwargs)
+
+    shards = [data.iloc[start:stop] for start, stop in bounds]
+    print(f"🧵 Procesando {len(shards)} shards por tienda en {n_jobs} procesos...")
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(shards))) as executor:
+        results = list(executor.map(partial(func, **kwargs), shards))
+
+    return pd.concat(results)
+
+
+def _prepare_base_frame(
     sales: pd.DataFrame,
     items: pd.DataFrame,
     shops_clusters: pd.DataFrame,
-    rolling_windows: List[int] = None,
+    monthly_aggregated: bool,
+    item_price_max: Optional[pd.Series],
+    low_memory: bool = False,
+    required: Optional[Set[str]] = None,
 ) -> pd.DataFrame:
-    """Genera la matriz de entrenamiento con Lags (Variables temporales).
-
-    Parámetros:
-        sales: datos de ventas
-        items: catálogo de productos
-        shops_clusters: clusters de tiendas
-        rolling_windows: tamaños de ventanas rolling (None = usar DEFAULT_ROLLING_WINDOWS)
+    """Agregación mensual, uniones y agregados que cruzan tiendas (precio por categoría
+    y máximo histórico por item). Retorna el frame ordenado por (shop_id, item_id, mes).
     """
     # Agrupar por mes (date_block_num), tienda e item
-    monthly_sales = (
-        sales.groupby(["date_block_num", "shop_id", "item_id"])
-        .agg({"item_cnt_day": "sum", "item_price": "mean"})  # Precio promedio del mes
-        .reset_index()
-    )
+    monthly_sales = sales if monthly_aggregated else aggregate_monthly_sales(sales)
+
+    # Unir con clusters y categorías indexando arreglos densos por id (sin merges)
+    data = monthly_sales.reset_index(drop=True)
+    data = join_dimension(data, shops_clusters, on="shop_id")
+    data = join_dimension(data, items[["item_id", "item_category_id"]], on="item_id")
 
     # Clip de ventas mensuales (Target range 0-20)
-    monthly_sales["item_cnt_day"] = monthly_sales["item_cnt_day"].clip(0, 20)
+    data["item_cnt_day"] = data["item_cnt_day"].clip(0, 20)
 
-    # Unir con clusters y categorías
-    data = monthly_sales.merge(shops_clusters, on="shop_id", how="left")
-    data = data.merge(items[["item_id", "item_category_id"]], on="item_id", how="left")
+    if low_memory:
+        downcast_features(data)
 
     # Precio relativo por categoría
     # Calcula el posicionamiento del producto dentro de su segmento de mercado
-    category_avg_price = data.groupby(["date_block_num", "item_category_id"])[
-        "item_price"
-    ].transform("mean")
-    data["price_rel_category"] = data["item_price"] / (category_avg_price + 1e-5)
+    if _needs("price_rel_category", required):
+        category_avg_price = data.groupby(["date_block_num", "item_category_id"])[
+            "item_price"
+        ].transform("mean")
+        data["price_rel_category"] = data["item_price"] / (category_avg_price + 1e-5)
 
     # Máximo histórico de precio por producto para detectar descuentos
-    data = data.sort_values(["item_id", "date_block_num"])
-    data["item_price_rolling_max"] = data.groupby("item_id")["item_price"].transform(
-        lambda x: x.expanding().max()
-    )
+    if _needs("item_price_rolling_max", required):
+        data["item_price_rolling_max"] = compute_price_rolling_max(data, initial_max=item_price_max)
 
     # Ratio de descuento respecto al precio máximo (valores negativos = descuento)
-    data["price_discount"] = (data["item_price"] / (data["item_price_rolling_max"] + 1e-5)) - 1
+    if _needs("price_discount", required):
+        data["price_discount"] = (data["item_price"] / (data["item_price_rolling_max"] + 1e-5)) - 1
 
-    # Generar Lags (Rezagos: t-1, t-2, t-3)
-    data_shifted = data.copy()
+    # Único ordenamiento de la matriz: las etapas posteriores mantienen este orden
+    return sort_by_composite_key(data, ignore_index=True)
 
-    for lag in [1, 2, 3]:
-        shifted = data_shifted[["date_block_num", "shop_id", "item_id", "item_cnt_day"]].copy()
-        shifted.columns = ["date_block_num", "shop_id", "item_id", f"item_cnt_lag_{lag}"]
-        shifted["date_block_num"] += lag
-        data = data.merge(shifted, on=["date_block_num", "shop_id", "item_id"], how="left")
 
-    # Lags de precio para capturar elasticidad y cambios temporales
-    for lag in [1, 2, 3]:
-        shifted_price = data_shifted[["date_block_num", "shop_id", "item_id", "item_price"]].copy()
-        shifted_price.columns = ["date_block_num", "shop_id", "item_id", f"item_price_lag_{lag}"]
-        shifted_price["date_block_num"] += lag
-        data = data.merge(shifted_price, on=["date_block_num", "shop_id", "item_id"], how="left")
+def _group_features(
+    data: pd.DataFrame,
+    count_lags: List[int],
+    price_lags: List[int],
+    low_memory: bool = False,
+    required: Optional[Set[str]] = None,
+    panel: Optional[MonthlyPanel] = None,
+) -> pd.DataFrame:
+    """Lags, momentum y sensibilidad al precio: sólo dependen del grupo (shop_id, item_id).
+
+    Requiere `data` ordenado por (shop_id, item_id, date_block_num). Con low_memory
+    modifica `data` en el lugar y deja las features en float32. Con `panel` los lags
+    se leen del panel mensual denso.
+    """
+    if not low_memory:
+        data = data.copy()
+
+    # Lags de ventas y de precio (este último captura elasticidad y cambios temporales)
+    count_lags = [lag for lag in count_lags if _needs(f"item_cnt_lag_{lag}", required)]
+    price_lags = [lag for lag in price_lags if _needs(f"item_price_lag_{lag}", required)]
+    lag_spec = {"item_cnt_day": count_lags, "item_price": price_lags}
+    if panel is not None:
+        lagged_columns = panel_lag_features(panel, data, lag_spec)
+    else:
+        group_start = group_start_positions(data, ["shop_id", "item_id"])
+        lagged_columns = compute_lag_features(data, lag_spec, group_start)
+    for name, values in lagged_columns.items():
+        data[name] = values
 
     # Llenar NaNs generados por los lags con 0 (meses iniciales)
-    data = data.fillna(0)
+    if low_memory:
+        fill_non_finite(data, include_inf=False)
+    else:
+        data = data.fillna(0)
 
     # Indicador binario de cambio de precio mensual
-    data["is_new_price"] = (data["item_price"] != data["item_price_lag_1"]).astype(int)
+    if _needs("is_new_price", required):
+        data["is_new_price"] = (data["item_price"] != data["item_price_lag_1"]).astype(int)
 
     # ========== FEATURES DE MOMENTUM (TENDENCIA DIRECCIONAL) ==========
     print("🔥 Generando features de MOMENTUM...")
 
     # Delta inmediato: diferencia entre mes anterior y trasanterior
-    data["delta_1_2"] = data["item_cnt_lag_1"] - data["item_cnt_lag_2"]
+    if _needs("delta_1_2", required):
+        data["delta_1_2"] = data["item_cnt_lag_1"] - data["item_cnt_lag_2"]
 
     # Aceleración/evolución en 3 meses (captura curvatura de la tendencia)
-    data["evolution_3m"] = data["item_cnt_lag_1"] - data["item_cnt_lag_3"]
+    if _needs("evolution_3m", required):
+        data["evolution_3m"] = data["item_cnt_lag_1"] - data["item_cnt_lag_3"]
 
     # Momentum promedio (combina señales de corto y mediano plazo)
-    data["momentum_avg"] = (data["delta_1_2"] + data["evolution_3m"]) / 2.0
+    if _needs("momentum_avg", required):
+        data["momentum_avg"] = (data["delta_1_2"] + data["evolution_3m"]) / 2.0
 
     # Dirección de tendencia (1=subiendo, -1=bajando, 0=estable)
-    data["trend_direction"] = np.sign(data["delta_1_2"])
+    if _needs("trend_direction", required):
+        data["trend_direction"] = np.sign(data["delta_1_2"])
 
     # ========== FEATURES DE SENSIBILIDAD AL PRECIO ==========
     print("💰 Generando features de SENSIBILIDAD AL PRECIO...")
 
     # Cambio porcentual de precio respecto al mes anterior
-    data["price_change_pct"] = (data["item_price"] - data["item_price_lag_1"]) / (
-        data["item_price_lag_1"] + 1e-6
-    )
+    if _needs("price_change_pct", required):
+        data["price_change_pct"] = (data["item_price"] - data["item_price_lag_1"]) / (
+            data["item_price_lag_1"] + 1e-6
+        )
 
     # Cambio porcentual de precio en 2 meses (tendencia más amplia)
-    data["price_change_2m_pct"] = (data["item_price"] - data["item_price_lag_2"]) / (
-        data["item_price_lag_2"] + 1e-6
-    )
+    if _needs("price_change_2m_pct", required):
+        data["price_change_2m_pct"] = (data["item_price"] - data["item_price_lag_2"]) / (
+            data["item_price_lag_2"] + 1e-6
+        )
 
     # Ingreso potencial (interacción ventas × precio)
-    data["revenue_potential"] = data["item_cnt_lag_1"] * data["item_price"]
+    if _needs("revenue_potential", required):
+        data["revenue_potential"] = data["item_cnt_lag_1"] * data["item_price"]
 
     # Elasticidad precio-demanda aproximada
-    data["price_demand_elasticity"] = np.where(
-        data["price_change_pct"] != 0, data["delta_1_2"] / (data["price_change_pct"] + 1e-6), 0
+    if _needs("price_demand_elasticity", required):
+        data["price_demand_elasticity"] = np.where(
+            data["price_change_pct"] != 0,
+            data["delta_1_2"] / (data["price_change_pct"] + 1e-6),
+            0,
+        )
+
+    if low_memory:
+        downcast_features(data)
+
+    return data
+
+
+def build_base_features(
+    sales: pd.DataFrame,
+    items: pd.DataFrame,
+    shops_clusters: pd.DataFrame,
+    monthly_aggregated: bool = False,
+    count_lags: Optional[List[int]] = None,
+    price_lags: Optional[List[int]] = None,
+    item_price_max: Optional[pd.Series] = None,
+    n_jobs: int = 1,
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+) -> pd.DataFrame:
+    """Features independientes de las ventanas rolling: lags, precio y momentum.
+
+    Parámetros:
+        sales: datos de ventas
+        items: catálogo de productos
+        shops_clusters: clusters de tiendas
+        monthly_aggregated: True si `sales` ya viene agregado por mes
+            (ej: salida de aggregate_monthly_sales_streaming)
+        count_lags: lags de ventas adicionales a COUNT_LAGS (ej: [6, 12])
+        price_lags: lags de precio adicionales a PRICE_LAGS
+        item_price_max: máximo histórico de precio por item previo a `sales`
+            (ver build_item_price_max); None = sin historia previa
+        n_jobs: procesos para las features por grupo, repartidas por tienda
+            (-1 = todos los núcleos)
+        low_memory: ids como enteros pequeños, features en float32 y sin copias
+            intermedias del frame completo
+        features: features finales pedidas; sólo se calculan ellas y sus entradas
+            (ver resolve_feature_dependencies). None = todas
+        dense_panel: leer los lags del panel mensual denso (ver load_or_build_panel)
+    """
+    required = resolve_feature_dependencies(features)
+
+    # Los agregados entre tiendas se calculan una sola vez antes de repartir
+    data = _prepare_base_frame(
+        sales,
+        items,
+        shops_clusters,
+        monthly_aggregated,
+        item_price_max,
+        low_memory=low_memory,
+        required=required,
     )
 
-    # Agregar rolling window features para capturar tendencias
-    data = create_rolling_window_features(data, window_sizes=rolling_windows)
+    # Generar Lags (Rezagos: t-1, t-2, t-3 + adicionales) en una sola pasada ordenada
+    count_lags = sorted(set(COUNT_LAGS) | set(count_lags or []))
+    price_lags = sorted(set(PRICE_LAGS) | set(price_lags or []))
+
+    return run_sharded_by_shop(
+        data,
+        _group_features,
+        n_jobs=n_jobs,
+        count_lags=count_lags,
+        price_lags=price_lags,
+        low_memory=low_memory,
+        required=required,
+        panel=load_or_build_panel(data) if dense_panel else None,
+    )
 
-    # ========== FEATURES DE DESVIACIONES RESPECTO A PROMEDIOS ==========
-    print("📊 Generando features de DESVIACIÓN respecto a promedios...")
 
-    # Usar ventanas rolling validadas
-    if rolling_windows is None:
-        rolling_windows = DEFAULT_ROLLING_WINDOWS
-    else:
-        rolling_windows = validate_rolling_windows(rolling_windows)
+def _deviation_features(
+    data: pd.DataFrame,
+    rolling_windows: List[int],
+    low_memory: bool = False,
+    required: Optional[Set[str]] = None,
+) -> pd.DataFrame:
+    """Desviaciones del último mes respecto a las estadísticas rolling de cada ventana."""
+    print("📊 Generando features de DESVIACIÓN respecto a promedios...")
 
     for window in rolling_windows:
         mean_col = f"rolling_mean_{window}"
         std_col = f"rolling_std_{window}"
 
         # Desviación absoluta del último mes vs promedio
-        data[f"diff_to_mean_{window}"] = data["item_cnt_lag_1"] - data[mean_col]
+        if _needs(f"diff_to_mean_{window}", required):
+            data[f"diff_to_mean_{window}"] = data["item_cnt_lag_1"] - data[mean_col]
 
         # Z-score: cuántas desviaciones estándar de distancia
-        data[f"zscore_{window}"] = np.where(
-            data[std_col] > 0, (data["item_cnt_lag_1"] - data[mean_col]) / (data[std_col] + 1e-6), 0
-        )
+        if _needs(f"zscore_{window}", required):
+            data[f"zscore_{window}"] = np.where(
+                data[std_col] > 0,
+                (data["item_cnt_lag_1"] - data[mean_col]) / (data[std_col] + 1e-6),
+                0,
+            )
 
         # Coeficiente de variación (volatilidad relativa)
-        data[f"volatility_coef_{window}"] = np.where(
-            data[mean_col] > 0, data[std_col] / (data[mean_col] + 1e-6), 0
-        )
+        if _needs(f"volatility_coef_{window}", required):
+            data[f"volatility_coef_{window}"] = np.where(
+                data[mean_col] > 0, data[std_col] / (data[mean_col] + 1e-6), 0
+            )
+
+    if low_memory:
+        downcast_features(data)
+
+    return data
 
+
+def _finalize_features(
+    data: pd.DataFrame, low_memory: bool = False, required: Optional[Set[str]] = None
+) -> pd.DataFrame:
+    """Limpieza de infinitos/NaN y columnas logarítmicas de precio y lags."""
     # Limpieza final: reemplazar infinitos y NaNs
-    data = data.replace([np.inf, -np.inf], 0)
-    data = data.fillna(0)
+    if low_memory:
+        fill_non_finite(data)
+    else:
+        data = data.replace([np.inf, -np.inf], 0)
+        data = data.fillna(0)
 
     # Normalización de variables de precio y ventas para comparabilidad
     print("📐 Aplicando normalización a variables de precio y ventas...")
@@ -479,55 +1686,381 @@ def feature_engineering(
     # Esto reduce el impacto de outliers y estabiliza la varianza
     price_features = ["item_price", "price_rel_category", "revenue_potential"]
     for feat in price_features:
-        if feat in data.columns:
+        if feat in data.columns and _needs(f"{feat}_log", required):
             data[f"{feat}_log"] = np.log1p(data[feat])
 
     # Normalización de lags de ventas para mantener escala consistente
     lag_features = ["item_cnt_lag_1", "item_cnt_lag_2", "item_cnt_lag_3"]
     for feat in lag_features:
-        if feat in data.columns:
+        if feat in data.columns and _needs(f"{feat}_log", required):
             data[f"{feat}_log"] = np.log1p(data[feat])
 
+    return data
+
+
+def add_window_features(
+    data: pd.DataFrame,
+    rolling_windows: List[int] = None,
+    n_jobs: int = 1,
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+) -> pd.DataFrame:
+    """Agrega las features que dependen de las ventanas rolling y la normalización final.
+
+    Parámetros:
+        data: salida de build_base_features
+        rolling_windows: tamaños de ventanas rolling (None = usar DEFAULT_ROLLING_WINDOWS)
+        n_jobs: procesos para calcular las ventanas por shards de tiendas
+        low_memory: features en float32 y modificación de `data` en el lugar
+        features: features finales pedidas; el resultado sólo conserva estas columnas
+            y PASSTHROUGH_COLUMNS. None = todas
+        dense_panel: ventanas sobre meses calendario del panel mensual denso, contando
+            como 0 los meses sin ventas
+    """
+    # El panel se abre antes de repartir: los shards reciben sólo su ruta
+    panel = load_or_build_panel(data) if dense_panel else None
+    if n_jobs != 1:
+        return run_sharded_by_shop(
+            data,
+            _window_features,
+            n_jobs=n_jobs,
+            rolling_windows=rolling_windows,
+            low_memory=low_memory,
+            features=features,
+            panel=panel,
+        )
+    return _window_features(data, rolling_windows, low_memory, features, panel)
+
+
+def _window_features(
+    data: pd.DataFrame,
+    rolling_windows: Optional[List[int]],
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    panel: Optional[MonthlyPanel] = None,
+) -> pd.DataFrame:
+    # Usar ventanas rolling validadas
+    if rolling_windows is None:
+        rolling_windows = DEFAULT_ROLLING_WINDOWS
+    else:
+        rolling_windows = validate_rolling_windows(rolling_windows)
+
+    required = resolve_feature_dependencies(features)
+
+    # Agregar rolling window features para capturar tendencias
+    data = _rolling_window_columns(
+        data, rolling_windows, low_memory=low_memory, required=required, panel=panel
+    )
+    print(f"✅ Features de rolling window creadas (ventanas: {rolling_windows})")
+
+    data = _deviation_features(data, rolling_windows, low_memory=low_memory, required=required)
+    data = _finalize_features(data, low_memory=low_memory, required=required)
+    data = keep_requested_features(data, features)
+
     print(f"✅ Feature Engineering completado: {data.shape[1]} columnas, {data.shape[0]} filas")
 
     return data
 
 
-def prepare_full_pipeline(
-    use_balancing: bool = False, balance_strategy: str = "auto", rolling_windows: List[int] = None
-) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, TimeSeriesSplit]:
-    """Pipeline completo de procesamiento: limpieza, features, splits temporales.
+def _bank_features(features: Optional[List[str]]) -> Optional[List[str]]:
+    """Extiende cada feature de ventana pedida a todas las ventanas de WINDOW_BANK."""
+    if features is None:
+        return None
 
-    Retorna splits train/val/test + TimeSeriesSplit para validación cruzada.
+    expanded = []
+    for col in features:
+        prefix, _, window = col.rpartition("_")
+        if prefix in WINDOW_FEATURE_PREFIXES and window.isdigit():
+            expanded.extend(f"{prefix}_{bank_window}" for bank_window in WINDOW_BANK)
+        else:
+            expanded.append(col)
+    return expanded
+
+
+def _window_bank_columns(
+    data: pd.DataFrame,
+    low_memory: bool = False,
+    required: Optional[Set[str]] = None,
+    panel: Optional[MonthlyPanel] = None,
+) -> pd.DataFrame:
+    bank = _rolling_window_columns(
+        data, WINDOW_BANK, low_memory=low_memory, required=required, panel=panel
+    )
+    bank = _deviation_features(bank, WINDOW_BANK, low_memory=low_memory, required=required)
+    return _finalize_features(bank, low_memory=low_memory, required=required)
+
+
+def build_window_bank(
+    data: pd.DataFrame,
+    n_jobs: int = 1,
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+) -> pd.DataFrame:
+    """Precalcula las features de todas las ventanas de WINDOW_BANK en una pasada.
+
+    El resultado contiene rolling_mean/std, diff_to_mean, zscore y volatility_coef
+    para cada ventana entre MIN_ROLLING_WINDOW y MAX_ROLLING_WINDOW; cualquier par
+    de ventanas se obtiene después con select_window_features, sin recalcular.
 
     Parámetros:
-        use_balancing: activar SMOTE en train
-        balance_strategy: estrategia de sobremuestreo
+        data: salida de build_base_features
+        n_jobs: procesos para calcular el banco por shards de tiendas
+        low_memory: banco en float32 (ocupa la mitad)
+        features: features finales pedidas; las de ventana se calculan para todo el banco
+        dense_panel: ventanas sobre el panel mensual denso (ver add_window_features)
+    """
+    print(f"🏦 Precalculando banco de ventanas rolling {WINDOW_BANK}...")
+    bank = run_sharded_by_shop(
+        data,
+        _window_bank_columns,
+        n_jobs=n_jobs,
+        low_memory=low_memory,
+        required=resolve_feature_dependencies(_bank_features(features)),
+        panel=load_or_build_panel(data) if dense_panel else None,
+    )
+
+    print(f"✅ Banco de ventanas listo: {bank.shape[1]} columnas, {bank.shape[0]} filas")
+    return bank
+
+
+def select_window_features(
+    bank: pd.DataFrame,
+    rolling_windows: List[int] = None,
+    features: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Selecciona del banco las columnas de un par de ventanas.
+
+    Equivale a add_window_features(data, rolling_windows): las demás ventanas del
+    banco se descartan y el orden de columnas se conserva.
+
+    Parámetros:
+        bank: salida de build_window_bank
         rolling_windows: tamaños de ventanas rolling (None = usar DEFAULT_ROLLING_WINDOWS)
+        features: features finales pedidas (ver add_window_features)
     """
-    # Validar ventanas rolling al inicio
     if rolling_windows is None:
         rolling_windows = DEFAULT_ROLLING_WINDOWS
     rolling_windows = validate_rolling_windows(rolling_windows)
-    sales, items, shops, cats = load_data()
 
-    print("🧹 Limpiando datos...")
-    sales = clean_data(sales)
+    unused = [
+        f"{prefix}_{window}"
+        for window in WINDOW_BANK
+        if window not in rolling_windows
+        for prefix in WINDOW_FEATURE_PREFIXES
+    ]
+    data = keep_requested_features(bank.drop(columns=unused, errors="ignore"), features)
 
-    print("🤖 Generando Clusters (K-Means)...")
-    shops_clusters = generate_clusters(shops, sales)
+    print(f"⚡ Features de ventanas {rolling_windows} seleccionadas desde el banco")
+    return data
 
-    print(f"⚙️ Ingeniería de Características (Lags + Rolling Windows {rolling_windows})...")
-    df_final = feature_engineering(sales, items, shops_clusters, rolling_windows=rolling_windows)
 
-    # Transformación logarítmica para estabilizar la varianza del target
-    df_final["target_log"] = np.log1p(df_final["item_cnt_day"])
+def feature_engineering(
+    sales: pd.DataFrame,
+    items: pd.DataFrame,
+    shops_clusters: pd.DataFrame,
+    rolling_windows: List[int] = None,
+    monthly_aggregated: bool = False,
+    count_lags: Optional[List[int]] = None,
+    price_lags: Optional[List[int]] = None,
+    item_price_max: Optional[pd.Series] = None,
+    n_jobs: int = 1,
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+) -> pd.DataFrame:
+    """Genera la matriz de entrenamiento con Lags (Variables temporales).
+
+    Parámetros:
+        sales: datos de ventas
+        items: catálogo de productos
+        shops_clusters: clusters de tiendas
+        rolling_windows: tamaños de ventanas rolling (None = usar DEFAULT_ROLLING_WINDOWS)
+        monthly_aggregated: True si `sales` ya viene agregado por mes
+            (ej: salida de aggregate_monthly_sales_streaming)
+        count_lags: lags de ventas adicionales a COUNT_LAGS (ej: [6, 12])
+        price_lags: lags de precio adicionales a PRICE_LAGS
+        item_price_max: máximo histórico de precio por item previo a `sales`
+            (ver build_item_price_max); None = sin historia previa
+        n_jobs: procesos para las features por (shop_id, item_id), repartidas por tienda
+            (-1 = todos los núcleos). El precio medio por categoría y el máximo histórico
+            por item se calculan una sola vez antes de repartir.
+        low_memory: ids como enteros pequeños y features en float32, trabajando en el
+            lugar en vez de copiar el frame completo en cada paso
+        features: features que necesita el modelo (ej: get_model_features(ventanas) o
+            models/features.pkl). Sólo se calculan ellas y sus dependencias transitivas
+            (FEATURE_DEPENDENCIES); el resultado conserva además PASSTHROUGH_COLUMNS.
+            None = todas las features
+        dense_panel: calcular lags y ventanas sobre el panel mensual denso
+            (data/panel_store/, mapeado en memoria): las ventanas cubren meses calendario
+            y los meses sin ventas cuentan como 0
+    """
+    with track_peak_memory("base_features"):
+        data = build_base_features(
+            sales,
+            items,
+            shops_clusters,
+            monthly_aggregated=monthly_aggregated,
+            count_lags=count_lags,
+            price_lags=price_lags,
+            item_price_max=item_price_max,
+            n_jobs=n_jobs,
+            low_memory=low_memory,
+            features=features,
+            dense_panel=dense_panel,
+        )
+    with track_peak_memory("window_features"):
+        return add_window_features(
+            data,
+            rolling_windows=rolling_windows,
+            n_jobs=n_jobs,
+            low_memory=low_memory,
+            features=features,
+            dense_panel=dense_panel,
+        )
+
+
+def _is_lag_col(col: str, prefix: str) -> bool:
+    """True si `col` es una columna de lag cruda (ej: item_cnt_lag_6, no item_cnt_lag_1_log)."""
+    head, _, lag = col.rpartition("_lag_")
+    return head == prefix and lag.isdigit()
+
+
+def append_month_features(
+    history: pd.DataFrame,
+    new_monthly: pd.DataFrame,
+    items: pd.DataFrame,
+    rolling_windows: List[int] = None,
+    item_price_max: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """Calcula features sólo para los meses nuevos a partir del estado final del historial.
+
+    Usa únicamente el estado necesario de `history` (matriz de features de la corrida
+    anterior): los meses dentro del lag máximo, las últimas (ventana - 1) filas de cada
+    (tienda, item) para las ventanas rolling y el máximo histórico de precio por item.
+    El precio relativo por categoría sólo depende del mes nuevo.
+
+    Parámetros:
+        history: salida previa de feature_engineering
+        new_monthly: ventas mensuales de los meses nuevos (ver aggregate_monthly_sales)
+        items: catálogo de productos
+        rolling_windows: ventanas rolling usadas en `history`
+        item_price_max: máximo histórico por item (None = calcularlo desde `history`)
+
+    Retorna:
+        Filas de features de los meses nuevos (mismas columnas que `history`)
+    """
+    rolling_windows = validate_rolling_windows(rolling_windows or DEFAULT_ROLLING_WINDOWS)
+    base_cols = MONTHLY_KEYS + ["item_cnt_day", "item_price"]
+
+    # Lags presentes en la corrida anterior (incluye lags adicionales)
+    count_lags = [int(c.rsplit("_", 1)[1]) for c in history.columns if _is_lag_col(c, "item_cnt")]
+    price_lags = [int(c.rsplit("_", 1)[1]) for c in history.columns if _is_lag_col(c, "item_price")]
+    max_lag = max(count_lags + price_lags + COUNT_LAGS + PRICE_LAGS)
+
+    new_blocks = sorted(new_monthly["date_block_num"].unique())
+    last_history_block = history["date_block_num"].max()
+    if new_blocks[0] <= last_history_block:
+        raise ValueError(
+            f"Los meses nuevos {new_blocks} deben ser posteriores al historial "
+            f"(último mes: {last_history_block})"
+        )
+
+    # Estado mínimo: meses alcanzados por los lags + cola de filas para las ventanas rolling
+    recent = history[history["date_block_num"] >= new_blocks[0] - max_lag]
+    tail = (
+        sort_by_composite_key(history)
+        .groupby(["shop_id", "item_id"])
+        .tail(max(rolling_windows) - 1)
+    )
+    trailing = pd.concat([recent[base_cols], tail[base_cols]]).drop_duplicates(MONTHLY_KEYS)
+
+    if item_price_max is None:
+        item_price_max = build_item_price_max(history)
+
+    # Se reutilizan los clusters de la corrida anterior (tiendas nuevas → cluster 0)
+    shops_clusters = history[["shop_id", "shop_cluster"]].drop_duplicates("shop_id")
+
+    combined = pd.concat([trailing, new_monthly[base_cols]], ignore_index=True)
+    features = feature_engineering(
+        combined,
+        items,
+        shops_clusters,
+        rolling_windows=rolling_windows,
+        monthly_aggregated=True,
+        count_lags=count_lags,
+        price_lags=price_lags,
+        item_price_max=item_price_max,
+    )
+
+    new_rows = features[features["date_block_num"].isin(new_blocks)]
+    return new_rows[history.columns].reset_index(drop=True)
+
+
+def clear_feature_store() -> None:
+    """Elimina la matriz de features persistida para el modo incremental."""
+    if os.path.isdir(FEATURE_STORE_DIR):
+        shutil.rmtree(FEATURE_STORE_DIR, ignore_errors=True)
+        print("   ✓ Feature store eliminado")
+
+
+def save_feature_store(features: pd.DataFrame, rolling_windows: List[int]) -> None:
+    """Persiste la matriz de features y el estado de precios para el modo incremental."""
+    os.makedirs(FEATURE_STORE_DIR, exist_ok=True)
+    features.to_parquet(os.path.join(FEATURE_STORE_DIR, "features.parquet"), index=False)
+    build_item_price_max(features).to_frame().to_parquet(
+        os.path.join(FEATURE_STORE_DIR, "item_price_max.parquet")
+    )
+
+    meta = {
+        "rolling_windows": list(rolling_windows),
+        "last_block": int(features["date_block_num"].max()),
+        "rows": len(features),
+    }
+    with open(os.path.join(FEATURE_STORE_DIR, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_feature_store(
+    rolling_windows: List[int],
+) -> Optional[Tuple[pd.DataFrame, pd.Series]]:
+    """Carga la matriz de features persistida si fue generada con las mismas ventanas.
 
+    Retorna:
+        (features, item_price_max) o None si no existe o no es compatible
+    """
+    meta_path = os.path.join(FEATURE_STORE_DIR, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["rolling_windows"] != list(rolling_windows):
+            print("⚠️  Feature store generado con otras ventanas rolling. Se recalculará.")
+            return None
+
+        features = pd.read_parquet(os.path.join(FEATURE_STORE_DIR, "features.parquet"))
+        item_price_max = pd.read_parquet(os.path.join(FEATURE_STORE_DIR, "item_price_max.parquet"))[
+            "item_price_max"
+        ]
+        return features, item_price_max
+    except Exception as e:
+        print(f"⚠️  No se pudo leer el feature store ({e}). Se recalculará.")
+        return None
+
+
+def split_train_val_test(
+    df_final: pd.DataFrame,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Splits temporales: los últimos 2 meses se reservan para validación y test."""
     # Configurar splits respetando el orden temporal de los datos
     print("📅 Configurando Time Series Split (ventana temporal)...")
 
-    # Ordenar por fecha para respetar cronología
-    df_final = df_final.sort_values("date_block_num")
+    # Ordenar por fecha para respetar cronología (estable: dentro de cada mes se conserva
+    # el orden por tienda e item)
+    df_final = sort_by_composite_key(df_final, ["date_block_num"])
 
     # Definir splits temporales (últimos 2 meses para val y test)
     max_month = df_final["date_block_num"].max()
@@ -536,29 +2069,183 @@ def prepare_full_pipeline(
     val = df_final[df_final["date_block_num"] == max_month - 1]
     test = df_final[df_final["date_block_num"] == max_month]
 
-    # Crear generador TimeSeriesSplit para validación cruzada (opcional)
-    tscv = TimeSeriesSplit(n_splits=5)
+    return train, val, test
 
-    # Aplicar balanceo solo en train para evitar contaminar val/test
-    if use_balancing and len(train) > 100:
-        print("⚖️ Aplicando SMOTE en conjunto de entrenamiento...")
-        features = [
-            col
-            for col in train.columns
-            if col not in ["target_log", "item_cnt_day", "date_block_num"]
-        ]
 
-        X_train = train[features]
-        y_train = train["target_log"]
+def balance_train_set(train: pd.DataFrame, balance_strategy: str = "auto") -> pd.DataFrame:
+    """Aplica SMOTE sobre el conjunto de entrenamiento y reconstruye el target."""
+    print("⚖️ Aplicando SMOTE en conjunto de entrenamiento...")
+    features = [
+        col for col in train.columns if col not in ["target_log", "item_cnt_day", "date_block_num"]
+    ]
+
+    X_train = train[features]
+    y_train = train["target_log"]
+
+    X_train_balanced, y_train_balanced = balance_data_smote(
+        X_train, y_train, use_balancing=True, sampling_strategy=balance_strategy
+    )
+
+    # Reconstruir train balanceado
+    train = X_train_balanced.copy()
+    train["target_log"] = y_train_balanced
+    train["item_cnt_day"] = np.expm1(y_train_balanced)  # Invertir log para consistencia
+    return train
+
+
+def prepare_full_pipeline(
+    use_balancing: bool = False,
+    balance_strategy: str = "auto",
+    rolling_windows: List[int] = None,
+    streaming: bool = False,
+    incremental: bool = False,
+    cache_stages: bool = False,
+    window_bank: bool = False,
+    n_jobs: int = 1,
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+    profile: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, "TimeSeriesSplit"]:
+    """Pipeline completo de procesamiento: limpieza, features, splits temporales.
+
+    Retorna splits train/val/test + TimeSeriesSplit para validación cruzada.
+
+    Parámetros:
+        use_balancing: activar SMOTE en train
+        balance_strategy: estrategia de sobremuestreo
+        rolling_windows: tamaños de ventanas rolling (None = usar DEFAULT_ROLLING_WINDOWS)
+        streaming: agregar las ventas diarias por bloques sin cargarlas completas en memoria
+        incremental: reutilizar la matriz de features de la corrida anterior (data/feature_store/)
+            y calcular sólo los meses nuevos. Supone que los meses ya procesados no cambian.
+        cache_stages: ejecutar por etapas con caché en disco (ver src/pipeline.py); sólo se
+            recalculan las etapas afectadas por un cambio de parámetros o de datos
+        window_bank: precalcular y persistir las features de todas las ventanas permitidas
+            (WINDOW_BANK); cambiar de ventanas sólo selecciona columnas. Requiere cache_stages
+        n_jobs: procesos para el feature engineering, repartido por tienda (-1 = todos)
+        low_memory: features en float32 e ids como enteros pequeños, sin copias intermedias
+            del frame completo (ver feature_engineering)
+        features: calcular sólo estas features y sus dependencias (ver feature_engineering);
+            no se puede combinar con incremental (el feature store guarda todas)
+        dense_panel: lags y ventanas sobre el panel mensual denso (ver feature_engineering);
+            no se puede combinar con incremental
+        profile: lista en la que se agrega el perfil de cada etapa (ver profile_stage)
+    """
+    # Validar ventanas rolling al inicio
+    if rolling_windows is None:
+        rolling_windows = DEFAULT_ROLLING_WINDOWS
+    rolling_windows = validate_rolling_windows(rolling_windows)
 
-        X_train_balanced, y_train_balanced = balance_data_smote(
-            X_train, y_train, use_balancing=True, sampling_strategy=balance_strategy
+    if features is not None and incremental:
+        raise ValueError("features e incremental no se pueden combinar")
+
+    if dense_panel and incremental:
+        raise ValueError("dense_panel e incremental no se pueden combinar")
+
+    if window_bank and not cache_stages:
+        raise ValueError("window_bank requiere cache_stages=True (el banco se persiste por etapas)")
+
+    if cache_stages:
+        if incremental:
+            raise ValueError("cache_stages e incremental no se pueden combinar")
+
+        # Importación diferida: src.pipeline depende de este módulo
+        from src.pipeline import run_cached_pipeline
+
+        return run_cached_pipeline(
+            use_balancing=use_balancing,
+            balance_strategy=balance_strategy,
+            rolling_windows=rolling_windows,
+            streaming=streaming,
+            window_bank=window_bank,
+            n_jobs=n_jobs,
+            low_memory=low_memory,
+            features=features,
+            dense_panel=dense_panel,
+            profile=profile,
         )
 
-        # Reconstruir train balanceado
-        train = X_train_balanced.copy()
-        train["target_log"] = y_train_balanced
-        train["item_cnt_day"] = np.expm1(y_train_balanced)  # Invertir log para consistencia
+    if streaming:
+        path = get_data_path()
+        items, shops, cats = load_catalogs(path)
+
+        print("🌊 Limpiando y agregando ventas mensuales en modo streaming...")
+        with profile_stage("load_data", profile) as stage:
+            sales = aggregate_monthly_sales_streaming(os.path.join(path, "sales_train.csv"))
+            stage["rows"] = len(sales)
+    else:
+        with profile_stage("load_data", profile) as stage:
+            sales, items, shops, cats = load_data()
+            stage["rows"] = len(sales)
+
+        print("🧹 Limpiando datos...")
+        with profile_stage("clean_data", profile, rows=len(sales)):
+            sales = clean_data(sales)
+
+    store = load_feature_store(rolling_windows) if incremental else None
+
+    if store is not None:
+        history, item_price_max = store
+        last_block = history["date_block_num"].max()
+        new_sales = sales[sales["date_block_num"] > last_block]
+
+        if new_sales.empty:
+            print(f"⚡ Feature store al día (último mes: {last_block}). Sin meses nuevos.")
+            df_final = history
+        else:
+            new_monthly = new_sales if streaming else aggregate_monthly_sales(new_sales)
+            print(
+                f"⚙️ Modo incremental: features sólo para los meses "
+                f"{sorted(new_monthly['date_block_num'].unique())}..."
+            )
+            with profile_stage("feature_engineering", profile, rows=len(new_monthly)):
+                new_features = append_month_features(
+                    history,
+                    new_monthly,
+                    items,
+                    rolling_windows=rolling_windows,
+                    item_price_max=item_price_max,
+                )
+            df_final = pd.concat([history, new_features], ignore_index=True)
+    else:
+        # El total por tienda es el mismo con ventas diarias o mensuales
+        print("🤖 Generando Clusters (K-Means)...")
+        with profile_stage("generate_clusters", profile, rows=len(sales)):
+            shops_clusters = generate_clusters(shops, sales)
+
+        print(f"⚙️ Ingeniería de Características (Lags + Rolling Windows {rolling_windows})...")
+        with profile_stage("feature_engineering", profile) as stage:
+            df_final = feature_engineering(
+                sales,
+                items,
+                shops_clusters,
+                rolling_windows=rolling_windows,
+                monthly_aggregated=streaming,
+                n_jobs=n_jobs,
+                low_memory=low_memory,
+                features=features,
+                dense_panel=dense_panel,
+            )
+            stage["rows"] = len(df_final)
+
+    if incremental and (store is None or len(df_final) > len(store[0])):
+        save_feature_store(df_final, rolling_windows)
+
+    # Transformación logarítmica para estabilizar la varianza del target
+    df_final["target_log"] = np.log1p(df_final["item_cnt_day"])
+
+    with profile_stage("split", profile, rows=len(df_final)):
+        train, val, test = split_train_val_test(df_final)
+
+    # Crear generador TimeSeriesSplit para validación cruzada (opcional)
+    from sklearn.model_selection import TimeSeriesSplit
+
+    tscv = TimeSeriesSplit(n_splits=5)
+
+    # Aplicar balanceo solo en train para evitar contaminar val/test
+    if use_balancing and len(train) > 100:
+        with profile_stage("balance", profile, rows=len(train)):
+            train = balance_train_set(train, balance_strategy=balance_strategy)
 
     print(f"📊 Dataset listo: Train ({len(train)}), Val ({len(val)}), Test ({len(test)})")
     print(f"🔄 TimeSeriesSplit configurado con {tscv.n_splits} splits para validación cruzada")
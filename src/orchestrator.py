@@ -0,0 +1,545 @@
+"""
+Orquestador de entrenamiento multi-modelo para src/train.py.
+
+Los modelos de train_models son independientes dado X_train / y_train, así que se
+entrenan como trabajos concurrentes en procesos separados. La matriz de features
+se escribe una sola vez como arreglos .npy en el directorio de la corrida y cada
+proceso la abre mapeada en memoria (sólo lectura), sin copiarla por trabajo. Los
+núcleos se reparten entre los procesos: cada estimador recibe un presupuesto de
+hilos (n_jobs de Random Forest / XGBoost, hilos de TensorFlow y de BLAS/OpenMP) para
+no sobresuscribir la CPU. Las métricas y artefactos se recogen a medida que
+terminan los trabajos, junto con el perfil de cada fit y predicción (tiempo de pared y de
+CPU, pico de RSS, filas por segundo y latencia de inferencia, ver profile_metrics).
+
+XGBoost y las redes Keras usan el split de validación para early stopping (XGBoost se
+trunca a la mejor iteración; Keras restaura los pesos de la mejor época).
+
+El Stacking no re-entrena sus modelos base: su trabajo ajusta sólo el meta-modelo sobre
+predicciones OOF temporales (cacheables) y al final se le agregan el Random Forest y el
+XGBoost ya entrenados por sus propios trabajos.
+
+Cada etapa (matrices, scaler, chunks de XGBoost y cada modelo) deja su artefacto y luego
+un marcador de completitud (`<etapa>.done`, con su resultado) en el directorio de la
+corrida. Si la corrida se interrumpe, al volver a ejecutarla sobre el mismo directorio
+las etapas completas se reutilizan y sólo se entrenan las pendientes.
+"""
+
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from src.data_processing import profile_stage
+
+# Modelo XGBoost simple que usa TreeExplainer para SHAP (no entra en el ranking)
+SHAP_MODEL_NAME = "XGBoost SHAP"
+
+STACKING_MODEL_NAME = "Stacking Ensemble"
+
+# Modelos que se entrenan con las features escaladas por scaler.pkl
+KERAS_MODELS = ["MLP", "LSTM-DNN"]
+
+# Artefacto que deja cada trabajo en el directorio de la corrida (None = sólo métricas)
+JOB_ARTIFACTS = {
+    "Random Forest": None,
+    "XGBoost": None,
+    "MLP": "mlp_model.keras",
+    "LSTM-DNN": "lstm_model.keras",
+    STACKING_MODEL_NAME: "stacking_model.pkl",
+    SHAP_MODEL_NAME: "xgb_simple_shap.pkl",
+}
+
+# Modelos base del Stacking (en el orden de sus estimators) y el archivo intermedio en el
+# que cada trabajo base deja su modelo entrenado para reutilizarlo en el Stacking
+STACKING_BASE_JOBS = ["Random Forest", "XGBoost"]
+BASE_MODEL_FILES = {"Random Forest": "rf_model.pkl", "XGBoost": "xgb_model.pkl"}
+
+# Trabajos XGBoost que pueden entrenarse en memoria externa sobre XGB_CHUNKS_FILE
+XGB_JOBS = ["XGBoost", SHAP_MODEL_NAME]
+XGB_CHUNKS_FILE = "train_chunks.parquet"
+
+# Orden de lanzamiento: los trabajos más largos primero para equilibrar los procesos
+JOB_LAUNCH_ORDER = [
+    STACKING_MODEL_NAME,
+    "LSTM-DNN",
+    "MLP",
+    "Random Forest",
+    "XGBoost",
+    SHAP_MODEL_NAME,
+]
+
+
+# Sufijo del marcador que deja cada etapa completa en el directorio de la corrida
+STAGE_MARKER_SUFFIX = ".done"
+
+
+def training_run_key(arrays: Sequence[Optional[np.ndarray]], config: Dict[str, Any]) -> str:
+    """Huella de una corrida: matrices de entrada y configuración del entrenamiento.
+
+    Una corrida interrumpida sólo se reanuda con la misma huella (mismos datos y modelos).
+    """
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    for values in arrays:
+        if values is not None:
+            values = np.ascontiguousarray(values)
+            digest.update(f"{values.dtype}{values.shape}".encode("utf-8"))
+            digest.update(values.data)
+    return digest.hexdigest()[:16]
+
+
+def _stage_marker(run_dir: str, stage: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "_", stage.lower()).strip("_")
+    return os.path.join(run_dir, f"{slug}{STAGE_MARKER_SUFFIX}")
+
+
+def mark_stage_done(run_dir: str, stage: str, result: Any = None) -> None:
+    """Escribe el marcador de la etapa (con su resultado) de forma atómica.
+
+    Se llama después de guardar los artefactos de la etapa: un marcador nunca apunta a
+    un artefacto a medio escribir.
+    """
+    marker = _stage_marker(run_dir, stage)
+    joblib.dump(result, f"{marker}.tmp")
+    os.replace(f"{marker}.tmp", marker)
+
+
+def completed_stage(run_dir: str, stage: str, files: Sequence[str] = ()) -> Tuple[bool, Any]:
+    """Indica si la etapa terminó en `run_dir` y retorna su resultado.
+
+    Parámetros:
+        run_dir: directorio de la corrida
+        stage: nombre de la etapa
+        files: artefactos de la etapa que deben seguir en `run_dir` (ya promovidos = pendiente)
+
+    Retorna:
+        (completa, resultado guardado por mark_stage_done)
+    """
+    marker = _stage_marker(run_dir, stage)
+    if not os.path.exists(marker):
+        return False, None
+    if not all(os.path.exists(os.path.join(run_dir, name)) for name in files):
+        return False, None
+    return True, joblib.load(marker)
+
+
+def promote_run(run_dir: str, files: List[str], target_dir: str) -> None:
+    """Mueve los artefactos de la corrida a `target_dir` cuando todas las etapas terminaron.
+
+    Primero verifica que estén todos (si falta alguno no se toca `target_dir`) y después
+    reemplaza cada archivo con os.replace. Cada reemplazo es atómico dentro del mismo
+    sistema de archivos (nunca se ve un artefacto a medio escribir), pero el conjunto no:
+    mientras dura el ciclo otro proceso que cargue `target_dir` puede mezclar artefactos
+    de la corrida anterior y de la nueva. Si el proceso muere a mitad de la promoción,
+    los archivos no movidos siguen en `run_dir` y `resume=True` vuelve a entrenar sólo
+    esas etapas. Conviene dejar metrics.json al final de `files`.
+
+    Raises:
+        FileNotFoundError: si algún artefacto no está en `run_dir`
+    """
+    missing = [name for name in files if not os.path.exists(os.path.join(run_dir, name))]
+    if missing:
+        raise FileNotFoundError(f"Artefactos faltantes en {run_dir}: {missing}")
+    os.makedirs(target_dir, exist_ok=True)
+    for name in files:
+        os.replace(os.path.join(run_dir, name), os.path.join(target_dir, name))
+
+
+def profile_metrics(
+    fit_profiles: List[Dict], predict_profile: Dict, artifact_path: Optional[str] = None
+) -> Dict[str, Optional[float]]:
+    """Resume el perfil de un modelo para metrics.json.
+
+    Parámetros:
+        fit_profiles: registros de profile_stage de los fits que produjeron el modelo
+            (el Stacking incluye los de sus modelos base)
+        predict_profile: registro de profile_stage de la predicción de validación
+        artifact_path: artefacto del modelo para model_size_mb (None = sin tamaño)
+
+    Retorna:
+        train_time (s de pared), train_cpu_s, train_rows_per_s, inference_ms_per_1k,
+        peak_rss_mb (pico de RSS del proceso durante el fit y la predicción) y model_size_mb
+    """
+    train_time = sum(p["wall_s"] for p in fit_profiles)
+    rows = fit_profiles[0]["rows"]
+    peaks = [p["peak_rss_mb"] for p in fit_profiles + [predict_profile] if p["peak_rss_mb"]]
+    size = None
+    if artifact_path is not None and os.path.exists(artifact_path):
+        size = round(os.path.getsize(artifact_path) / (1024 * 1024), 3)
+    return {
+        "train_time": round(train_time, 3),
+        "train_cpu_s": round(sum(p["cpu_s"] for p in fit_profiles), 3),
+        "train_rows_per_s": round(rows / train_time, 1) if rows and train_time > 0 else None,
+        "inference_ms_per_1k": round(
+            predict_profile["wall_s"] * 1000 * 1000 / max(1, predict_profile["rows"]), 3
+        ),
+        "peak_rss_mb": max(peaks) if peaks else None,
+        "model_size_mb": size,
+    }
+
+
+def split_cpu_budget(n_jobs: int, n_tasks: int, n_cpus: Optional[int] = None) -> Tuple[int, int]:
+    """Reparte los núcleos entre trabajos concurrentes.
+
+    Parámetros:
+        n_jobs: procesos pedidos (-1 o None = todos los núcleos)
+        n_tasks: cantidad de trabajos a ejecutar
+        n_cpus: núcleos disponibles (None = os.cpu_count())
+
+    Retorna:
+        (procesos concurrentes, hilos por proceso), con procesos × hilos <= núcleos
+    """
+    n_cpus = n_cpus or os.cpu_count() or 1
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = n_cpus
+    workers = max(1, min(n_jobs, n_tasks, n_cpus))
+    return workers, max(1, n_cpus // workers)
+
+
+def write_training_matrices(
+    run_dir: str,
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    X_val: np.ndarray,
+    y_val: np.ndarray,
+    sample_weight: Optional[np.ndarray] = None,
+    extra: Optional[Dict[str, Optional[np.ndarray]]] = None,
+) -> None:
+    """Escribe las matrices de entrenamiento y validación como .npy en `run_dir`.
+
+    `extra` agrega matrices opcionales por nombre (las que son None no se escriben).
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    arrays = {"X_train": X_train, "y_train": y_train, "X_val": X_val, "y_val": y_val}
+    arrays.update(sample_weight=sample_weight, **(extra or {}))
+    for name, values in arrays.items():
+        if values is not None:
+            np.save(os.path.join(run_dir, f"{name}.npy"), np.asarray(values))
+
+
+def load_run_matrix(run_dir: str, name: str) -> Optional[np.ndarray]:
+    """Abre una matriz de la corrida mapeada en memoria (None si no existe)."""
+    path = os.path.join(run_dir, f"{name}.npy")
+    return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+
+def limit_tensorflow_threads(n_threads: int) -> None:
+    """Fija los hilos de TensorFlow (sólo es posible antes de inicializarlo en el proceso)."""
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        pass  # TensorFlow ya se inicializó en este proceso con un trabajo anterior
+
+
+def run_training_job(
+    run_dir: str,
+    name: str,
+    features: List[str],
+    n_threads: Optional[int] = None,
+    oof_cache_dir: Optional[str] = None,
+    xgb_external_memory: bool = False,
+    hyperparams: Optional[Dict[str, Dict]] = None,
+) -> Dict:
+    """Entrena un modelo sobre las matrices de `run_dir` y guarda su artefacto y marcador allí.
+
+    El trabajo del Stacking sólo ajusta el meta-modelo sobre las predicciones OOF de los
+    modelos base; finish_stacking le agrega después los modelos base ya entrenados.
+
+    Parámetros:
+        run_dir: directorio con las matrices .npy (y scaler.pkl para los modelos Keras)
+        name: modelo de MODEL_NAMES o SHAP_MODEL_NAME
+        features: nombres de las columnas de X (para las restricciones monotónicas)
+        n_threads: hilos para el estimador (None = su configuración por defecto)
+        oof_cache_dir: caché de predicciones OOF del Stacking (None = sin caché)
+        xgb_external_memory: entrenar los modelos XGBoost desde XGB_CHUNKS_FILE en memoria
+            externa (ver src/xgb_external.py) en vez de desde X_train
+        hyperparams: hiperparámetros de Random Forest / XGBoost (ver train.load_hyperparams)
+
+    Retorna:
+        Diccionario con name, metrics (sobre X_test si está en `run_dir`, ver
+        run_training_jobs; con el perfil de profile_metrics), val_preds (escala log),
+        artifact (archivo dentro de `run_dir` o None), fit_seconds y profile (registros de
+        profile_stage del fit y de la predicción de evaluación); el Stacking retorna
+        metrics y val_preds en None y sin perfil de predicción
+    """
+    from threadpoolctl import threadpool_limits
+
+    from src.train import EARLY_STOPPING_ROUNDS, build_estimator, evaluate_model
+
+    X_train = load_run_matrix(run_dir, "X_train")
+    y_train = load_run_matrix(run_dir, "y_train")
+    X_val = load_run_matrix(run_dir, "X_val")
+    y_val = load_run_matrix(run_dir, "y_val")
+    X_eval, y_eval = _evaluation_matrices(run_dir)
+    sample_weight = load_run_matrix(run_dir, "sample_weight")
+
+    estimator = build_estimator(name, features, hyperparams)
+    if name in KERAS_MODELS:
+        # El escalado es compartido (scaler.pkl): se entrena sólo la red del Pipeline
+        scaler = joblib.load(os.path.join(run_dir, "scaler.pkl"))
+        X_train, X_val, X_eval = (scaler.transform(X) for X in (X_train, X_val, X_eval))
+        estimator = estimator[-1]
+
+    limits = contextlib.nullcontext()
+    if n_threads is not None:
+        estimator.set_params(
+            **{param: n_threads for param in estimator.get_params() if param.endswith("n_jobs")}
+        )
+        if name in KERAS_MODELS:
+            limit_tensorflow_threads(n_threads)
+        limits = threadpool_limits(limits=n_threads)
+
+    metrics, val_preds = None, None
+    if name in XGB_JOBS:
+        estimator.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+    elif name == STACKING_MODEL_NAME:
+        # OOF sobre el train sin filas sintéticas (X_oof) si el de los modelos base es SMOTE,
+        # con folds por mes (months_*; sin meses, por posición de fila)
+        if load_run_matrix(run_dir, "X_oof") is not None:
+            X_train, y_train, sample_weight, train_months = (
+                load_run_matrix(run_dir, f"{matrix}_oof")
+                for matrix in ("X", "y", "sample_weight", "months")
+            )
+        else:
+            train_months = load_run_matrix(run_dir, "months_train")
+        # Las predicciones OOF salen de XGBoost con el mismo early stopping que el servido
+        for _, base in estimator.estimators:
+            if "early_stopping_rounds" in base.get_params():
+                base.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+
+    profile: Dict[str, Dict] = {}
+    with limits:
+        with profile_stage(f"fit:{name}", rows=len(X_train)) as profile["fit"]:
+            if name == STACKING_MODEL_NAME:
+                estimator.fit_final_estimator(
+                    X_train,
+                    y_train,
+                    sample_weight,
+                    oof_cache_dir,
+                    eval_set=(X_val, y_val),
+                    groups=train_months,
+                )
+            elif xgb_external_memory and name in XGB_JOBS:
+                from src.xgb_external import fit_xgb_external
+
+                chunks_path = os.path.join(run_dir, XGB_CHUNKS_FILE)
+                cache_dir = os.path.join(run_dir, f"xgb-cache-{XGB_JOBS.index(name)}")
+                estimator = fit_xgb_external(
+                    estimator, chunks_path, features, cache_dir, eval_set=(X_val, y_val)
+                )
+            elif name in XGB_JOBS:
+                from src.xgb_external import truncate_to_best_iteration
+
+                estimator.fit(
+                    X_train,
+                    y_train,
+                    sample_weight=sample_weight,
+                    eval_set=[(X_val, y_val)],
+                    verbose=False,
+                )
+                estimator = truncate_to_best_iteration(estimator)
+            elif name in KERAS_MODELS:
+                estimator.fit(
+                    X_train, y_train, sample_weight=sample_weight, validation_data=(X_val, y_val)
+                )
+            else:
+                estimator.fit(X_train, y_train, sample_weight=sample_weight)
+        if name != STACKING_MODEL_NAME:
+            with profile_stage(f"predict:{name}", rows=len(X_eval)) as profile["predict"]:
+                eval_preds = np.asarray(estimator.predict(X_eval)).ravel()
+            val_preds = np.asarray(estimator.predict(X_val)).ravel()
+
+    artifact = JOB_ARTIFACTS.get(name) or BASE_MODEL_FILES.get(name)
+    if artifact is not None:
+        if name in KERAS_MODELS:
+            estimator.model.save(os.path.join(run_dir, artifact))
+        else:
+            joblib.dump(estimator, os.path.join(run_dir, artifact))
+
+    if val_preds is not None:
+        metrics = evaluate_model(np.expm1(y_eval), np.expm1(eval_preds), name)
+        artifact_path = os.path.join(run_dir, artifact) if artifact else None
+        metrics.update(profile_metrics([profile["fit"]], profile["predict"], artifact_path))
+
+    result = {
+        "name": name,
+        "metrics": metrics,
+        "val_preds": val_preds,
+        "artifact": JOB_ARTIFACTS.get(name),
+        "fit_seconds": round(profile["fit"]["wall_s"], 3),
+        "profile": profile,
+    }
+    mark_stage_done(run_dir, name, result)
+    return result
+
+
+def _evaluation_matrices(run_dir: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Matrices de las métricas reportadas: test si la corrida lo tiene, si no validación.
+
+    Validación elige la mejor iteración de XGBoost y la mejor época de Keras (early
+    stopping), así que sus métricas favorecen a esos modelos: test es el holdout limpio.
+    """
+    if load_run_matrix(run_dir, "X_test") is not None:
+        return load_run_matrix(run_dir, "X_test"), load_run_matrix(run_dir, "y_test")
+    return load_run_matrix(run_dir, "X_val"), load_run_matrix(run_dir, "y_val")
+
+
+def finish_stacking(run_dir: str, results: Dict[str, Dict]) -> None:
+    """Completa el Stacking con los modelos base ya entrenados y calcula sus métricas.
+
+    La predicción de evaluación usa el Stacking completo (modelos base + meta-modelo) para
+    medir su latencia de inferencia; su tiempo de entrenamiento suma el de sus modelos base.
+    """
+    from src.train import evaluate_model
+
+    stacking_path = os.path.join(run_dir, JOB_ARTIFACTS[STACKING_MODEL_NAME])
+    stacking = joblib.load(stacking_path)
+    stacking.set_fitted_estimators(
+        [joblib.load(os.path.join(run_dir, BASE_MODEL_FILES[name])) for name in STACKING_BASE_JOBS]
+    )
+    joblib.dump(stacking, stacking_path)
+
+    X_eval, y_eval = _evaluation_matrices(run_dir)
+    result = results[STACKING_MODEL_NAME]
+    with profile_stage(f"predict:{STACKING_MODEL_NAME}", rows=len(X_eval)) as predict_profile:
+        eval_preds = stacking.predict(X_eval)
+    result["profile"]["predict"] = predict_profile
+
+    fit_profiles = [result["profile"]["fit"]]
+    fit_profiles += [results[name]["profile"]["fit"] for name in STACKING_BASE_JOBS]
+    result["val_preds"] = stacking.predict(load_run_matrix(run_dir, "X_val"))
+    result["metrics"] = evaluate_model(np.expm1(y_eval), np.expm1(eval_preds), STACKING_MODEL_NAME)
+    result["metrics"].update(profile_metrics(fit_profiles, predict_profile, stacking_path))
+
+
+def run_training_jobs(
+    run_dir: str,
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    X_val: np.ndarray,
+    y_val: np.ndarray,
+    features: List[str],
+    jobs: Optional[List[str]] = None,
+    sample_weight: Optional[np.ndarray] = None,
+    n_jobs: int = -1,
+    oof_cache_dir: Optional[str] = None,
+    xgb_external_memory: bool = False,
+    hyperparams: Optional[Dict[str, Dict]] = None,
+    train_months: Optional[np.ndarray] = None,
+    oof_train: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]] = None,
+    X_test: Optional[np.ndarray] = None,
+    y_test: Optional[np.ndarray] = None,
+) -> Dict[str, Dict]:
+    """Entrena los modelos como trabajos concurrentes con la CPU repartida entre ellos.
+
+    Parámetros:
+        run_dir: directorio de la corrida (matrices compartidas y artefactos)
+        X_train, y_train, X_val, y_val: matrices de entrenamiento y validación
+        features: nombres de las columnas de X
+        jobs: modelos a entrenar (None = todos los de JOB_ARTIFACTS); el Stacking agrega
+            sus modelos base (STACKING_BASE_JOBS) si no están. Los que ya tienen marcador
+            de completitud en `run_dir` (corrida interrumpida) no se vuelven a entrenar
+        sample_weight: pesos por muestra del entrenamiento (None = sin pesos)
+        n_jobs: procesos concurrentes (-1 = todos los núcleos; 1 = en este proceso)
+        oof_cache_dir: caché de predicciones OOF del Stacking (None = sin caché)
+        xgb_external_memory: escribir el train como chunks Parquet y entrenar los modelos
+            XGBoost en memoria externa
+        hyperparams: hiperparámetros de Random Forest / XGBoost (None = los de train.py)
+        train_months: date_block_num de cada fila de X_train, para armar por mes los folds
+            OOF del Stacking (None = por posición de fila)
+        oof_train: (X, y, meses, pesos) del train sin filas sintéticas para las OOF del
+            Stacking cuando X_train está balanceado con SMOTE (None = usar X_train)
+        X_test, y_test: holdout de las métricas reportadas. Validación ya se usa para el
+            early stopping de XGBoost y Keras (None = métricas sobre validación, sesgadas a
+            favor de esos modelos)
+
+    Retorna:
+        Resultados de run_training_job por modelo, en el orden de `jobs`
+
+    Raises:
+        ValueError: si algún modelo no está en JOB_ARTIFACTS
+    """
+    jobs = list(jobs or JOB_ARTIFACTS)
+    unknown = [name for name in jobs if name not in JOB_ARTIFACTS]
+    if unknown:
+        raise ValueError(f"Modelos desconocidos: {unknown}. Opciones: {list(JOB_ARTIFACTS)}")
+    if STACKING_MODEL_NAME in jobs:
+        jobs += [name for name in STACKING_BASE_JOBS if name not in jobs]
+
+    results: Dict[str, Dict] = {}
+    pending = []
+    for name in jobs:
+        artifact = JOB_ARTIFACTS.get(name) or BASE_MODEL_FILES.get(name)
+        done, result = completed_stage(run_dir, name, [artifact] if artifact else [])
+        if done:
+            results[name] = result
+        else:
+            pending.append(name)
+    if results:
+        print(f"♻️  Modelos reutilizados de la corrida interrumpida: {list(results)}")
+
+    matrices = ["X_train.npy", "y_train.npy", "X_val.npy", "y_val.npy"]
+    if not completed_stage(run_dir, "matrices", matrices)[0]:
+        extra = {"months_train": train_months, "X_test": X_test, "y_test": y_test}
+        if oof_train is not None:
+            extra.update(zip(["X_oof", "y_oof", "months_oof", "sample_weight_oof"], oof_train))
+        write_training_matrices(run_dir, X_train, y_train, X_val, y_val, sample_weight, extra)
+        mark_stage_done(run_dir, "matrices")
+    if any(name in KERAS_MODELS for name in pending):
+        if not completed_stage(run_dir, "scaler", ["scaler.pkl"])[0]:
+            # Normalizar features para Deep Learning (importante para convergencia)
+            joblib.dump(StandardScaler().fit(X_train), os.path.join(run_dir, "scaler.pkl"))
+            mark_stage_done(run_dir, "scaler")
+    xgb_external_memory = xgb_external_memory and any(name in XGB_JOBS for name in pending)
+    if xgb_external_memory and not completed_stage(run_dir, "xgb_chunks", [XGB_CHUNKS_FILE])[0]:
+        from src.xgb_external import write_feature_chunks
+
+        chunks_path = os.path.join(run_dir, XGB_CHUNKS_FILE)
+        write_feature_chunks(X_train, y_train, features, chunks_path, sample_weight)
+        mark_stage_done(run_dir, "xgb_chunks")
+
+    workers, n_threads = split_cpu_budget(n_jobs, max(1, len(pending)))
+    ordered = sorted(pending, key=JOB_LAUNCH_ORDER.index)
+
+    if workers == 1:
+        for name in ordered:
+            results[name] = run_training_job(
+                run_dir, name, features, None, oof_cache_dir, xgb_external_memory, hyperparams
+            )
+    else:
+        print(f"⚙️  Entrenando {len(ordered)} modelos en {workers} procesos × {n_threads} hilos")
+        # spawn: TensorFlow no es seguro tras un fork del proceso padre
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [
+                executor.submit(
+                    run_training_job,
+                    run_dir,
+                    name,
+                    features,
+                    n_threads,
+                    oof_cache_dir,
+                    xgb_external_memory,
+                    hyperparams,
+                )
+                for name in ordered
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result["name"]] = result
+                print(f"  ✅ {result['name']} listo en {result['fit_seconds']:.1f}s")
+
+    if STACKING_MODEL_NAME in jobs:
+        finish_stacking(run_dir, results)
+
+    return {name: results[name] for name in jobs}
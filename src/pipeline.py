@@ -0,0 +1,411 @@
+"""
+Ejecutor del pipeline de datos por etapas con caché en disco.
+
+Cada etapa (load_data → clean_data → generate_clusters → base_features →
+[window_bank →] window_features → split → balance) tiene una clave calculada a partir de su
+nombre, sus parámetros y las claves de las etapas de las que depende. Si el
+resultado de una clave ya existe en disco se reutiliza; así, un reentrenamiento
+con otras ventanas rolling sólo recalcula las etapas posteriores al cambio.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src import data_processing
+from src.data_processing import (
+    DATA_DIR,
+    DEFAULT_ROLLING_WINDOWS,
+    profile_stage,
+    aggregate_monthly_sales_streaming,
+    balance_train_set,
+    build_base_features,
+    build_window_bank,
+    add_window_features,
+    clean_data,
+    compute_data_fingerprint,
+    generate_clusters,
+    load_catalogs,
+    load_data,
+    select_window_features,
+    split_train_val_test,
+    validate_rolling_windows,
+)
+
+if TYPE_CHECKING:
+    from sklearn.model_selection import TimeSeriesSplit
+
+PIPELINE_CACHE_DIR = os.path.join(DATA_DIR, "pipeline_cache")
+
+# Incrementar si cambia la lógica de alguna etapa para invalidar cachés antiguos. Además la
+# clave incluye el código fuente de las etapas (_source_fingerprint), por si se olvida
+PIPELINE_VERSION = 3
+
+
+@lru_cache(maxsize=None)
+def _source_fingerprint() -> str:
+    """Huella del código de data_processing y de este módulo, donde viven las etapas.
+
+    Cualquier cambio en esos archivos invalida el caché, aunque no afecte la salida.
+    """
+    digest = hashlib.sha256()
+    for module in (data_processing, sys.modules[__name__]):
+        digest.update(inspect.getsource(module).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class Stage:
+    """Etapa del pipeline: función, etapas de entrada y parámetros que definen su clave."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        inputs: Optional[List[str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        persist: bool = True,
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = inputs or []
+        self.params = params or {}
+        self.persist = persist
+
+
+class StagePipeline:
+    """Ejecuta etapas con memoización en memoria y en disco (evaluación perezosa).
+
+    Una etapa sólo se calcula si su clave no está en caché; en ese caso se piden
+    primero sus entradas, que a su vez pueden venir del caché.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, use_cache: bool = True):
+        self.cache_dir = cache_dir or PIPELINE_CACHE_DIR
+        self.use_cache = use_cache
+        self.stages: Dict[str, Stage] = {}
+        self.executed: List[str] = []
+        # Perfil (ver profile_stage) de cada etapa ejecutada o leída del caché
+        self.profile: List[Dict[str, Any]] = []
+        self._keys: Dict[str, str] = {}
+        self._results: Dict[str, Any] = {}
+
+    def add(self, stage: Stage) -> "StagePipeline":
+        """Registra una etapa (sus entradas deben estar registradas antes)."""
+        missing = [name for name in stage.inputs if name not in self.stages]
+        if missing:
+            raise ValueError(f"Etapa '{stage.name}' depende de etapas no registradas: {missing}")
+        self.stages[stage.name] = stage
+        return self
+
+    @property
+    def reused(self) -> List[str]:
+        """Etapas obtenidas desde caché en esta ejecución."""
+        return [name for name in self._results if name not in self.executed]
+
+    def key(self, name: str) -> str:
+        """Huella de la etapa: versión y código + nombre + parámetros + huellas de sus entradas."""
+        if name not in self._keys:
+            stage = self.stages[name]
+            payload = {
+                "version": PIPELINE_VERSION,
+                "code": _source_fingerprint(),
+                "stage": name,
+                "params": stage.params,
+                "inputs": [self.key(dep) for dep in stage.inputs],
+            }
+            encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+            self._keys[name] = hashlib.sha256(encoded).hexdigest()[:16]
+        return self._keys[name]
+
+    def get(self, name: str) -> Any:
+        """Retorna el resultado de la etapa (memoria → disco → cálculo)."""
+        if name in self._results:
+            return self._results[name]
+
+        stage = self.stages[name]
+        path = self._cache_path(name)
+
+        if self.use_cache and stage.persist and os.path.exists(path):
+            print(f"⚡ Etapa '{name}' reutilizada desde caché")
+            with profile_stage(name, self.profile) as entry:
+                result = self._load(path)
+                entry.update(rows=_result_rows(result), cached=True)
+        else:
+            inputs = [self.get(dep) for dep in stage.inputs]
+            print(f"▶️  Ejecutando etapa '{name}'...")
+            with profile_stage(name, self.profile) as entry:
+                result = stage.func(*inputs, **stage.params)
+                entry.update(rows=_result_rows(result), cached=False)
+            self.executed.append(name)
+            if self.use_cache and stage.persist:
+                self._save(path, result)
+
+        self._results[name] = result
+        return result
+
+    def _cache_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}-{self.key(name)}.joblib")
+
+    @staticmethod
+    def _load(path: str) -> Any:
+        return joblib.load(path)
+
+    def _save(self, path: str, result: Any) -> None:
+        """Escritura atómica: un archivo parcial nunca se confunde con un caché válido."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        joblib.dump(result, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def _result_rows(result: Any) -> Optional[int]:
+    """Filas del resultado de una etapa (primer DataFrame si es una tupla)."""
+    if isinstance(result, tuple):
+        result = next((item for item in result if isinstance(item, pd.DataFrame)), None)
+    return len(result) if isinstance(result, pd.DataFrame) else None
+
+
+def clear_pipeline_cache() -> None:
+    """Elimina los resultados cacheados de todas las etapas."""
+    if os.path.isdir(PIPELINE_CACHE_DIR):
+        shutil.rmtree(PIPELINE_CACHE_DIR, ignore_errors=True)
+        print("   ✓ Caché de etapas eliminado")
+
+
+def _load_stage(streaming: bool, data_fingerprint: str) -> Tuple[pd.DataFrame, ...]:
+    """Etapa load_data: ventas (diarias o ya agregadas por mes) y catálogos."""
+    if not streaming:
+        return load_data()
+
+    path = data_processing.get_data_path()
+    items, shops, cats = load_catalogs(path)
+    monthly = aggregate_monthly_sales_streaming(os.path.join(path, "sales_train.csv"))
+    return monthly, items, shops, cats
+
+
+def _clean_stage(raw: Tuple[pd.DataFrame, ...], streaming: bool) -> pd.DataFrame:
+    # En modo streaming la limpieza ya se aplicó por bloque
+    return raw[0] if streaming else clean_data(raw[0])
+
+
+def _clusters_stage(
+    raw: Tuple[pd.DataFrame, ...], sales: pd.DataFrame, n_clusters: int
+) -> pd.DataFrame:
+    return generate_clusters(raw[2], sales, n_clusters=n_clusters)
+
+
+def _base_features_stage(
+    sales: pd.DataFrame,
+    raw: Tuple[pd.DataFrame, ...],
+    shops_clusters: pd.DataFrame,
+    streaming: bool,
+    count_lags: Optional[List[int]],
+    price_lags: Optional[List[int]],
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    return build_base_features(
+        sales,
+        raw[1],
+        shops_clusters,
+        monthly_aggregated=streaming,
+        count_lags=count_lags,
+        price_lags=price_lags,
+        n_jobs=n_jobs,
+        low_memory=low_memory,
+        features=features,
+        dense_panel=dense_panel,
+    )
+
+
+def _window_features_stage(
+    base: pd.DataFrame,
+    rolling_windows: List[int],
+    from_bank: bool = False,
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    if from_bank:
+        df_final = select_window_features(base, rolling_windows=rolling_windows, features=features)
+    else:
+        # Con low_memory se extiende en el lugar el frame de base_features (ya persistido)
+        df_final = add_window_features(
+            base,
+            rolling_windows=rolling_windows,
+            n_jobs=n_jobs,
+            low_memory=low_memory,
+            features=features,
+            dense_panel=dense_panel,
+        )
+    # Transformación logarítmica para estabilizar la varianza del target
+    df_final["target_log"] = np.log1p(df_final["item_cnt_day"])
+    return df_final
+
+
+def _balance_stage(
+    splits: Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame], balance_strategy: str
+) -> pd.DataFrame:
+    return balance_train_set(splits[0], balance_strategy=balance_strategy)
+
+
+def build_data_pipeline(
+    rolling_windows: Optional[List[int]] = None,
+    use_balancing: bool = False,
+    balance_strategy: str = "auto",
+    streaming: bool = False,
+    n_clusters: int = 3,
+    count_lags: Optional[List[int]] = None,
+    price_lags: Optional[List[int]] = None,
+    use_cache: bool = True,
+    window_bank: bool = False,
+    n_jobs: int = 1,
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+) -> StagePipeline:
+    """Declara las etapas del pipeline de datos con sus parámetros.
+
+    La huella de los CSV de origen es la raíz de todas las claves: si los datos
+    cambian, todas las etapas se recalculan. Con `window_bank`, la etapa
+    window_bank (independiente de las ventanas) precalcula todas las ventanas
+    permitidas y window_features sólo selecciona columnas del banco.
+
+    Con `features` sólo se calculan esas columnas y sus dependencias; la lista forma
+    parte de las claves de las etapas de features. `n_jobs` no forma parte de las
+    claves: el resultado no depende del paralelismo. Con `dense_panel`, lags y ventanas
+    se leen del panel mensual denso (data/panel_store/), que base_features y
+    window_features comparten por hash de contenido.
+    """
+    rolling_windows = validate_rolling_windows(rolling_windows or DEFAULT_ROLLING_WINDOWS)
+    data_fingerprint = compute_data_fingerprint(data_processing.get_data_path())
+
+    pipeline = StagePipeline(use_cache=use_cache)
+    pipeline.add(
+        Stage(
+            "load_data",
+            _load_stage,
+            params={"streaming": streaming, "data_fingerprint": data_fingerprint},
+            # load_data ya tiene su propio caché columnar (data/cache/)
+            persist=False,
+        )
+    )
+    pipeline.add(Stage("clean_data", _clean_stage, ["load_data"], {"streaming": streaming}))
+    pipeline.add(
+        Stage(
+            "generate_clusters",
+            _clusters_stage,
+            ["load_data", "clean_data"],
+            {"n_clusters": n_clusters},
+        )
+    )
+    pipeline.add(
+        Stage(
+            "base_features",
+            partial(_base_features_stage, n_jobs=n_jobs),
+            ["clean_data", "load_data", "generate_clusters"],
+            {
+                "streaming": streaming,
+                "count_lags": count_lags,
+                "price_lags": price_lags,
+                "low_memory": low_memory,
+                "features": features,
+                "dense_panel": dense_panel,
+            },
+        )
+    )
+    window_input = "base_features"
+    if window_bank:
+        pipeline.add(
+            Stage(
+                "window_bank",
+                partial(build_window_bank, n_jobs=n_jobs),
+                ["base_features"],
+                {"low_memory": low_memory, "features": features, "dense_panel": dense_panel},
+            )
+        )
+        window_input = "window_bank"
+
+    pipeline.add(
+        Stage(
+            "window_features",
+            partial(_window_features_stage, n_jobs=n_jobs),
+            [window_input],
+            {
+                "rolling_windows": rolling_windows,
+                "from_bank": window_bank,
+                "low_memory": low_memory,
+                "features": features,
+                "dense_panel": dense_panel,
+            },
+        )
+    )
+    pipeline.add(Stage("split", split_train_val_test, ["window_features"]))
+
+    if use_balancing:
+        pipeline.add(
+            Stage("balance", _balance_stage, ["split"], {"balance_strategy": balance_strategy})
+        )
+
+    return pipeline
+
+
+def run_cached_pipeline(
+    use_balancing: bool = False,
+    balance_strategy: str = "auto",
+    rolling_windows: Optional[List[int]] = None,
+    streaming: bool = False,
+    window_bank: bool = False,
+    n_jobs: int = 1,
+    low_memory: bool = False,
+    features: Optional[List[str]] = None,
+    dense_panel: bool = False,
+    profile: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, "TimeSeriesSplit"]:
+    """Equivalente a prepare_full_pipeline reutilizando las etapas cacheadas.
+
+    `profile` recibe el perfil de las etapas ejecutadas o leídas del caché (ver profile_stage).
+    """
+    pipeline = build_data_pipeline(
+        rolling_windows=rolling_windows,
+        use_balancing=use_balancing,
+        balance_strategy=balance_strategy,
+        streaming=streaming,
+        window_bank=window_bank,
+        n_jobs=n_jobs,
+        low_memory=low_memory,
+        features=features,
+        dense_panel=dense_panel,
+    )
+
+    train, val, test = pipeline.get("split")
+
+    # Aplicar balanceo solo en train para evitar contaminar val/test
+    if use_balancing and len(train) > 100:
+        train = pipeline.get("balance")
+
+    from sklearn.model_selection import TimeSeriesSplit
+
+    tscv = TimeSeriesSplit(n_splits=5)
+
+    if profile is not None:
+        profile.extend(pipeline.profile)
+    print(
+        f"🧩 Etapas reutilizadas: {pipeline.reused or 'ninguna'} | "
+        f"ejecutadas: {pipeline.executed or 'ninguna'}"
+    )
+    print(f"📊 Dataset listo: Train ({len(train)}), Val ({len(val)}), Test ({len(test)})")
+
+    return train, val, test, tscv
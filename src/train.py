@@ -1,69 +1,406 @@
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 import pandas as pd
 import numpy as np
 import joblib
 import os
 import json
+import hashlib
+import shutil
 import warnings
+import argparse
 
 from src.data_processing import (
     prepare_full_pipeline,
     DEFAULT_ROLLING_WINDOWS,
+    get_model_features,
     validate_rolling_windows,
+    build_item_price_max,
+    compute_balance_weights,
+    balance_train_set,
+    profile_stage,
+    BALANCE_MODES,
 )
-from sklearn.ensemble import RandomForestRegressor, StackingRegressor
+from src.orchestrator import (
+    SHAP_MODEL_NAME,
+    STACKING_BASE_JOBS,
+    STACKING_MODEL_NAME,
+    completed_stage,
+    mark_stage_done,
+    promote_run,
+    run_training_jobs,
+    training_run_key,
+)
+from sklearn.ensemble import RandomForestRegressor
 from sklearn.linear_model import LinearRegression
 from xgboost import XGBRegressor
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.base import BaseEstimator, RegressorMixin
-
-# Deep Learning imports
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers, callbacks
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.utils import Bunch
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+# TensorFlow/Keras se importan sólo al construir o entrenar las redes: importar este
+# módulo (o entrenar sólo modelos de árboles) no paga su costo de carga
+if TYPE_CHECKING:
+    import tensorflow as tf
+    from tensorflow import keras
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
 # Configuración de directorios
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODELS_DIR = os.path.join(BASE_DIR, "models")
+EXPORTS_DIR = os.path.join(BASE_DIR, "exports")
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+# Corridas de entrenamiento en curso o interrumpidas (staging, ver train_models)
+RUNS_DIR = os.path.join(MODELS_DIR, ".runs")
+
+# Perfil de tiempos y memoria de la última corrida (etapas de datos, fits y predicciones)
+RUN_PROFILE_FILE = "run_profile.json"
+
+# Metadatos de precios que usa la inferencia (se generan en la corrida y se promueven con ella)
+PRICE_METADATA_FILES = ["category_prices.pkl", "item_price_max.pkl"]
+
+# Predicciones out-of-fold de los modelos base del Stacking, por hash de datos y modelos
+OOF_CACHE_DIR = os.path.join(BASE_DIR, "data", "oof_cache")
+
+# Modelos evaluados por train_models (y por el backtesting walk-forward, ver src/backtest.py)
+MODEL_NAMES = ["Random Forest", "XGBoost", "MLP", "LSTM-DNN", "Stacking Ensemble"]
+
+# Claves cortas de los modelos entrenables (parámetro `models` de train_models y /retrain)
+MODEL_KEYS = {
+    "randomforest": "Random Forest",
+    "xgboost": "XGBoost",
+    "mlp": "MLP",
+    "lstm": "LSTM-DNN",
+    "stacking": "Stacking Ensemble",
+    "xgb_shap": SHAP_MODEL_NAME,
+}
+
+# Modelos que sirve la API: refrescarlos sólo entrena árboles, sin cargar TensorFlow
+PRODUCTION_MODELS = ["stacking", "xgb_shap"]
+
+# Batches de Keras (más grandes que 32/64: menos pasos por época, mejor uso de la CPU) y
+# de predicción; rondas sin mejora en validación antes de cortar XGBoost
+KERAS_BATCH_SIZE = 256
+PREDICT_BATCH_SIZE = 4096
+MIN_STEPS_PER_EPOCH = 20
+EARLY_STOPPING_ROUNDS = 10
+
+# Configuración de Random Forest y XGBoost (hyperparams_*.json la sobrescribe, ver src/tuning.py)
+DEFAULT_TREE_PARAMS = {
+    "Random Forest": {"n_estimators": 50, "max_depth": 10, "random_state": 42, "n_jobs": -1},
+    "XGBoost": {
+        "n_estimators": 100,
+        "learning_rate": 0.1,
+        "max_depth": 7,
+        "random_state": 42,
+        "tree_method": "hist",
+    },
+}
+HYPERPARAMS_FILES = {
+    "Random Forest": "hyperparams_randomforest.json",
+    "XGBoost": "hyperparams_xgboost.json",
+}
+
+# Restricción decreciente (-1) para variables de precio: a mayor precio, menor demanda esperada
+PRICE_FEATURES_MONOTONE = ["item_price_log", "price_rel_category", "price_rel_category_log"]
+
+
+def make_tf_dataset(
+    X: np.ndarray,
+    y: Optional[np.ndarray] = None,
+    sample_weight: Optional[np.ndarray] = None,
+    batch_size: int = KERAS_BATCH_SIZE,
+    shuffle: bool = True,
+    seed: int = 42,
+) -> "tf.data.Dataset":
+    """tf.data con batches en float32, barajado por índices y prefetch.
+
+    Se barajan sólo los índices (8 bytes por fila) y cada batch se arma con tf.gather,
+    así el barajado es completo sin un buffer con copias de las filas.
+    """
+    import tensorflow as tf
+
+    tensors = [tf.constant(np.asarray(X, dtype=np.float32))]
+    for values in (y, sample_weight):
+        if values is not None:
+            tensors.append(tf.constant(np.asarray(values, dtype=np.float32)))
+
+    indices = tf.data.Dataset.range(len(X))
+    if shuffle:
+        indices = indices.shuffle(len(X), seed=seed, reshuffle_each_iteration=True)
+    return (
+        indices.batch(batch_size)
+        .map(
+            lambda idx: tuple(tf.gather(tensor, idx) for tensor in tensors),
+            num_parallel_calls=tf.data.AUTOTUNE,
+        )
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
 
 class KerasRegressor(BaseEstimator, RegressorMixin):
     """Wrapper para modelos Keras compatible con sklearn (para Stacking)."""
 
-    def __init__(self, model_builder, epochs=50, batch_size=32, verbose=0):
+    def __init__(
+        self, model_builder, epochs=50, batch_size=KERAS_BATCH_SIZE, verbose=0, patience=5
+    ):
         self.model_builder = model_builder
         self.epochs = epochs
         self.batch_size = batch_size
         self.verbose = verbose
+        self.patience = patience
         self.model = None
 
-    def fit(self, X, y):
-        """Entrena el modelo Keras."""
+    def fit(self, X, y, sample_weight=None, validation_data=None):
+        """Entrena el modelo Keras con un pipeline tf.data.
+
+        Con validation_data=(X_val, y_val) el early stopping sigue la pérdida de
+        validación y se restauran los pesos de la mejor época; sin ella, la de entrenamiento.
+        """
+        from tensorflow.keras import callbacks
+
         self.model = self.model_builder(input_dim=X.shape[1])
-        early_stop = callbacks.EarlyStopping(monitor="loss", patience=5, restore_best_weights=True)
-        self.model.fit(
-            X,
-            y,
+        # En trains chicos el batch se reduce para no quedar con muy pocos pasos por época
+        batch_size = max(1, min(self.batch_size, len(X) // MIN_STEPS_PER_EPOCH))
+        train_data = make_tf_dataset(X, y, sample_weight, batch_size)
+        val_data = None
+        if validation_data is not None:
+            val_data = make_tf_dataset(
+                *validation_data, batch_size=PREDICT_BATCH_SIZE, shuffle=False
+            )
+        early_stop = callbacks.EarlyStopping(
+            monitor="loss" if val_data is None else "val_loss",
+            patience=self.patience,
+            restore_best_weights=True,
+        )
+        history = self.model.fit(
+            train_data,
+            validation_data=val_data,
             epochs=self.epochs,
-            batch_size=self.batch_size,
+            shuffle=False,  # el dataset ya se baraja por época
             verbose=self.verbose,
             callbacks=[early_stop],
         )
+        self.epochs_trained_ = len(history.epoch)
         return self
 
     def predict(self, X):
         """Realiza predicciones."""
-        return self.model.predict(X, verbose=0).flatten()
+        return self.model.predict(
+            np.asarray(X, dtype=np.float32), batch_size=PREDICT_BATCH_SIZE, verbose=0
+        ).flatten()
+
+
+def _oof_cache_key(
+    estimators: List[Tuple[str, BaseEstimator]],
+    X: np.ndarray,
+    y: np.ndarray,
+    sample_weight: Optional[np.ndarray],
+    n_splits: int,
+    eval_set: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    groups: Optional[np.ndarray] = None,
+) -> str:
+    """Huella de las matrices, los pesos, el eval_set, los meses y la configuración de los
+    modelos base.
+
+    early_stopping_rounds entra con los parámetros de cada modelo base.
+    """
+    digest = hashlib.sha256()
+    for values in (X, y, sample_weight, *(eval_set or ()), groups):
+        if values is not None:
+            values = np.ascontiguousarray(values)
+            digest.update(f"{values.dtype}{values.shape}".encode("utf-8"))
+            digest.update(values.data)
+    for name, estimator in estimators:
+        params = sorted(estimator.get_params(deep=False).items())
+        digest.update(f"{name}{type(estimator).__name__}{params}".encode("utf-8"))
+    digest.update(str(n_splits).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _fit_base_estimator(
+    estimator: BaseEstimator,
+    X: np.ndarray,
+    y: np.ndarray,
+    sample_weight: Optional[np.ndarray] = None,
+    eval_set: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> BaseEstimator:
+    """Entrena una copia de `estimator`; si tiene early_stopping_rounds usa `eval_set`.
+
+    XGBoost con early stopping predice hasta su mejor iteración, igual que el modelo
+    servido tras truncate_to_best_iteration.
+    """
+    fit_params = {"sample_weight": sample_weight}
+    if eval_set is not None and estimator.get_params().get("early_stopping_rounds"):
+        fit_params.update(eval_set=[eval_set], verbose=False)
+    return clone(estimator).fit(X, y, **fit_params)
+
+
+def time_series_oof_predictions(
+    estimators: List[Tuple[str, BaseEstimator]],
+    X: np.ndarray,
+    y: np.ndarray,
+    sample_weight: Optional[np.ndarray] = None,
+    n_splits: int = 5,
+    cache_dir: Optional[str] = None,
+    eval_set: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    groups: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Predicciones out-of-fold de los modelos base con folds temporales (TimeSeriesSplit).
+
+    Con `groups` (mes de cada fila) los folds se arman sobre los meses distintos: cada
+    fold entrena con las filas de meses anteriores y predice las del bloque de meses
+    siguiente, sin importar el orden de las filas. Sin `groups` los folds son bloques de
+    filas consecutivas, así que X debe estar en orden temporal (el train balanceado con
+    SMOTE no lo está: pierde date_block_num y agrega las filas sintéticas al final). En
+    ambos casos el primer bloque no tiene predicción OOF.
 
+    Parámetros:
+        estimators: lista (nombre, estimador sin entrenar)
+        X, y, sample_weight: datos de entrenamiento (pesos opcionales)
+        n_splits: folds de TimeSeriesSplit
+        cache_dir: directorio de caché .npz por hash de datos y modelos (None = sin caché)
+        eval_set: (X_val, y_val) para el early stopping de los modelos base que lo tengan
+            configurado (XGBoost), en cada fold como en el modelo servido
+        groups: date_block_num de cada fila (None = filas ya ordenadas por mes)
+
+    Retorna:
+        (predicciones [n_filas, n_modelos], máscara de filas con predicción OOF)
+    """
+    cache_path = None
+    if cache_dir is not None:
+        key = _oof_cache_key(estimators, X, y, sample_weight, n_splits, eval_set, groups)
+        cache_path = os.path.join(cache_dir, f"{key}.npz")
+        if os.path.exists(cache_path):
+            cached = np.load(cache_path)
+            print("  ♻️  Predicciones OOF del Stacking reutilizadas desde caché")
+            return cached["predictions"], cached["mask"]
+
+    predictions = np.full((len(y), len(estimators)), np.nan)
+    mask = np.zeros(len(y), dtype=bool)
+    splitter = TimeSeriesSplit(n_splits=n_splits)
+    if groups is None:
+        folds = splitter.split(X)
+    else:
+        groups = np.asarray(groups)
+        months = np.unique(groups)
+        folds = [
+            (
+                np.flatnonzero(groups < months[test][0]),
+                np.flatnonzero(np.isin(groups, months[test])),
+            )
+            for _, test in splitter.split(months)
+        ]
+    for train_idx, test_idx in folds:
+        fold_weight = None if sample_weight is None else sample_weight[train_idx]
+        for col, (_, estimator) in enumerate(estimators):
+            fitted = _fit_base_estimator(
+                estimator, X[train_idx], y[train_idx], fold_weight, eval_set
+            )
+            predictions[test_idx, col] = fitted.predict(X[test_idx])
+        mask[test_idx] = True
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, predictions=predictions, mask=mask)
+    return predictions, mask
+
+
+class TimeSeriesStackingRegressor(BaseEstimator, RegressorMixin):
+    """Stacking con meta-modelo ajustado sobre predicciones OOF temporales.
+
+    A diferencia de StackingRegressor, los modelos base finales pueden ser los ya
+    entrenados con todo el train (set_fitted_estimators) en vez de re-entrenar copias,
+    y las predicciones OOF se calculan una vez y pueden cachearse en disco. Expone
+    estimators_, named_estimators_ y final_estimator_ como StackingRegressor.
+    """
+
+    def __init__(self, estimators, final_estimator=None, n_splits=5, n_jobs=None):
+        self.estimators = estimators
+        self.final_estimator = final_estimator
+        self.n_splits = n_splits
+        self.n_jobs = n_jobs
+
+    def _base_estimators(self) -> List[Tuple[str, BaseEstimator]]:
+        """Copias sin entrenar de los modelos base (con n_jobs si se indicó)."""
+        base = []
+        for name, estimator in self.estimators:
+            estimator = clone(estimator)
+            if self.n_jobs is not None:
+                estimator.set_params(
+                    **{p: self.n_jobs for p in estimator.get_params() if p.endswith("n_jobs")}
+                )
+            base.append((name, estimator))
+        return base
+
+    def fit_final_estimator(
+        self, X, y, sample_weight=None, cache_dir=None, eval_set=None, groups=None
+    ):
+        """Ajusta el meta-modelo sobre las predicciones OOF de los modelos base.
+
+        `eval_set` se usa para el early stopping de los modelos base que lo tengan
+        configurado, así las predicciones OOF salen de modelos como los servidos. `groups`
+        (mes de cada fila) arma los folds por mes; X debe ser el train sin filas
+        sintéticas (ver time_series_oof_predictions).
+        """
+        predictions, mask = time_series_oof_predictions(
+            self._base_estimators(),
+            X,
+            y,
+            sample_weight,
+            self.n_splits,
+            cache_dir,
+            eval_set,
+            groups,
+        )
+        final = clone(self.final_estimator or LinearRegression())
+        final.fit(
+            predictions[mask],
+            np.asarray(y)[mask],
+            sample_weight=None if sample_weight is None else np.asarray(sample_weight)[mask],
+        )
+        self.final_estimator_ = final
+        return self
+
+    def set_fitted_estimators(self, fitted_estimators):
+        """Usa modelos base ya entrenados con todo el train, en el orden de `estimators`."""
+        self.estimators_ = list(fitted_estimators)
+        self.named_estimators_ = Bunch(
+            **{name: est for (name, _), est in zip(self.estimators, self.estimators_)}
+        )
+        return self
 
-def build_mlp_model(input_dim: int) -> keras.Model:
+    def fit(self, X, y, sample_weight=None, eval_set=None, groups=None):
+        """Ajusta el meta-modelo (OOF) y entrena los modelos base con todo el train."""
+        self.fit_final_estimator(X, y, sample_weight, eval_set=eval_set, groups=groups)
+        return self.set_fitted_estimators(
+            [
+                _fit_base_estimator(estimator, X, y, sample_weight, eval_set)
+                for _, estimator in self._base_estimators()
+            ]
+        )
+
+    def transform(self, X):
+        """Predicciones de los modelos base (entrada del meta-modelo)."""
+        return np.column_stack([estimator.predict(X) for estimator in self.estimators_])
+
+    def predict(self, X):
+        """Realiza predicciones."""
+        return self.final_estimator_.predict(self.transform(X))
+
+
+def build_mlp_model(input_dim: int) -> "keras.Model":
     """Construye un Multi-Layer Perceptron para regresión.
 
     Arquitectura: 3 capas ocultas con dropout para regularización.
     """
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
     model = keras.Sequential(
         [
             layers.Dense(128, activation="relu", input_dim=input_dim),
@@ -82,12 +419,15 @@ def build_mlp_model(input_dim: int) -> keras.Model:
     return model
 
 
-def build_lstm_model(input_dim: int) -> keras.Model:
+def build_lstm_model(input_dim: int) -> "keras.Model":
     """Construye una red LSTM simplificada para series temporales.
 
     Nota: En datasets tabulares pequeños, arquitecturas simples tipo DNN
     suelen funcionar mejor que LSTM tradicionales.
     """
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
     model = keras.Sequential(
         [
             layers.Dense(64, activation="relu", input_dim=input_dim),
@@ -110,6 +450,89 @@ def build_lstm_model(input_dim: int) -> keras.Model:
     return model
 
 
+def build_monotone_constraints(features: List[str]) -> Tuple[int, ...]:
+    """Restricciones monotónicas de XGBoost por posición de feature (ver PRICE_FEATURES_MONOTONE)."""
+    return tuple(-1 if feat in PRICE_FEATURES_MONOTONE else 0 for feat in features)
+
+
+def load_hyperparams(exports_dir: str = EXPORTS_DIR) -> Dict[str, Dict]:
+    """Hiperparámetros de los modelos de árboles desde `exports_dir`/hyperparams_*.json.
+
+    Retorna un diccionario por modelo (sólo los archivos que existen), listo para
+    build_estimator(hyperparams=...).
+    """
+    hyperparams = {}
+    for name, file_name in HYPERPARAMS_FILES.items():
+        path = os.path.join(exports_dir, file_name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                hyperparams[name] = json.load(f)
+    return hyperparams
+
+
+def tree_params(name: str, hyperparams: Optional[Dict[str, Dict]] = None) -> Dict:
+    """Parámetros de Random Forest o XGBoost: DEFAULT_TREE_PARAMS + hiperparámetros válidos.
+
+    Las claves desconocidas para el estimador y las restricciones monotónicas (que se
+    derivan de las features) se ignoran.
+    """
+    params = dict(DEFAULT_TREE_PARAMS[name])
+    valid = (RandomForestRegressor if name == "Random Forest" else XGBRegressor)().get_params()
+    for key, value in (hyperparams or {}).get(name, {}).items():
+        if key in valid and key != "monotone_constraints":
+            params[key] = value
+    return params
+
+
+def build_estimator(
+    name: str, features: List[str], hyperparams: Optional[Dict[str, Dict]] = None
+) -> BaseEstimator:
+    """Estimador sin entrenar con la configuración de train_models.
+
+    Los modelos de Deep Learning se envuelven con su StandardScaler en un Pipeline de
+    sklearn para poder entrenarlos y evaluarlos igual que los demás.
+
+    Parámetros:
+        name: modelo de MODEL_NAMES o SHAP_MODEL_NAME
+        features: nombres de las columnas de X (para las restricciones monotónicas)
+        hyperparams: hiperparámetros por modelo para Random Forest y XGBoost (también los
+            del Stacking); None = DEFAULT_TREE_PARAMS (ver load_hyperparams)
+
+    Raises:
+        ValueError: si el modelo no está en MODEL_NAMES
+    """
+    if name == "Random Forest":
+        return RandomForestRegressor(**tree_params(name, hyperparams))
+    if name == "XGBoost":
+        return XGBRegressor(
+            **tree_params(name, hyperparams),
+            monotone_constraints=build_monotone_constraints(features),
+        )
+    if name == "MLP":
+        return make_pipeline(
+            StandardScaler(),
+            KerasRegressor(build_mlp_model, epochs=100, patience=10),
+        )
+    if name == "LSTM-DNN":
+        return make_pipeline(
+            StandardScaler(),
+            KerasRegressor(build_lstm_model, epochs=150, patience=10),
+        )
+    if name == "Stacking Ensemble":
+        # Mismos modelos base que los entrenados por separado, para poder reutilizarlos
+        estimators = [
+            ("rf", build_estimator("Random Forest", features, hyperparams)),
+            ("xgb", build_estimator("XGBoost", features, hyperparams)),
+        ]
+        return TimeSeriesStackingRegressor(
+            estimators=estimators, final_estimator=LinearRegression()
+        )
+    if name == SHAP_MODEL_NAME:
+        # Modelo simple para SHAP (TreeExplainer requiere modelos de árbol)
+        return XGBRegressor(n_estimators=50, max_depth=5, tree_method="hist")
+    raise ValueError(f"Modelo desconocido: {name}. Opciones: {MODEL_NAMES + [SHAP_MODEL_NAME]}")
+
+
 def evaluate_model(y_true: np.ndarray, y_pred: np.ndarray, model_name: str) -> dict:
     """Calcula métricas de evaluación para un modelo.
 
@@ -126,51 +549,188 @@ def evaluate_model(y_true: np.ndarray, y_pred: np.ndarray, model_name: str) -> d
     return metrics
 
 
-def train_models(use_balancing: bool = False, rolling_windows: Optional[List[int]] = None) -> None:
+def resolve_model_jobs(models: Optional[List[str]] = None) -> Optional[List[str]]:
+    """Traduce claves de MODEL_KEYS (o nombres completos) a trabajos del orquestador.
+
+    Retorna:
+        Lista de trabajos sin repetidos, o None si `models` es None (todos los modelos)
+
+    Raises:
+        ValueError: si `models` está vacío o algún modelo no está en MODEL_KEYS
+    """
+    if models is None:
+        return None
+    if not models:
+        raise ValueError(f"Se debe indicar al menos un modelo. Opciones: {list(MODEL_KEYS)}")
+    names = {**MODEL_KEYS, **{name: name for name in MODEL_KEYS.values()}}
+    unknown = [model for model in models if model not in names]
+    if unknown:
+        raise ValueError(f"Modelos desconocidos: {unknown}. Opciones: {list(MODEL_KEYS)}")
+    return list(dict.fromkeys(names[model] for model in models))
+
+
+def check_subset_features(jobs: Optional[List[str]], features: List[str]) -> None:
+    """Rechaza un reentrenamiento parcial que cambia las features de los modelos guardados.
+
+    Los modelos fuera de `jobs` (y el scaler de los modelos Keras) conservan sus
+    artefactos, entrenados con models/features.pkl: con otras features (ej. otras ventanas
+    rolling) quedarían desalineados con el features.pkl nuevo.
+
+    Raises:
+        ValueError: si algún modelo no se reentrena y `features` difiere de las guardadas
+    """
+    features_path = os.path.join(MODELS_DIR, "features.pkl")
+    if jobs is None or not os.path.exists(features_path):
+        return
+    if joblib.load(features_path) == features:
+        return
+    trained = set(jobs)
+    if STACKING_MODEL_NAME in trained:
+        trained.update(STACKING_BASE_JOBS)
+    stale = [name for name in MODEL_NAMES + [SHAP_MODEL_NAME] if name not in trained]
+    if stale:
+        raise ValueError(
+            f"Las features difieren de las de models/features.pkl y {stale} no se "
+            "reentrenarían. Reentrenar todos los modelos (models=None) o usar las ventanas "
+            "rolling de la corrida anterior."
+        )
+
+
+def merge_metrics(metrics_path: str, trained: Dict[str, dict]) -> List[dict]:
+    """Combina las métricas recién calculadas con las de metrics.json para el resto.
+
+    Los modelos que no se reentrenaron conservan sus métricas (y sus artefactos), así que
+    metrics.json sigue describiendo todos los modelos en models/.
+
+    Retorna:
+        Métricas en el orden de MODEL_NAMES (sólo los modelos con métricas)
+    """
+    previous = {}
+    if os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            previous = {m["model"]: m for m in json.load(f)}
+    merged = {**previous, **trained}
+    return [merged[name] for name in MODEL_NAMES if name in merged]
+
+
+def train_models(
+    use_balancing: bool = False,
+    rolling_windows: Optional[List[int]] = None,
+    cache_stages: bool = False,
+    window_bank: bool = False,
+    feature_n_jobs: int = 1,
+    low_memory: bool = False,
+    lazy_features: bool = False,
+    balance_mode: str = "smote",
+    n_jobs: int = 1,
+    xgb_external_memory: bool = False,
+    tuned_hyperparams: bool = False,
+    models: Optional[List[str]] = None,
+    resume: bool = False,
+) -> None:
     """Pipeline completo de entrenamiento con modelos tradicionales y Deep Learning.
 
+    Los valores por defecto reproducen el entrenamiento original (secuencial, sin cachés
+    en disco); la paralelización y los cachés se activan explícitamente (CLI o /retrain).
+
     Parámetros:
-        use_balancing: activar SMOTE en entrenamiento
+        use_balancing: balancear el entrenamiento por bins de demanda (ver balance_mode)
         rolling_windows: tamaños de ventanas rolling (None = usar DEFAULT_ROLLING_WINDOWS)
+        cache_stages: reutilizar las etapas del pipeline de datos cacheadas en disco
+            (data/pipeline_cache/) y las predicciones OOF del Stacking (data/oof_cache/)
+        window_bank: seleccionar las ventanas desde el banco precalculado (activa cache_stages)
+        feature_n_jobs: procesos para el feature engineering por tienda (-1 = todos los núcleos)
+        low_memory: construir las features en float32 y sin copias intermedias
+        lazy_features: calcular sólo las features que usan los modelos (y sus dependencias)
+        balance_mode: "smote" sobremuestrea el train; "weights" conserva su tamaño y pasa
+            pesos inversos a la frecuencia de cada bin a todos los modelos
+        n_jobs: procesos para entrenar los modelos en paralelo, con los núcleos repartidos
+            entre ellos (-1 = todos los núcleos; 1 = secuencial en este proceso)
+        xgb_external_memory: entrenar XGBoost en memoria externa desde chunks Parquet del
+            train (para matrices que no caben en memoria; ver src/xgb_external.py)
+        tuned_hyperparams: configurar Random Forest y XGBoost (y el Stacking) con
+            exports/hyperparams_*.json (ver src/tuning.py) en vez de DEFAULT_TREE_PARAMS
+        models: claves de MODEL_KEYS a entrenar (None = todos; ej. PRODUCTION_MODELS). Los
+            demás modelos conservan sus artefactos y métricas, así que las features deben
+            ser las de la corrida anterior (ver check_subset_features); sin MLP ni LSTM-DNN
+            no se importa TensorFlow ni se ajusta el StandardScaler
+        resume: reanudar la corrida interrumpida con los mismos datos y configuración,
+            reutilizando las etapas completas de su directorio en RUNS_DIR (False = descartar
+            las corridas interrumpidas y empezar de cero)
+
+    Raises:
+        ValueError: si balance_mode no es válido, algún modelo no está en MODEL_KEYS o un
+            subconjunto de modelos cambia las features guardadas
     """
+    if balance_mode not in BALANCE_MODES:
+        raise ValueError(f"balance_mode debe ser uno de {BALANCE_MODES}. Recibido: {balance_mode}")
+    jobs = resolve_model_jobs(models)
+    use_weights = use_balancing and balance_mode == "weights"
+
     # Validar y usar ventanas rolling
     if rolling_windows is None:
         rolling_windows = DEFAULT_ROLLING_WINDOWS
     rolling_windows = validate_rolling_windows(rolling_windows)
 
-    # Obtener datos procesados (ahora con rolling windows parametrizados)
-    train, val, _, tscv = prepare_full_pipeline(
-        use_balancing=use_balancing, rolling_windows=rolling_windows
-    )
+    # El banco de ventanas se persiste como etapa del pipeline
+    cache_stages = cache_stages or window_bank
 
     # Generar features dinámicamente basadas en rolling_windows
-    features = [
-        "shop_cluster",
-        "item_category_id",
-        "item_price_log",  # Precio normalizado con log
-        "item_cnt_lag_1_log",  # Lags de ventas normalizados
-        "item_cnt_lag_2_log",
-        "item_cnt_lag_3_log",
-        "price_rel_category",  # Precio relativo a categoría
-        "price_rel_category_log",  # Versión normalizada
-        "price_discount",  # Ratio de descuento
-        "is_new_price",  # Indicador de cambio de precio
-        "price_change_pct",  # Cambio porcentual de precio
-        "price_change_2m_pct",  # Cambio de precio en 2 meses
-        "revenue_potential_log",  # Ingreso potencial normalizado
-        "price_demand_elasticity",  # Elasticidad precio-demanda
-    ]
-
-    # Agregar features de rolling windows dinámicamente
-    for window in rolling_windows:
-        features.append(f"rolling_mean_{window}")
-        features.append(f"rolling_std_{window}")
+    features = get_model_features(rolling_windows)
+    check_subset_features(jobs, features)
+
+    # Obtener datos procesados (ahora con rolling windows parametrizados), con el perfil
+    # de cada etapa para run_profile.json
+    stages_profile: List[Dict] = []
+    pipeline_params = dict(
+        rolling_windows=rolling_windows,
+        cache_stages=cache_stages,
+        window_bank=window_bank,
+        n_jobs=feature_n_jobs,
+        low_memory=low_memory,
+        features=features if lazy_features else None,
+        profile=stages_profile,
+    )
+    train, val, test, tscv = prepare_full_pipeline(**pipeline_params)
+
+    # Los metadatos de precios salen del train sin balancear: las filas sintéticas de SMOTE
+    # interpolan item_id, categoría y precio
+    price_train = train
+    if use_balancing and not use_weights:
+        if cache_stages:
+            # La etapa balance (y split) se leen del caché de etapas
+            train = prepare_full_pipeline(use_balancing=True, **pipeline_params)[0]
+        elif len(train) > 100:
+            with profile_stage("balance", stages_profile, rows=len(train)):
+                train = balance_train_set(train)
+
     target = "target_log"
 
-    X_train = train[features].values
+    # float32: mitad de memoria que float64 y el tipo que usan XGBoost, RF y Keras internamente
+    X_train = train[features].to_numpy(dtype=np.float32)
     y_train = train[target].values
-    X_val = val[features].values
+    X_val = val[features].to_numpy(dtype=np.float32)
     y_val = val[target].values
+    # val elige la mejor iteración/época (early stopping): las métricas se reportan en test
+    X_test = test[features].to_numpy(dtype=np.float32)
+    y_test = test[target].values
+
+    # Pesos por muestra en vez de filas sintéticas (None = sin pesos)
+    sample_weight = compute_balance_weights(train[target]) if use_weights else None
+
+    # Folds OOF del Stacking por mes de cada fila. El train balanceado con SMOTE no tiene
+    # meses y sus filas sintéticas mezclan meses: el Stacking calcula entonces sus OOF
+    # sobre el train sin balancear, con el balanceo como pesos en el ajuste de cada fold
+    train_months, oof_train = None, None
+    if train is price_train:
+        train_months = train["date_block_num"].to_numpy()
+    elif jobs is None or STACKING_MODEL_NAME in jobs:
+        oof_train = (
+            price_train[features].to_numpy(dtype=np.float32),
+            price_train[target].values,
+            price_train["date_block_num"].to_numpy(),
+            compute_balance_weights(price_train[target]),
+        )
 
     print(f"🚀 Iniciando entrenamiento con {X_train.shape[0]} muestras...")
     print(f"📊 Features: {len(features)}")
@@ -180,121 +740,129 @@ def train_models(use_balancing: bool = False, rolling_windows: Optional[List[int
     print(f"   - Elasticidad: price_demand_elasticity, price_change_pct")
     print(f"   - Otras: shop_cluster, item_category_id")
 
-    # Calcular y guardar precios promedio por categoría para inferencia
-    print("💾 Generando metadatos de precios (category_prices.pkl)...")
-    category_prices = train.groupby("item_category_id")["item_price"].median().to_dict()
-    joblib.dump(category_prices, os.path.join(MODELS_DIR, "category_prices.pkl"))
-
-    # Diccionario para almacenar métricas de todos los modelos
-    all_metrics = []
-
-    # Entrenar modelos tradicionales
-    print("\n🔨 Entrenando modelos tradicionales...")
-
-    rf_model = RandomForestRegressor(n_estimators=50, max_depth=10, random_state=42, n_jobs=-1)
-    rf_model.fit(X_train, y_train)
-    rf_preds = rf_model.predict(X_val)
-    all_metrics.append(evaluate_model(np.expm1(y_val), np.expm1(rf_preds), "Random Forest"))
-
-    # Configurar restricciones monotónicas para XGBoost
-    # Mapear nombres de features a índices para monotone_constraints
-    feature_names = features
-    monotone_dict = {}
-
-    # Restricción decreciente (-1) para variables de precio
-    # A mayor precio, menor demanda esperada
-    price_features_monotone = ["item_price_log", "price_rel_category", "price_rel_category_log"]
-
-    for feat in price_features_monotone:
-        if feat in feature_names:
-            idx = feature_names.index(feat)
-            monotone_dict[idx] = -1  # Restricción decreciente
-
-    # Convertir diccionario a tupla ordenada por índice
-    monotone_constraints = tuple(monotone_dict.get(i, 0) for i in range(len(feature_names)))
-
-    print(
-        f"  Restricciones monotónicas aplicadas: {sum(1 for x in monotone_constraints if x != 0)} features"
-    )
-
-    xgb_model = XGBRegressor(
-        n_estimators=100,
-        learning_rate=0.1,
-        max_depth=7,
-        random_state=42,
-        monotone_constraints=monotone_constraints,
-    )
-    xgb_model.fit(X_train, y_train)
-    xgb_preds = xgb_model.predict(X_val)
-    all_metrics.append(evaluate_model(np.expm1(y_val), np.expm1(xgb_preds), "XGBoost"))
-
-    # Entrenar modelos de Deep Learning
-    print("\n🧠 Entrenando modelos de Deep Learning...")
-
-    # Normalizar features para Deep Learning (importante para convergencia)
-    from sklearn.preprocessing import StandardScaler
-
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_val_scaled = scaler.transform(X_val)
-
-    # Guardar scaler para inferencia
-    joblib.dump(scaler, os.path.join(MODELS_DIR, "scaler.pkl"))
-
-    # MLP (Multi-Layer Perceptron)
-    print("  Entrenando MLP...")
-    mlp_model = build_mlp_model(input_dim=X_train_scaled.shape[1])
-    early_stop = callbacks.EarlyStopping(monitor="loss", patience=10, restore_best_weights=True)
-    mlp_model.fit(
-        X_train_scaled, y_train, epochs=100, batch_size=64, verbose=0, callbacks=[early_stop]
-    )
-    mlp_preds = mlp_model.predict(X_val_scaled, verbose=0).flatten()
-    all_metrics.append(evaluate_model(np.expm1(y_val), np.expm1(mlp_preds), "MLP"))
-
-    # LSTM simplificada (arquitectura tipo DNN para datos tabulares)
-    print("  Entrenando LSTM (DNN Architecture)...")
-    lstm_model = build_lstm_model(input_dim=X_train_scaled.shape[1])
-    lstm_model.fit(
-        X_train_scaled, y_train, epochs=150, batch_size=32, verbose=0, callbacks=[early_stop]
-    )
-    lstm_preds = lstm_model.predict(X_val_scaled, verbose=0).flatten()
-    all_metrics.append(evaluate_model(np.expm1(y_val), np.expm1(lstm_preds), "LSTM-DNN"))
-
-    # Stacking Regressor con modelos tradicionales
-    print("\n🏗️  Entrenando Stacking Ensemble...")
-    estimators = [
-        ("rf", RandomForestRegressor(n_estimators=50, max_depth=10, random_state=42, n_jobs=-1)),
-        ("xgb", XGBRegressor(n_estimators=100, learning_rate=0.1, max_depth=7, random_state=42)),
-    ]
-
-    stacking_model = StackingRegressor(
-        estimators=estimators, final_estimator=LinearRegression(), n_jobs=-1
-    )
-    stacking_model.fit(X_train, y_train)
-    stacking_preds = stacking_model.predict(X_val)
-    all_metrics.append(
-        evaluate_model(np.expm1(y_val), np.expm1(stacking_preds), "Stacking Ensemble")
+    # Directorio de la corrida (staging): cada etapa deja allí su artefacto y su marcador de
+    # completitud, y models/ sólo se actualiza al final. La huella (datos + configuración)
+    # permite reanudar con resume=True una corrida interrumpida sin repetir sus etapas
+    hyperparams = load_hyperparams() if tuned_hyperparams else None
+    run_key = training_run_key(
+        [
+            X_train,
+            y_train,
+            X_val,
+            y_val,
+            X_test,
+            y_test,
+            sample_weight,
+            train_months,
+            *(oof_train or ()),
+        ],
+        {
+            "features": features,
+            "jobs": jobs,
+            "hyperparams": hyperparams,
+            "xgb_external_memory": xgb_external_memory,
+        },
     )
+    run_dir = os.path.join(RUNS_DIR, run_key)
+    if not resume:
+        shutil.rmtree(run_dir, ignore_errors=True)  # descartar una corrida interrumpida previa
+    elif os.path.isdir(run_dir):
+        print(f"♻️  Reanudando la corrida {run_key} desde {run_dir}")
+    os.makedirs(run_dir, exist_ok=True)
+
+    try:
+        if not completed_stage(run_dir, "price_metadata", PRICE_METADATA_FILES)[0]:
+            price_history = pd.concat([price_train, val, test])
+            with profile_stage("price_metadata", stages_profile, rows=len(price_history)):
+                # Precios promedio por categoría para inferencia
+                print("💾 Generando metadatos de precios (category_prices.pkl)...")
+                category_prices = (
+                    price_train.groupby("item_category_id")["item_price"].median().to_dict()
+                )
+                joblib.dump(category_prices, os.path.join(run_dir, "category_prices.pkl"))
+
+                # Precio máximo histórico por item para calcular price_discount en inferencia
+                print("💾 Generando máximo histórico de precios por item (item_price_max.pkl)...")
+                item_price_max = build_item_price_max(
+                    price_history.astype({"item_id": int})
+                ).to_dict()
+                joblib.dump(item_price_max, os.path.join(run_dir, "item_price_max.pkl"))
+            mark_stage_done(run_dir, "price_metadata")
+
+        # Restricciones monotónicas de XGBoost (decrecientes para variables de precio)
+        monotone_constraints = build_monotone_constraints(features)
+        print(
+            f"  Restricciones monotónicas aplicadas: {sum(1 for x in monotone_constraints if x != 0)} features"
+        )
 
-    # Guardar métricas en JSON
-    metrics_path = os.path.join(MODELS_DIR, "metrics.json")
-    with open(metrics_path, "w") as f:
-        json.dump(all_metrics, f, indent=2)
-    print(f"\n📊 Métricas guardadas en: {metrics_path}")
-
-    # Guardar modelos principales y configuración
-    print(f"\n💾 Guardando modelos y configuración...")
-    joblib.dump(stacking_model, os.path.join(MODELS_DIR, "stacking_model.pkl"))
-    joblib.dump(features, os.path.join(MODELS_DIR, "features.pkl"))
-    joblib.dump(rolling_windows, os.path.join(MODELS_DIR, "rolling_windows.pkl"))
-
-    # Guardar modelos de Deep Learning
-    mlp_model.save(os.path.join(MODELS_DIR, "mlp_model.keras"))
-    lstm_model.save(os.path.join(MODELS_DIR, "lstm_model.keras"))
+        # Entrenar los modelos como trabajos concurrentes (ver src/orchestrator.py)
+        if jobs is None:
+            print("\n🔨 Entrenando modelos tradicionales, de Deep Learning y Stacking Ensemble...")
+        else:
+            print(f"\n🔨 Entrenando sólo: {', '.join(jobs)}")
+        results = run_training_jobs(
+            run_dir,
+            X_train,
+            y_train,
+            X_val,
+            y_val,
+            features,
+            jobs=jobs,
+            sample_weight=sample_weight,
+            train_months=train_months,
+            oof_train=oof_train,
+            X_test=X_test,
+            y_test=y_test,
+            n_jobs=n_jobs,
+            oof_cache_dir=OOF_CACHE_DIR if cache_stages else None,
+            xgb_external_memory=xgb_external_memory,
+            hyperparams=hyperparams,
+        )
 
-    # Modelo simple para SHAP (TreeExplainer requiere modelos de árbol)
-    xgb_simple = XGBRegressor(n_estimators=50, max_depth=5).fit(X_train, y_train)
-    joblib.dump(xgb_simple, os.path.join(MODELS_DIR, "xgb_simple_shap.pkl"))
+        # Métricas en JSON (los modelos no entrenados conservan las anteriores)
+        metrics_path = os.path.join(MODELS_DIR, "metrics.json")
+        trained = {name: results[name]["metrics"] for name in MODEL_NAMES if name in results}
+        all_metrics = merge_metrics(metrics_path, trained)
+        with open(os.path.join(run_dir, "metrics.json"), "w") as f:
+            json.dump(all_metrics, f, indent=2)
+
+        joblib.dump(features, os.path.join(run_dir, "features.pkl"))
+        joblib.dump(rolling_windows, os.path.join(run_dir, "rolling_windows.pkl"))
+
+        # Perfil de la corrida: etapas de datos y, por modelo, su fit y su predicción
+        for result in results.values():
+            stages_profile.extend(result["profile"].values())
+        with open(os.path.join(run_dir, RUN_PROFILE_FILE), "w") as f:
+            json.dump(
+                {
+                    "run_key": run_key,
+                    "train_rows": len(X_train),
+                    "val_rows": len(X_val),
+                    "test_rows": len(X_test),
+                    "stages": stages_profile,
+                },
+                f,
+                indent=2,
+            )
+
+        # Promover modelos, scaler y configuración a models/ (metrics.json al final)
+        print(f"\n💾 Guardando modelos y configuración...")
+        artifacts = [r["artifact"] for r in results.values() if r["artifact"]]
+        if os.path.exists(os.path.join(run_dir, "scaler.pkl")):
+            artifacts.append("scaler.pkl")  # sólo si se entrenó algún modelo Keras
+        artifacts += PRICE_METADATA_FILES + ["features.pkl", "rolling_windows.pkl"]
+        artifacts += [RUN_PROFILE_FILE, "metrics.json"]
+        promote_run(run_dir, artifacts, MODELS_DIR)
+        print(f"📊 Métricas guardadas en: {metrics_path}")
+    except BaseException:
+        print(
+            f"\n❌ Entrenamiento interrumpido: las etapas completas quedan en {run_dir}. "
+            "Reanudar con train_models(resume=True) y la misma configuración."
+        )
+        raise
+    shutil.rmtree(run_dir, ignore_errors=True)
+    if not os.listdir(RUNS_DIR):
+        os.rmdir(RUNS_DIR)
 
     print(f"✅ Entrenamiento completado. Modelos guardados en: {MODELS_DIR}")
 
@@ -304,15 +872,21 @@ def train_models(use_balancing: bool = False, rolling_windows: Optional[List[int
     print(f"\n📦 Exporting predictions for analysis...")
 
     # Create exports directory
-    EXPORTS_DIR = os.path.join(os.path.dirname(MODELS_DIR), "exports")
     os.makedirs(EXPORTS_DIR, exist_ok=True)
 
     # Export predictions with residuals for key models
-    models_to_export = {"randomforest": rf_model, "xgboost": xgb_model, "stacking": stacking_model}
+    models_to_export = {
+        "randomforest": "Random Forest",
+        "xgboost": "XGBoost",
+        "stacking": "Stacking Ensemble",
+    }
+
+    for model_name, job_name in models_to_export.items():
+        if job_name not in results:
+            continue  # model not retrained in this run: keep its previous export
 
-    for model_name, model in models_to_export.items():
-        # Generate predictions on validation set
-        y_pred_log = model.predict(X_val)
+        # Validation predictions computed by the training job
+        y_pred_log = results[job_name]["val_preds"]
 
         # Convert to original scale
         y_true_original = np.expm1(y_val)
@@ -321,9 +895,9 @@ def train_models(use_balancing: bool = False, rolling_windows: Optional[List[int
         # Create predictions DataFrame with metadata
         predictions_df = pd.DataFrame(
             {
-                "y_true": y_true_original.values,
+                "y_true": y_true_original,
                 "y_pred": y_pred_original,
-                "residual": y_true_original.values - y_pred_original,
+                "residual": y_true_original - y_pred_original,
                 "shop_cluster": val["shop_cluster"].values,
                 "item_category_id": val["item_category_id"].values,
                 "date_block_num": val["date_block_num"].values,
@@ -339,7 +913,7 @@ def train_models(use_balancing: bool = False, rolling_windows: Optional[List[int
 
     # Mostrar ranking de modelos
     sorted_metrics = sorted(all_metrics, key=lambda x: x["r2"], reverse=True)
-    print(f"\n🏆 Ranking de modelos (por R²):")
+    print(f"\n🏆 Ranking de modelos (por R² en test):")
     for i, m in enumerate(sorted_metrics, 1):
         print(f"  {i}. {m['model']:25s} -> R²: {m['r2']:.4f}")
 
@@ -349,5 +923,40 @@ def train_models(use_balancing: bool = False, rolling_windows: Optional[List[int
     print("   están disponibles para comparación y futuros experimentos.")
 
 
+def main() -> None:
+    """CLI del entrenamiento (sin opciones = entrenamiento secuencial sin cachés)."""
+    parser = argparse.ArgumentParser(description="Entrenamiento de los modelos de demanda")
+    parser.add_argument("--windows", type=int, nargs=2, default=DEFAULT_ROLLING_WINDOWS)
+    parser.add_argument("--balancing", action="store_true")
+    parser.add_argument("--balance-mode", choices=BALANCE_MODES, default="smote")
+    parser.add_argument("--models", nargs="+", default=None, choices=list(MODEL_KEYS))
+    parser.add_argument("--n-jobs", type=int, default=1)
+    parser.add_argument("--feature-n-jobs", type=int, default=1)
+    parser.add_argument("--cache-stages", action="store_true")
+    parser.add_argument("--window-bank", action="store_true")
+    parser.add_argument("--lazy-features", action="store_true")
+    parser.add_argument("--low-memory", action="store_true")
+    parser.add_argument("--xgb-external-memory", action="store_true")
+    parser.add_argument("--tuned", action="store_true")
+    parser.add_argument("--resume", action="store_true")
+    args = parser.parse_args()
+
+    train_models(
+        use_balancing=args.balancing,
+        rolling_windows=args.windows,
+        cache_stages=args.cache_stages,
+        window_bank=args.window_bank,
+        feature_n_jobs=args.feature_n_jobs,
+        low_memory=args.low_memory,
+        lazy_features=args.lazy_features,
+        balance_mode=args.balance_mode,
+        n_jobs=args.n_jobs,
+        xgb_external_memory=args.xgb_external_memory,
+        tuned_hyperparams=args.tuned,
+        models=args.models,
+        resume=args.resume,
+    )
+
+
 if __name__ == "__main__":
-    train_models()
+    main()
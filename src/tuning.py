@@ -0,0 +1,297 @@
+"""
+Búsqueda de hiperparámetros por successive halving para Random Forest y XGBoost.
+
+Parte de exports/hyperparams_{randomforest,xgboost}.json: la configuración actual es
+el primer candidato y el resto se muestrea alrededor de ella (SEARCH_SPACES). Cada
+ronda evalúa los candidatos vivos con una fracción de los recursos (las filas más
+recientes del train y una fracción de los árboles) sobre el split de validación y
+conserva el mejor 1/eta; la última ronda usa el train completo y todos los árboles.
+Las matrices salen del pipeline por etapas (caché en disco) y se escriben una vez como
+.npy que los procesos abren mapeados en memoria (ver src/orchestrator.py). Las
+configuraciones ganadoras se escriben en los mismos JSON, que train_models consume
+con tuned_hyperparams=True.
+
+Uso:
+    python -m src.tuning [--models XGBoost] [--candidates 27] [--eta 3] [--n-jobs -1]
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from sklearn.metrics import mean_squared_error
+
+from src.data_processing import (
+    DEFAULT_ROLLING_WINDOWS,
+    get_model_features,
+    prepare_full_pipeline,
+    validate_rolling_windows,
+)
+from src.orchestrator import load_run_matrix, split_cpu_budget, write_training_matrices
+from src.train import (
+    EXPORTS_DIR,
+    HYPERPARAMS_FILES,
+    build_estimator,
+    load_hyperparams,
+    tree_params,
+)
+
+# Valores alternativos por hiperparámetro (n_estimators es el recurso de cada ronda)
+SEARCH_SPACES = {
+    "Random Forest": {
+        "max_depth": [6, 10, 14, 20, None],
+        "min_samples_leaf": [1, 3, 10],
+        "max_features": [1.0, 0.7, 0.4],
+    },
+    "XGBoost": {
+        "max_depth": [4, 5, 7, 9],
+        "learning_rate": [0.05, 0.1, 0.2],
+        "subsample": [0.7, 0.8, 1.0],
+        "colsample_bytree": [0.6, 0.8, 1.0],
+        "min_child_weight": [1, 5, 10],
+    },
+}
+
+# Árboles mínimos por candidato en las rondas con pocos recursos
+MIN_ESTIMATORS = 10
+
+
+def sample_candidates(
+    model_name: str, seed_params: Dict, n_candidates: int, random_state: int = 42
+) -> List[Dict]:
+    """Candidatos distintos: `seed_params` primero y el resto muestreado de SEARCH_SPACES.
+
+    La grilla se recorre en orden aleatorio sin repetir: si la semilla ya es una de sus
+    combinaciones (p. ej. un JSON escrito por una búsqueda anterior) se retornan a lo sumo
+    las combinaciones de la grilla.
+    """
+    rng = np.random.default_rng(random_state)
+    space = SEARCH_SPACES[model_name]
+    grid = list(itertools.product(*space.values()))
+
+    candidates = [dict(seed_params)]
+    seen = {json.dumps(seed_params, sort_keys=True)}
+    for index in rng.permutation(len(grid)):
+        if len(candidates) >= n_candidates:
+            break
+        candidate = {**seed_params, **dict(zip(space, grid[index]))}
+        encoded = json.dumps(candidate, sort_keys=True)
+        if encoded not in seen:
+            seen.add(encoded)
+            candidates.append(candidate)
+    return candidates
+
+
+def _score_candidate(
+    run_dir: str,
+    model_name: str,
+    params: Dict,
+    features: List[str],
+    fraction: float,
+    n_threads: Optional[int] = None,
+) -> float:
+    """RMSE de validación (escala original) de un candidato con una fracción de recursos."""
+    from threadpoolctl import threadpool_limits
+
+    X_train = load_run_matrix(run_dir, "X_train")
+    y_train = load_run_matrix(run_dir, "y_train")
+    X_val = load_run_matrix(run_dir, "X_val")
+    y_val = load_run_matrix(run_dir, "y_val")
+    sample_weight = load_run_matrix(run_dir, "sample_weight")
+
+    # Filas más recientes del train (ordenado por mes) y una fracción de los árboles
+    rows = slice(len(y_train) - max(1, int(len(y_train) * fraction)), None)
+    n_estimators = max(MIN_ESTIMATORS, int(params["n_estimators"] * fraction))
+    estimator = build_estimator(
+        model_name, features, {model_name: {**params, "n_estimators": n_estimators}}
+    )
+    if n_threads is not None:
+        estimator.set_params(n_jobs=n_threads)
+
+    with threadpool_limits(limits=n_threads):
+        estimator.fit(
+            X_train[rows],
+            y_train[rows],
+            sample_weight=None if sample_weight is None else sample_weight[rows],
+        )
+        preds = estimator.predict(X_val)
+    return float(np.sqrt(mean_squared_error(np.expm1(y_val), np.expm1(preds))))
+
+
+def successive_halving(
+    run_dir: str,
+    model_name: str,
+    candidates: List[Dict],
+    features: List[str],
+    eta: int = 3,
+    n_jobs: int = -1,
+) -> Dict:
+    """Successive halving sobre los candidatos con las matrices de `run_dir`.
+
+    Cada ronda conserva los ceil(vivos / eta) mejores hasta quedar uno (con n candidatos,
+    ~log_eta(n) + 1 rondas); la ronda r usa la fracción eta^(r - última) de filas y árboles.
+
+    Retorna:
+        Diccionario con params (ganador), rmse (de la última ronda) y history (por ronda)
+    """
+    n_rounds, remaining = 1, len(candidates)
+    while remaining > 1:
+        remaining = math.ceil(remaining / eta)
+        n_rounds += 1
+    alive = list(candidates)
+    history = []
+
+    for round_idx in range(n_rounds):
+        fraction = float(eta) ** (round_idx - (n_rounds - 1))
+        workers, n_threads = split_cpu_budget(n_jobs, len(alive))
+        start = time.perf_counter()
+        if workers == 1:
+            scores = [
+                _score_candidate(run_dir, model_name, params, features, fraction)
+                for params in alive
+            ]
+        else:
+            # spawn: mismo contexto que el orquestador de entrenamiento
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                scores = list(
+                    executor.map(
+                        _score_candidate,
+                        [run_dir] * len(alive),
+                        [model_name] * len(alive),
+                        alive,
+                        [features] * len(alive),
+                        [fraction] * len(alive),
+                        [n_threads] * len(alive),
+                    )
+                )
+
+        ranking = np.argsort(scores, kind="stable")
+        history.append(
+            {
+                "round": round_idx,
+                "fraction": fraction,
+                "candidates": len(alive),
+                "best_rmse": float(scores[ranking[0]]),
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+        )
+        print(
+            f"  🔎 {model_name} ronda {round_idx + 1}/{n_rounds}: {len(alive)} candidatos "
+            f"con {fraction:.0%} de filas y árboles -> mejor RMSE {scores[ranking[0]]:.4f}"
+        )
+        best_rmse = float(scores[ranking[0]])
+        alive = [alive[i] for i in ranking[: max(1, math.ceil(len(alive) / eta))]]
+
+    return {"params": alive[0], "rmse": best_rmse, "history": history}
+
+
+def save_hyperparams(model_name: str, params: Dict, exports_dir: str = EXPORTS_DIR) -> str:
+    """Escribe la configuración en hyperparams_*.json conservando las claves existentes."""
+    path = os.path.join(exports_dir, HYPERPARAMS_FILES[model_name])
+    existing = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            existing = json.load(f)
+
+    os.makedirs(exports_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({**existing, **params}, f, indent=2)
+    return path
+
+
+def tune_hyperparams(
+    models: Optional[List[str]] = None,
+    rolling_windows: Optional[List[int]] = None,
+    n_candidates: int = 27,
+    eta: int = 3,
+    n_jobs: int = -1,
+    exports_dir: str = EXPORTS_DIR,
+    matrices: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict[str, Dict]:
+    """Busca hiperparámetros por successive halving y escribe los ganadores en JSON.
+
+    Parámetros:
+        models: subconjunto de SEARCH_SPACES (None = Random Forest y XGBoost)
+        rolling_windows: tamaños de ventanas rolling (None = usar DEFAULT_ROLLING_WINDOWS)
+        n_candidates: candidatos iniciales por modelo (incluye la configuración actual)
+        eta: factor de reducción de candidatos y de aumento de recursos por ronda
+        n_jobs: procesos para evaluar candidatos (-1 = todos los núcleos)
+        exports_dir: directorio con los hyperparams_*.json semilla y de salida
+        matrices: X_train, y_train, X_val, y_val (y sample_weight opcional); None = splits
+            del pipeline por etapas con caché
+
+    Retorna:
+        Resultado de successive_halving por modelo
+
+    Raises:
+        ValueError: si algún modelo no tiene espacio de búsqueda
+    """
+    models = models or list(SEARCH_SPACES)
+    unknown = [name for name in models if name not in SEARCH_SPACES]
+    if unknown:
+        raise ValueError(
+            f"Modelos sin espacio de búsqueda: {unknown}. Opciones: {list(SEARCH_SPACES)}"
+        )
+
+    if rolling_windows is None:
+        rolling_windows = DEFAULT_ROLLING_WINDOWS
+    rolling_windows = validate_rolling_windows(rolling_windows)
+    features = get_model_features(rolling_windows)
+
+    if matrices is None:
+        train, val, _, _ = prepare_full_pipeline(
+            rolling_windows=rolling_windows, cache_stages=True, features=features
+        )
+        matrices = {
+            "X_train": train[features].to_numpy(dtype=np.float32),
+            "y_train": train["target_log"].to_numpy(),
+            "X_val": val[features].to_numpy(dtype=np.float32),
+            "y_val": val["target_log"].to_numpy(),
+        }
+
+    seeds = load_hyperparams(exports_dir)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="tuning-") as run_dir:
+        write_training_matrices(run_dir, **matrices)
+        for name in models:
+            candidates = sample_candidates(name, tree_params(name, seeds), n_candidates)
+            print(f"\n🎛️  Successive halving de {name}: {len(candidates)} candidatos")
+            results[name] = successive_halving(run_dir, name, candidates, features, eta, n_jobs)
+            path = save_hyperparams(name, results[name]["params"], exports_dir)
+            print(f"  ✅ Mejor configuración guardada en: {path}")
+
+    return results
+
+
+def main() -> None:
+    """CLI de la búsqueda de hiperparámetros."""
+    parser = argparse.ArgumentParser(description="Successive halving de hiperparámetros")
+    parser.add_argument("--models", nargs="+", default=None)
+    parser.add_argument("--windows", type=int, nargs=2, default=DEFAULT_ROLLING_WINDOWS)
+    parser.add_argument("--candidates", type=int, default=27)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--exports-dir", default=EXPORTS_DIR)
+    args = parser.parse_args()
+
+    tune_hyperparams(
+        models=args.models,
+        rolling_windows=args.windows,
+        n_candidates=args.candidates,
+        eta=args.eta,
+        n_jobs=args.n_jobs,
+        exports_dir=args.exports_dir,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Entrenamiento de XGBoost en memoria externa sobre chunks Parquet de features.
+
+El train se escribe una vez como Parquet con un row group por chunk (features en
+float32, target y pesos opcionales). ParquetChunkIter entrega esos row groups a un
+DMatrix de memoria externa: XGBoost construye los cuantiles del histograma
+(tree_method="hist") leyendo un chunk a la vez y guarda las páginas en disco, así la
+matriz completa nunca se carga en memoria. El booster resultante se carga en un
+XGBRegressor con los mismos parámetros (restricciones monotónicas incluidas), de modo
+que predice y se serializa igual que el entrenado en memoria.
+
+Con early stopping sobre validación, ambos modos se truncan a la mejor iteración
+(truncate_to_best_iteration) antes de guardarse.
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost
+from xgboost import XGBRegressor
+
+TARGET_COLUMN = "target_log"
+WEIGHT_COLUMN = "sample_weight"
+
+# Filas por row group (chunk que XGBoost lee en cada iteración)
+DEFAULT_CHUNK_ROWS = 250_000
+
+
+def write_feature_chunks(
+    X: np.ndarray,
+    y: np.ndarray,
+    features: List[str],
+    path: str,
+    sample_weight: Optional[np.ndarray] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> None:
+    """Escribe X (float32), y y pesos opcionales como Parquet, un row group por chunk.
+
+    Se convierte un chunk a la vez, así X puede ser un arreglo mapeado en memoria.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for start in range(0, len(y), chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            chunk = pd.DataFrame(np.asarray(X[rows], dtype=np.float32), columns=features)
+            chunk[TARGET_COLUMN] = np.asarray(y[rows], dtype=np.float32)
+            if sample_weight is not None:
+                chunk[WEIGHT_COLUMN] = np.asarray(sample_weight[rows], dtype=np.float32)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table, row_group_size=chunk_rows)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+class ParquetChunkIter(xgboost.DataIter):
+    """Iterador de XGBoost que entrega un row group del Parquet por llamada a next."""
+
+    def __init__(self, path: str, features: List[str], cache_prefix: Optional[str] = None):
+        import pyarrow.parquet as pq
+
+        self._file = pq.ParquetFile(path)
+        self._features = features
+        self._has_weight = WEIGHT_COLUMN in self._file.schema_arrow.names
+        self._group = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> int:
+        """Pasa el siguiente chunk a XGBoost (retorna 0 al terminar)."""
+        if self._group == self._file.num_row_groups:
+            return 0
+
+        columns = self._features + [TARGET_COLUMN] + ([WEIGHT_COLUMN] if self._has_weight else [])
+        chunk = self._file.read_row_group(self._group, columns=columns).to_pandas()
+        input_data(
+            data=chunk[self._features].to_numpy(dtype=np.float32),
+            label=chunk[TARGET_COLUMN].to_numpy(),
+            weight=chunk[WEIGHT_COLUMN].to_numpy() if self._has_weight else None,
+            feature_names=self._features,
+        )
+        self._group += 1
+        return 1
+
+    def reset(self) -> None:
+        """Vuelve al primer chunk."""
+        self._group = 0
+
+
+def regressor_from_booster(
+    estimator: XGBRegressor, booster: xgboost.Booster, **params
+) -> XGBRegressor:
+    """XGBRegressor con los parámetros de `estimator` (más `params`) y el booster dado."""
+    fitted = XGBRegressor(**{**estimator.get_params(), **params})
+    fitted.load_model(bytearray(booster.save_raw("json")))
+    return fitted
+
+
+def truncate_to_best_iteration(estimator: XGBRegressor) -> XGBRegressor:
+    """Deja sólo los árboles hasta la mejor iteración de validación (early stopping).
+
+    El modelo resultante no guarda early_stopping_rounds, así puede re-entrenarse (o
+    clonarse en el Stacking) sin eval_set.
+    """
+    best_iteration = getattr(estimator, "best_iteration", None)
+    if best_iteration is None:
+        return estimator
+    return regressor_from_booster(
+        estimator,
+        estimator.get_booster()[: best_iteration + 1],
+        n_estimators=best_iteration + 1,
+        early_stopping_rounds=None,
+    )
+
+
+def fit_xgb_external(
+    estimator: XGBRegressor,
+    path: str,
+    features: List[str],
+    cache_dir: str,
+    eval_set: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> XGBRegressor:
+    """Entrena `estimator` (sin entrenar) con memoria externa sobre los chunks de `path`.
+
+    Parámetros:
+        estimator: XGBRegressor con la configuración del modelo (n_estimators, restricciones…)
+        path: Parquet escrito por write_feature_chunks
+        features: columnas de features, en el orden de X
+        cache_dir: directorio para las páginas de memoria externa de XGBoost
+        eval_set: (X_val, y_val) para early stopping con estimator.early_stopping_rounds
+
+    Retorna:
+        XGBRegressor entrenado con el booster de memoria externa
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    iterator = ParquetChunkIter(path, features, cache_prefix=os.path.join(cache_dir, "xgb"))
+    dtrain = xgboost.DMatrix(iterator)
+
+    params = {**estimator.get_xgb_params(), "tree_method": "hist"}
+    evals, early_stopping_rounds = [], None
+    if eval_set is not None and estimator.early_stopping_rounds:
+        X_val, y_val = eval_set
+        dval = xgboost.DMatrix(
+            np.asarray(X_val, dtype=np.float32), label=y_val, feature_names=features
+        )
+        evals, early_stopping_rounds = [(dval, "validation")], estimator.early_stopping_rounds
+    booster = xgboost.train(
+        params,
+        dtrain,
+        num_boost_round=estimator.n_estimators,
+        evals=evals,
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=False,
+    )
+
+    if early_stopping_rounds:
+        return regressor_from_booster(
+            estimator,
+            booster[: booster.best_iteration + 1],
+            n_estimators=booster.best_iteration + 1,
+            early_stopping_rounds=None,
+        )
+    return regressor_from_booster(estimator, booster)
@@ -0,0 +1,57 @@
+"""
+Tests para app/services/data_exporter.py
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from app.services import DataExporter
+
+
+class TestDataExporter:
+    """Tests para la exportación de métricas y del perfil de entrenamiento."""
+
+    @pytest.fixture
+    def exporter(self, tmp_path):
+        """Exportador con models/ y exports/ temporales."""
+        exporter = DataExporter()
+        exporter.models_dir = str(tmp_path / "models")
+        exporter.exports_dir = str(tmp_path / "exports")
+        (tmp_path / "models").mkdir()
+        (tmp_path / "exports").mkdir()
+        return exporter
+
+    def test_metrics_keep_recorded_train_time_and_size(self, exporter, tmp_path):
+        """train_time de metrics.json se exporta como train_time_s junto al tamaño registrado."""
+        # Arrange
+        metrics = [{"model": "XGBoost", "rmse": 0.5, "train_time": 1.5, "model_size_mb": 0.2}]
+        (tmp_path / "models" / "metrics.json").write_text(json.dumps(metrics))
+
+        # Act
+        success = exporter._export_metrics()
+
+        # Assert
+        exported = pd.read_csv(tmp_path / "exports" / "metrics_overall.csv")
+        assert success
+        assert exported.loc[0, "train_time_s"] == 1.5
+        assert exported.loc[0, "model_size_mb"] == 0.2
+
+    def test_profile_splits_scope_and_model(self, exporter, tmp_path):
+        """Las etapas fit:/predict: se separan en scope y modelo; el resto es del pipeline."""
+        # Arrange
+        stages = [
+            {"stage": "split", "wall_s": 0.1, "cpu_s": 0.1},
+            {"stage": "fit:Random Forest", "wall_s": 2.0, "cpu_s": 1.8},
+        ]
+        (tmp_path / "models" / "run_profile.json").write_text(json.dumps({"stages": stages}))
+
+        # Act
+        success = exporter._export_profile()
+
+        # Assert
+        exported = pd.read_csv(tmp_path / "exports" / "profile_stages.csv")
+        assert success
+        assert exported["scope"].tolist() == ["pipeline", "fit"]
+        assert exported["model"].fillna("").tolist() == ["", "Random Forest"]
@@ -57,6 +57,19 @@ class TestPredictionService:
         # Act & Assert
         service.predict({"shop_cluster": 1})
 
+    def test_retrain_defaults_match_api(self, service, mocker):
+        """Por defecto el reentrenamiento no usa el banco de ventanas, igual que la API."""
+        # Arrange
+        mock_client = MockHTTPClient({"message": "ok"})
+        mocker.patch("httpx.Client", return_value=mock_client)
+
+        # Act
+        success, _ = service.retrain_model([3, 6])
+
+        # Assert
+        assert success
+        assert mock_client.last_request_data["use_window_bank"] is False
+
     def test_check_api_health_returns_true_when_healthy(self, service, mocker):
         """Debe retornar True si la API está saludable."""
         # Arrange
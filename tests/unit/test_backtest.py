@@ -0,0 +1,106 @@
+"""
+Tests para src/backtest.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+import src.orchestrator as orchestrator
+import src.train as train_module
+from src.backtest import _fit_and_score, run_backtest, walk_forward_folds, write_backtest_matrix
+from src.data_processing import get_model_features
+
+
+class TestWalkForwardFolds:
+    """Tests para los folds rolling-origin por mes."""
+
+    def test_one_test_month_per_fold(self):
+        """Cada fold debe probar en el mes siguiente a su último mes de entrenamiento."""
+        # Act
+        folds = walk_forward_folds(np.repeat(np.arange(10), 3), n_splits=3)
+
+        # Assert
+        assert [fold["test_month"] for fold in folds] == [7, 8, 9]
+        assert all(fold["train_start"] == 0 for fold in folds)
+        assert all(fold["train_end"] == fold["test_month"] - 1 for fold in folds)
+
+    def test_max_train_size_limits_window(self):
+        """Con max_train_size la ventana de entrenamiento se desplaza."""
+        # Act
+        folds = walk_forward_folds(np.arange(10), n_splits=2, max_train_size=4)
+
+        # Assert
+        assert [(fold["train_start"], fold["train_end"]) for fold in folds] == [(4, 7), (5, 8)]
+
+    def test_too_many_splits_raises_error(self):
+        """Pedir más folds que meses disponibles debe lanzar ValueError."""
+        with pytest.raises(ValueError, match="meses"):
+            walk_forward_folds(np.arange(3), n_splits=3)
+
+
+class TestRunBacktest:
+    """Tests para la evaluación walk-forward de modelos."""
+
+    @pytest.fixture
+    def feature_matrix(self):
+        """Matriz de features sintética con 8 meses desordenados."""
+        rng = np.random.default_rng(5)
+        features = get_model_features([3, 6])
+        df = pd.DataFrame(rng.normal(size=(400, len(features))), columns=features)
+        df["date_block_num"] = rng.integers(0, 8, len(df))
+        df["target_log"] = np.log1p(np.abs(df[features[0]]) * 3)
+        return df
+
+    def test_writes_metrics_per_fold_and_model(self, feature_matrix, tmp_path):
+        """Debe producir una fila por (fold, modelo) con el tamaño de cada mes."""
+        # Arrange
+        output_path = tmp_path / "backtest.csv"
+
+        # Act
+        results = run_backtest(
+            rolling_windows=[3, 6],
+            n_splits=2,
+            models=["Random Forest", "XGBoost"],
+            n_jobs=1,
+            df_final=feature_matrix,
+            output_path=str(output_path),
+        )
+
+        # Assert
+        assert len(results) == 4
+        assert set(results["model"]) == {"Random Forest", "XGBoost"}
+        month_sizes = feature_matrix["date_block_num"].value_counts()
+        for _, row in results.iterrows():
+            assert row["n_test"] == month_sizes[row["test_month"]]
+            assert row["n_train"] == month_sizes[month_sizes.index < row["test_month"]].sum()
+        pd.testing.assert_frame_equal(pd.read_csv(output_path), results)
+
+    def test_parallel_keras_fold_limits_tensorflow_threads(
+        self, feature_matrix, tmp_path, monkeypatch
+    ):
+        """Con n_jobs != 1 un fold Keras fija TensorFlow a un hilo por proceso."""
+        # Arrange
+        features = get_model_features([3, 6])
+        write_backtest_matrix(feature_matrix, features, str(tmp_path))
+        threads = []
+        monkeypatch.setattr(orchestrator, "limit_tensorflow_threads", threads.append)
+        monkeypatch.setattr(train_module, "build_estimator", lambda *args: LinearRegression())
+        fold = {"fold": 0, "train_start": 0, "train_end": 5, "test_month": 6}
+
+        # Act
+        _fit_and_score(str(tmp_path), fold, "MLP", features, n_jobs=2)
+        _fit_and_score(str(tmp_path), fold, "MLP", features, n_jobs=1)
+
+        # Assert
+        assert threads == [1]
+
+    def test_unknown_model_raises_error(self, feature_matrix):
+        """Un modelo fuera de MODEL_NAMES debe lanzar ValueError."""
+        with pytest.raises(ValueError, match="desconocidos"):
+            run_backtest(models=["SVM"], df_final=feature_matrix, output_path=None)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
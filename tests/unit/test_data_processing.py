@@ -2,17 +2,53 @@
 Tests para src/data_processing.py
 """
 
+import pickle
+
 import pytest
 import pandas as pd
 import numpy as np
+from src import data_processing
 from src.data_processing import (
     validate_rolling_windows,
+    load_data,
+    compute_data_fingerprint,
+    aggregate_monthly_sales,
+    aggregate_monthly_sales_streaming,
+    compute_rolling_stats,
+    compute_lag_features,
+    compute_price_rolling_max,
+    build_item_price_max,
+    append_month_features,
+    save_feature_store,
+    load_feature_store,
+    build_base_features,
+    add_window_features,
+    build_window_bank,
+    select_window_features,
+    group_start_positions,
+    run_sharded_by_shop,
+    fill_non_finite,
+    downcast_features,
+    get_model_features,
+    resolve_feature_dependencies,
+    encode_composite_key,
+    sort_by_composite_key,
+    join_dimension,
+    compute_balance_weights,
+    balance_data_smote,
+    create_demand_bins,
+    build_monthly_panel,
+    load_or_build_panel,
+    MonthlyPanel,
+    PASSTHROUGH_COLUMNS,
     clean_data,
     create_rolling_window_features,
     feature_engineering,
     DEFAULT_ROLLING_WINDOWS,
     MIN_ROLLING_WINDOW,
     MAX_ROLLING_WINDOW,
+    WINDOW_BANK,
+    profile_stage,
 )
 
 
@@ -124,6 +160,32 @@ class TestCleanData:
         # Assert
         assert result.loc[0, "item_price"] == 300000
 
+    def test_skips_date_parsing_by_default(self, sample_sales_data):
+        """Sin parse_dates la fecha se conserva como texto y la entrada no se modifica."""
+        # Arrange
+        sample_sales_data["date"] = ["02.01.2013"] * 6
+        original = sample_sales_data.copy()
+
+        # Act
+        result = clean_data(sample_sales_data)
+
+        # Assert
+        assert result["date"].tolist() == ["02.01.2013"] * 6
+        pd.testing.assert_frame_equal(sample_sales_data, original)
+
+    def test_parses_fixed_format_dates(self, sample_sales_data):
+        """Con parse_dates debe interpretar día.mes.año igual que dayfirst (NaN → NaT)."""
+        # Arrange
+        dates = ["02.01.2013", "13.01.2013", None, "02.01.2013", "31.10.2015", "01.02.2014"]
+        sample_sales_data["date"] = dates
+
+        # Act
+        result = clean_data(sample_sales_data, parse_dates=True)
+
+        # Assert
+        expected = pd.to_datetime(pd.Series(dates), dayfirst=True)
+        pd.testing.assert_series_equal(result["date"], expected, check_names=False)
+
 
 class TestCreateRollingWindowFeatures:
     """Tests para creación de features de rolling window."""
@@ -174,6 +236,173 @@ class TestCreateRollingWindowFeatures:
         assert "rolling_mean_6" in result.columns
 
 
+class TestComputeRollingStats:
+    """Tests para el motor vectorizado de ventanas móviles."""
+
+    @pytest.fixture
+    def series_data(self) -> pd.DataFrame:
+        """Series de varios grupos con tramos constantes y valores decimales."""
+        return pd.DataFrame(
+            {
+                "shop_id": [1] * 6 + [2] * 4 + [3],
+                "item_id": [100] * 6 + [100] * 4 + [101],
+                "date_block_num": [0, 1, 2, 3, 4, 5, 0, 2, 3, 4, 7],
+                "item_cnt_day": [5, 5, 5, 2.5, 7, 0, 3, 3, 4.2, 1, 8],
+            }
+        )
+
+    def test_group_start_positions(self, series_data):
+        """Cada fila debe apuntar al inicio de su grupo."""
+        # Act
+        result = group_start_positions(series_data, ["shop_id", "item_id"])
+
+        # Assert
+        assert result.tolist() == [0] * 6 + [6] * 4 + [10]
+
+    @pytest.mark.parametrize("window", [2, 3, 6, 12])
+    def test_matches_pandas_rolling(self, series_data, window):
+        """Debe reproducir rolling(window, min_periods=1) de pandas por grupo."""
+        # Arrange
+        grouped = series_data.groupby(["shop_id", "item_id"])["item_cnt_day"]
+        expected_mean = grouped.transform(lambda x: x.rolling(window, min_periods=1).mean())
+        expected_std = grouped.transform(lambda x: x.rolling(window, min_periods=1).std())
+        group_start = group_start_positions(series_data, ["shop_id", "item_id"])
+
+        # Act
+        stats = compute_rolling_stats(series_data["item_cnt_day"].to_numpy(), group_start, [window])
+        mean, std = stats[window]
+
+        # Assert
+        np.testing.assert_allclose(mean, expected_mean.to_numpy())
+        np.testing.assert_allclose(std, expected_std.to_numpy(), atol=1e-12)
+
+    def test_constant_window_has_zero_std(self, series_data):
+        """Ventanas con valores constantes deben tener std exactamente 0."""
+        # Arrange
+        group_start = group_start_positions(series_data, ["shop_id", "item_id"])
+
+        # Act
+        _, std = compute_rolling_stats(series_data["item_cnt_day"].to_numpy(), group_start, [3])[3]
+
+        # Assert
+        assert std[1] == 0.0
+        assert std[2] == 0.0
+        assert np.isnan(std[0])
+
+
+class TestComputeLagFeatures:
+    """Tests para el motor de lags sin self-merges."""
+
+    @pytest.fixture
+    def monthly_data(self) -> pd.DataFrame:
+        """Series mensuales ordenadas con meses faltantes."""
+        return pd.DataFrame(
+            {
+                "shop_id": [1, 1, 1, 1, 2, 2],
+                "item_id": [100, 100, 100, 100, 100, 100],
+                "date_block_num": [0, 1, 3, 4, 1, 2],
+                "item_cnt_day": [5.0, 7.0, 6.0, 2.0, 3.0, 4.0],
+                "item_price": [10.0, 11.0, 12.0, 13.0, 20.0, 21.0],
+            }
+        )
+
+    def test_lag_respects_missing_months(self, monthly_data):
+        """El lag debe buscar el mes exacto, no la fila anterior del grupo."""
+        # Arrange
+        group_start = group_start_positions(monthly_data, ["shop_id", "item_id"])
+
+        # Act
+        result = compute_lag_features(monthly_data, {"item_cnt_day": [1, 2]}, group_start)
+
+        # Assert
+        np.testing.assert_array_equal(
+            result["item_cnt_lag_1"], [np.nan, 5.0, np.nan, 6.0, np.nan, 3.0]
+        )
+        np.testing.assert_array_equal(
+            result["item_cnt_lag_2"], [np.nan, np.nan, 7.0, np.nan, np.nan, np.nan]
+        )
+
+    def test_lags_do_not_cross_groups(self, monthly_data):
+        """Un grupo no debe tomar valores del grupo anterior."""
+        # Arrange
+        group_start = group_start_positions(monthly_data, ["shop_id", "item_id"])
+
+        # Act
+        result = compute_lag_features(monthly_data, {"item_price": [3]}, group_start)
+
+        # Assert
+        np.testing.assert_array_equal(
+            result["item_price_lag_3"], [np.nan, np.nan, 10.0, 11.0, np.nan, np.nan]
+        )
+
+    def test_feature_engineering_extra_lags(
+        self, sample_sales_data, sample_items_data, sample_shops_clusters
+    ):
+        """Lags adicionales deben agregarse sin perder los lags base."""
+        # Act
+        result = feature_engineering(
+            sample_sales_data,
+            sample_items_data,
+            sample_shops_clusters,
+            count_lags=[6],
+            price_lags=[12],
+        )
+
+        # Assert
+        assert "item_cnt_lag_6" in result.columns
+        assert "item_price_lag_12" in result.columns
+        assert "item_cnt_lag_3" in result.columns
+        assert result["item_cnt_lag_6"].eq(0).all()
+
+
+class TestPriceRollingMax:
+    """Tests para el máximo histórico de precio por item."""
+
+    @pytest.fixture
+    def price_data(self) -> pd.DataFrame:
+        """Precios mensuales de dos items en orden arbitrario."""
+        return pd.DataFrame(
+            {
+                "item_id": [200, 100, 100, 200, 100],
+                "date_block_num": [1, 2, 0, 0, 1],
+                "shop_id": [1, 1, 1, 1, 1],
+                "item_price": [50.0, 80.0, 100.0, 60.0, 90.0],
+            },
+            index=[10, 11, 12, 13, 14],
+        )
+
+    def test_matches_expanding_max(self, price_data):
+        """Debe coincidir con expanding().max() por item en orden temporal."""
+        # Act
+        result = compute_price_rolling_max(price_data)
+
+        # Assert
+        assert result.to_dict() == {10: 60.0, 11: 100.0, 12: 100.0, 13: 60.0, 14: 100.0}
+
+    def test_uses_initial_state(self, price_data):
+        """El estado previo debe elevar el máximo de los items conocidos."""
+        # Arrange
+        previous = pd.Series({100: 150.0})
+
+        # Act
+        result = compute_price_rolling_max(price_data, initial_max=previous)
+
+        # Assert
+        assert result.loc[[12, 14, 11]].tolist() == [150.0, 150.0, 150.0]
+        assert result.loc[13] == 60.0
+
+    def test_build_item_price_max_combines_previous(self, price_data):
+        """El estado debe combinar el máximo nuevo con el anterior."""
+        # Arrange
+        previous = pd.Series({200: 75.0, 300: 10.0})
+
+        # Act
+        result = build_item_price_max(price_data, previous=previous)
+
+        # Assert
+        assert result.to_dict() == {100: 100.0, 200: 75.0, 300: 10.0}
+
+
 class TestFeatureEngineering:
     """Tests para ingeniería de características."""
 
@@ -269,5 +498,660 @@ class TestFeatureEngineering:
         assert not np.isinf(result.values).any()
 
 
+@pytest.fixture
+def raw_data_dir(
+    tmp_path,
+    monkeypatch,
+    sample_sales_data,
+    sample_items_data,
+    sample_shops_data,
+    sample_categories_data,
+):
+    """Directorio temporal con los CSV requeridos y caché aislado."""
+    sample_sales_data.to_csv(tmp_path / "sales_train.csv", index=False)
+    sample_items_data.to_csv(tmp_path / "items.csv", index=False)
+    sample_shops_data.to_csv(tmp_path / "shops.csv", index=False)
+    sample_categories_data.to_csv(tmp_path / "item_categories.csv", index=False)
+
+    monkeypatch.setattr(data_processing, "get_data_path", lambda: str(tmp_path))
+    monkeypatch.setattr(data_processing, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path
+
+
+class TestLoadDataCache:
+    """Tests para el caché columnar de load_data."""
+
+    def test_downcasts_dtypes(self, raw_data_dir):
+        """Debe usar ids int16 y precios/ventas float32."""
+        # Act
+        sales, items, _, _ = load_data(use_cache=False)
+
+        # Assert
+        assert sales["shop_id"].dtype == np.int16
+        assert sales["item_id"].dtype == np.int16
+        assert sales["date_block_num"].dtype == np.int16
+        assert sales["item_price"].dtype == np.float32
+        assert sales["item_cnt_day"].dtype == np.float32
+        assert items["item_category_id"].dtype == np.int16
+
+    def test_writes_partitioned_cache(self, raw_data_dir):
+        """La primera carga debe escribir el caché particionado por mes."""
+        # Act
+        load_data()
+
+        # Assert
+        cache_path = raw_data_dir / "cache" / compute_data_fingerprint(str(raw_data_dir))
+        assert (cache_path / "manifest.json").exists()
+        partitions = sorted(p.name for p in (cache_path / "sales_train").iterdir())
+        assert partitions == ["date_block_num=0", "date_block_num=1", "date_block_num=2"]
+
+    def test_cache_roundtrip_matches_csv(self, raw_data_dir):
+        """Los datos leídos desde caché deben coincidir con los CSV."""
+        # Arrange
+        from_csv = load_data(use_cache=False)
+
+        # Act
+        load_data()
+        from_cache = load_data()
+
+        # Assert
+        for expected, result in zip(from_csv, from_cache):
+            pd.testing.assert_frame_equal(result, expected)
+
+    def test_cache_invalidated_when_source_changes(self, raw_data_dir, sample_sales_data):
+        """Si cambia el contenido de los CSV, debe regenerarse el caché."""
+        # Arrange
+        load_data()
+        old_fingerprint = compute_data_fingerprint(str(raw_data_dir))
+        sample_sales_data.loc[0, "item_cnt_day"] = 9
+        sample_sales_data.to_csv(raw_data_dir / "sales_train.csv", index=False)
+
+        # Act
+        sales, _, _, _ = load_data()
+
+        # Assert
+        new_fingerprint = compute_data_fingerprint(str(raw_data_dir))
+        assert new_fingerprint != old_fingerprint
+        assert sorted(p.name for p in (raw_data_dir / "cache").iterdir()) == [new_fingerprint]
+        assert sales.loc[0, "item_cnt_day"] == 9
+
+
+class TestAggregateMonthlySalesStreaming:
+    """Tests para la agregación mensual por bloques."""
+
+    def test_matches_in_memory_aggregation(self, tmp_path, sample_sales_data):
+        """Debe coincidir con clean_data + aggregate_monthly_sales."""
+        # Arrange: filas diarias repetidas, outliers y precios inválidos
+        daily = pd.concat([sample_sales_data, sample_sales_data.assign(item_price=1000)])
+        daily.iloc[0, daily.columns.get_loc("item_cnt_day")] = 50
+        daily.iloc[1, daily.columns.get_loc("item_price")] = -1
+        sales_path = tmp_path / "sales_train.csv"
+        daily.to_csv(sales_path, index=False)
+        expected = aggregate_monthly_sales(clean_data(daily.reset_index(drop=True)))
+
+        # Act: bloques pequeños para forzar varias acumulaciones
+        result = aggregate_monthly_sales_streaming(str(sales_path), chunksize=3)
+
+        # Assert
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-5)
+
+    def test_empty_file_raises_error(self, tmp_path, sample_sales_data):
+        """Un archivo sin filas debe lanzar ValueError."""
+        # Arrange
+        sales_path = tmp_path / "sales_train.csv"
+        sample_sales_data.iloc[:0].to_csv(sales_path, index=False)
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="vacío"):
+            aggregate_monthly_sales_streaming(str(sales_path))
+
+    def test_feature_engineering_accepts_monthly_input(
+        self, tmp_path, sample_sales_data, sample_items_data, sample_shops_clusters
+    ):
+        """feature_engineering debe producir el mismo resultado desde datos mensuales."""
+        # Arrange
+        sales_path = tmp_path / "sales_train.csv"
+        sample_sales_data.to_csv(sales_path, index=False)
+        monthly = aggregate_monthly_sales_streaming(str(sales_path))
+
+        # Act
+        expected = feature_engineering(
+            clean_data(sample_sales_data), sample_items_data, sample_shops_clusters
+        )
+        result = feature_engineering(
+            monthly, sample_items_data, sample_shops_clusters, monthly_aggregated=True
+        )
+
+        # Assert
+        pd.testing.assert_frame_equal(
+            result.reset_index(drop=True),
+            expected.reset_index(drop=True),
+            check_dtype=False,
+            rtol=1e-5,
+        )
+
+
+class TestAppendMonthFeatures:
+    """Tests para el modo incremental de features por mes."""
+
+    @pytest.fixture
+    def monthly_panel(self):
+        """Panel mensual sintético con meses faltantes, catálogo y clusters."""
+        rng = np.random.default_rng(7)
+        n_rows = 600
+        panel = pd.DataFrame(
+            {
+                "date_block_num": rng.integers(0, 8, n_rows),
+                "shop_id": rng.integers(0, 3, n_rows),
+                "item_id": rng.integers(0, 30, n_rows),
+            }
+        ).drop_duplicates()
+        panel["item_cnt_day"] = rng.integers(0, 25, len(panel)).astype(float)
+        panel["item_price"] = rng.integers(1, 100, len(panel)).astype(float)
+        items = pd.DataFrame({"item_id": np.arange(30), "item_category_id": np.arange(30) % 4})
+        clusters = pd.DataFrame({"shop_id": [0, 1, 2], "shop_cluster": [0, 1, 2]})
+        return panel, items, clusters
+
+    def test_matches_full_recomputation(self, monthly_panel):
+        """Las features del mes nuevo deben coincidir con un recálculo completo."""
+        # Arrange
+        panel, items, clusters = monthly_panel
+        keys = ["shop_id", "item_id", "date_block_num"]
+        full = feature_engineering(
+            panel, items, clusters, rolling_windows=[2, 6], monthly_aggregated=True
+        )
+        history = feature_engineering(
+            panel[panel["date_block_num"] < 7],
+            items,
+            clusters,
+            rolling_windows=[2, 6],
+            monthly_aggregated=True,
+        )
+
+        # Act
+        result = append_month_features(
+            history, panel[panel["date_block_num"] == 7], items, rolling_windows=[2, 6]
+        )
+
+        # Assert
+        expected = full[full["date_block_num"] == 7][history.columns]
+        pd.testing.assert_frame_equal(
+            result.sort_values(keys).reset_index(drop=True),
+            expected.sort_values(keys).reset_index(drop=True),
+            check_dtype=False,
+        )
+
+    def test_rejects_months_already_in_history(self, monthly_panel):
+        """Meses ya procesados deben lanzar ValueError."""
+        # Arrange
+        panel, items, clusters = monthly_panel
+        history = feature_engineering(panel, items, clusters, monthly_aggregated=True)
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="posteriores"):
+            append_month_features(history, panel[panel["date_block_num"] == 7], items)
+
+    def test_feature_store_roundtrip(self, tmp_path, monkeypatch, monthly_panel):
+        """El feature store sólo debe reutilizarse con las mismas ventanas."""
+        # Arrange
+        monkeypatch.setattr(data_processing, "FEATURE_STORE_DIR", str(tmp_path / "store"))
+        panel, items, clusters = monthly_panel
+        features = feature_engineering(panel, items, clusters, monthly_aggregated=True)
+
+        # Act
+        save_feature_store(features, [3, 6])
+        stored = load_feature_store([3, 6])
+
+        # Assert
+        assert stored is not None
+        pd.testing.assert_frame_equal(stored[0], features.reset_index(drop=True))
+        assert stored[1].loc[0] == panel.loc[panel["item_id"] == 0, "item_price"].max()
+        assert load_feature_store([2, 4]) is None
+
+
+class TestWindowBank:
+    """Tests para el banco de ventanas rolling precalculadas."""
+
+    @pytest.fixture
+    def base_features(self, sample_sales_data, sample_items_data, sample_shops_clusters):
+        """Features base (sin ventanas) a partir de las ventas de ejemplo."""
+        return build_base_features(sample_sales_data, sample_items_data, sample_shops_clusters)
+
+    def test_bank_contains_all_windows(self, base_features):
+        """El banco debe tener las 5 columnas de cada ventana permitida."""
+        # Act
+        bank = build_window_bank(base_features)
+
+        # Assert
+        for window in WINDOW_BANK:
+            for prefix in ["rolling_mean", "rolling_std", "diff_to_mean", "zscore"]:
+                assert f"{prefix}_{window}" in bank.columns
+            assert f"volatility_coef_{window}" in bank.columns
+
+    @pytest.mark.parametrize("windows", [[3, 6], [2, 4], [6, 12]])
+    def test_selection_matches_direct_computation(self, base_features, windows):
+        """Seleccionar del banco debe equivaler a calcular las ventanas directamente."""
+        # Arrange
+        bank = build_window_bank(base_features)
+
+        # Act
+        result = select_window_features(bank, windows)
+
+        # Assert
+        expected = add_window_features(base_features, rolling_windows=windows)
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_selection_validates_windows(self, base_features):
+        """Ventanas inválidas deben lanzar ValueError."""
+        # Arrange
+        bank = build_window_bank(base_features)
+
+        # Act & Assert
+        with pytest.raises(ValueError):
+            select_window_features(bank, [3, 13])
+
+
+class TestParallelFeatureEngineering:
+    """Tests para el feature engineering paralelo repartido por tienda."""
+
+    @pytest.fixture
+    def monthly_panel(self):
+        """Panel mensual sintético con 5 tiendas, catálogo y clusters."""
+        rng = np.random.default_rng(11)
+        n_rows = 800
+        panel = pd.DataFrame(
+            {
+                "date_block_num": rng.integers(0, 10, n_rows),
+                "shop_id": rng.integers(0, 5, n_rows),
+                "item_id": rng.integers(0, 25, n_rows),
+            }
+        ).drop_duplicates()
+        panel["item_cnt_day"] = rng.integers(0, 25, len(panel)).astype(float)
+        panel["item_price"] = rng.integers(1, 100, len(panel)).astype(float)
+        items = pd.DataFrame({"item_id": np.arange(25), "item_category_id": np.arange(25) % 3})
+        clusters = pd.DataFrame({"shop_id": np.arange(5), "shop_cluster": np.arange(5) % 2})
+        return panel, items, clusters
+
+    def test_parallel_matches_sequential(self, monthly_panel):
+        """El resultado con varios procesos debe ser idéntico al secuencial."""
+        # Arrange
+        panel, items, clusters = monthly_panel
+        expected = feature_engineering(panel, items, clusters, monthly_aggregated=True)
+
+        # Act
+        result = feature_engineering(panel, items, clusters, monthly_aggregated=True, n_jobs=2)
+
+        # Assert
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_shards_do_not_split_shops(self):
+        """Cada tienda debe quedar completa en un único shard."""
+        # Arrange
+        data = pd.DataFrame({"shop_id": np.repeat([0, 1, 2, 3], [5, 1, 3, 7])})
+
+        # Act
+        result = run_sharded_by_shop(data, _shard_summary, n_jobs=3)
+
+        # Assert
+        shops_per_shard = result.groupby("shard")["shop_id"].unique()
+        assert sorted(np.concatenate(shops_per_shard.tolist()).tolist()) == [0, 1, 2, 3]
+        assert result["shard"].nunique() > 1
+
+    def test_unsorted_data_raises_error(self):
+        """Datos no ordenados por tienda deben lanzar ValueError."""
+        # Arrange
+        data = pd.DataFrame({"shop_id": [1, 0, 1]})
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="ordenados"):
+            run_sharded_by_shop(data, _shard_summary, n_jobs=2)
+
+
+class TestLowMemoryMode:
+    """Tests para el modo de bajo consumo de memoria."""
+
+    def test_fill_non_finite_matches_replace_and_fillna(self):
+        """Debe equivaler a replace([inf, -inf], 0).fillna(0)."""
+        # Arrange
+        data = pd.DataFrame({"a": [1.0, np.nan, np.inf], "b": [-np.inf, 2.0, 3.0], "c": [1, 2, 3]})
+        expected = data.replace([np.inf, -np.inf], 0).fillna(0)
+
+        # Act
+        result = fill_non_finite(data)
+
+        # Assert
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_downcast_features_dtypes(self):
+        """Ids a enteros pequeños y floats a float32."""
+        # Arrange
+        data = pd.DataFrame(
+            {"shop_id": [1, 2], "item_id": [10, 20], "shop_cluster": [0, 1], "x": [0.5, 1.5]}
+        )
+
+        # Act
+        result = downcast_features(data)
+
+        # Assert
+        assert result["shop_id"].dtype == np.int16
+        assert result["item_id"].dtype == np.int16
+        assert result["shop_cluster"].dtype == np.int8
+        assert result["x"].dtype == np.float32
+
+    def test_matches_default_mode(
+        self, sample_sales_data, sample_items_data, sample_shops_clusters
+    ):
+        """Las features deben coincidir con el modo normal (con tolerancia de float32)."""
+        # Arrange
+        expected = feature_engineering(sample_sales_data, sample_items_data, sample_shops_clusters)
+
+        # Act
+        result = feature_engineering(
+            sample_sales_data, sample_items_data, sample_shops_clusters, low_memory=True
+        )
+
+        # Assert
+        assert list(result.columns) == list(expected.columns)
+        assert not any(dtype == np.float64 for dtype in result.dtypes)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-4)
+
+
+class TestLazyFeatureGraph:
+    """Tests para el cálculo de features guiado por demanda."""
+
+    def test_resolves_transitive_dependencies(self):
+        """Debe incluir las entradas directas e indirectas de cada feature."""
+        # Act
+        required = resolve_feature_dependencies(["price_demand_elasticity", "zscore_3"])
+
+        # Assert
+        assert {"price_change_pct", "delta_1_2", "item_price_lag_1"} <= required
+        assert {"item_cnt_lag_1", "item_cnt_lag_2", "rolling_mean_3", "rolling_std_3"} <= required
+        assert "item_cnt_lag_3" not in required
+
+    def test_none_means_all_features(self):
+        """Sin lista de features no hay restricción."""
+        assert resolve_feature_dependencies(None) is None
+
+    def test_matches_full_computation(
+        self, sample_sales_data, sample_items_data, sample_shops_clusters
+    ):
+        """Las features pedidas deben coincidir con las del cálculo completo."""
+        # Arrange
+        features = get_model_features([3, 6])
+        full = feature_engineering(sample_sales_data, sample_items_data, sample_shops_clusters)
+
+        # Act
+        result = feature_engineering(
+            sample_sales_data, sample_items_data, sample_shops_clusters, features=features
+        )
+
+        # Assert
+        pd.testing.assert_frame_equal(result[features], full[features])
+        assert set(result.columns) == set(PASSTHROUGH_COLUMNS) | set(features)
+
+    def test_skips_unused_features(
+        self, sample_sales_data, sample_items_data, sample_shops_clusters
+    ):
+        """Features que el modelo no usa no deben calcularse."""
+        # Act
+        result = feature_engineering(
+            sample_sales_data,
+            sample_items_data,
+            sample_shops_clusters,
+            features=get_model_features([3, 6]),
+        )
+
+        # Assert
+        for col in ["zscore_3", "momentum_avg", "item_price_lag_3", "item_cnt_lag_1"]:
+            assert col not in result.columns
+
+
+class TestCompositeKey:
+    """Tests para la clave compuesta int64 (tienda, item, mes)."""
+
+    @pytest.fixture
+    def keys_frame(self):
+        """Frame desordenado con ids repetidos entre columnas."""
+        rng = np.random.default_rng(0)
+        return pd.DataFrame(
+            {
+                "shop_id": rng.integers(0, 60, 500).astype(np.int16),
+                "item_id": rng.integers(0, 22000, 500).astype(np.int16),
+                "date_block_num": rng.integers(0, 34, 500).astype(np.int8),
+                "value": np.arange(500),
+            }
+        )
+
+    def test_key_order_matches_lexicographic_order(self, keys_frame):
+        """Ordenar por la clave debe equivaler a ordenar por las columnas."""
+        # Act
+        result = sort_by_composite_key(keys_frame, ignore_index=True)
+        expected = keys_frame.sort_values(
+            ["shop_id", "item_id", "date_block_num"], kind="stable", ignore_index=True
+        )
+
+        # Assert
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_out_of_range_id_raises_error(self):
+        """Un id fuera del rango reservado no debe codificarse en silencio."""
+        # Arrange
+        df = pd.DataFrame({"shop_id": [1, 2000]})
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="fuera del rango"):
+            encode_composite_key(df, ["shop_id"])
+
+    def test_join_dimension_matches_merge(self, keys_frame):
+        """El join por arreglo denso debe coincidir con un left merge (ids faltantes → NaN)."""
+        # Arrange
+        dimension = pd.DataFrame({"shop_id": np.arange(0, 50), "shop_cluster": np.arange(50) % 3})
+        expected = keys_frame.merge(dimension, on="shop_id", how="left")
+
+        # Act
+        result = join_dimension(keys_frame.copy(), dimension, on="shop_id")
+
+        # Assert
+        pd.testing.assert_frame_equal(result, expected)
+
+
+class TestDensePanel:
+    """Tests para el panel mensual denso (series × meses) mapeado en memoria."""
+
+    @pytest.fixture
+    def monthly_sales(self):
+        """Ventas mensuales con meses sin ventas dentro de las series."""
+        rng = np.random.default_rng(3)
+        sales = pd.DataFrame(
+            {
+                "date_block_num": rng.integers(0, 10, 400),
+                "shop_id": rng.integers(0, 3, 400),
+                "item_id": rng.integers(0, 25, 400),
+            }
+        ).drop_duplicates()
+        sales["item_cnt_day"] = rng.integers(0, 15, len(sales)).astype(np.float32)
+        sales["item_price"] = rng.integers(1, 50, len(sales)).astype(np.float32)
+        items = pd.DataFrame({"item_id": np.arange(25), "item_category_id": np.arange(25) % 4})
+        clusters = pd.DataFrame({"shop_id": [0, 1, 2], "shop_cluster": [0, 1, 2]})
+        return sales, items, clusters
+
+    @pytest.fixture(autouse=True)
+    def panel_store(self, tmp_path, monkeypatch):
+        """Redirige el panel store a un directorio temporal."""
+        monkeypatch.setattr(data_processing, "PANEL_STORE_DIR", str(tmp_path / "panel"))
+
+    def test_lags_match_sparse_computation(self, monthly_sales):
+        """Los lags leídos del panel deben coincidir con los calculados por búsqueda binaria."""
+        # Arrange
+        sales, items, clusters = monthly_sales
+        expected = feature_engineering(sales, items, clusters, monthly_aggregated=True)
+
+        # Act
+        result = feature_engineering(
+            sales, items, clusters, monthly_aggregated=True, dense_panel=True
+        )
+
+        # Assert
+        lag_cols = [col for col in expected.columns if "_lag_" in col]
+        pd.testing.assert_frame_equal(result[lag_cols], expected[lag_cols])
+
+    def test_windows_count_missing_months_as_zero(self):
+        """Un mes sin ventas dentro de la ventana debe contar como 0."""
+        # Arrange
+        data = pd.DataFrame(
+            {
+                "date_block_num": [0, 2],
+                "shop_id": [1, 1],
+                "item_id": [5, 5],
+                "item_cnt_day": [4.0, 8.0],
+                "item_price": [10.0, 10.0],
+            }
+        )
+
+        # Act
+        result = add_window_features(
+            data,
+            rolling_windows=[3, 6],
+            features=["rolling_mean_3", "rolling_std_3"],
+            dense_panel=True,
+        )
+
+        # Assert
+        assert result["rolling_mean_3"].tolist() == pytest.approx([4.0, 4.0])
+        assert result["rolling_std_3"].iloc[1] == pytest.approx(4.0)
+
+    def test_panel_is_persisted_and_memory_mapped(self, monthly_sales):
+        """El panel se construye una vez y luego se abre como memmap desde disco."""
+        # Arrange
+        sales = monthly_sales[0]
+        first = load_or_build_panel(sales)
+
+        # Act
+        second = load_or_build_panel(sales)
+
+        # Assert
+        assert second.path == first.path
+        assert isinstance(second.counts, np.memmap)
+        assert second.counts.dtype == np.float32
+        np.testing.assert_array_equal(second.counts, build_monthly_panel(sales).counts)
+
+    def test_pickles_as_path(self, monthly_sales):
+        """Un panel en disco debe viajar a otros procesos como su ruta."""
+        # Arrange
+        panel = load_or_build_panel(monthly_sales[0])
+
+        # Act
+        restored = pickle.loads(pickle.dumps(panel))
+
+        # Assert
+        assert len(pickle.dumps(panel)) < 1000
+        assert isinstance(restored, MonthlyPanel)
+        np.testing.assert_array_equal(restored.prices, panel.prices)
+
+    def test_duplicated_rows_raise_error(self, monthly_sales):
+        """El panel requiere una fila por (mes, tienda, item)."""
+        # Arrange
+        sales = monthly_sales[0]
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="agregadas por mes"):
+            build_monthly_panel(pd.concat([sales, sales.head(1)]))
+
+
+class TestBalancing:
+    """Tests para el balanceo por bins de demanda (pesos y SMOTE)."""
+
+    @pytest.fixture
+    def skewed_target(self):
+        """Target sesgado: muchos ceros y pocas ventas altas."""
+        rng = np.random.default_rng(11)
+        return pd.Series(np.log1p(rng.exponential(2.0, 1000).round()))
+
+    def test_weights_equalize_bins(self, skewed_target):
+        """Cada bin debe pesar lo mismo en total y los pesos deben tener media 1."""
+        # Act
+        weights = compute_balance_weights(skewed_target)
+
+        # Assert
+        bins = create_demand_bins(skewed_target)
+        totals = pd.Series(weights).groupby(bins.to_numpy()).sum()
+        assert len(weights) == len(skewed_target)
+        assert weights.mean() == pytest.approx(1.0)
+        np.testing.assert_allclose(totals, totals.iloc[0])
+
+    def test_smote_target_uses_bin_means(self, skewed_target):
+        """El target reconstruido tras SMOTE debe ser la media del bin de cada fila."""
+        # Arrange
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame({"a": rng.normal(size=1000), "b": skewed_target + rng.normal(size=1000)})
+        bin_means = skewed_target.groupby(create_demand_bins(skewed_target)).mean()
+
+        # Act
+        X_balanced, y_balanced = balance_data_smote(X, skewed_target)
+
+        # Assert
+        assert len(X_balanced) > len(X)
+        assert y_balanced.index.equals(X_balanced.index)
+        assert set(np.round(y_balanced.unique(), 10)) <= set(np.round(bin_means.to_numpy(), 10))
+
+
+class TestProfileStage:
+    """Tests para la instrumentación de etapas."""
+
+    def test_records_times_and_throughput(self, capsys):
+        """Debe registrar tiempo de pared, de CPU, filas por segundo e imprimir el resumen."""
+        # Arrange
+        profile = []
+
+        # Act
+        with profile_stage("suma", profile) as entry:
+            total = sum(range(200_000))
+            entry["rows"] = 200_000
+
+        # Assert
+        assert total > 0
+        assert profile == [entry]
+        assert entry["stage"] == "suma" and entry["wall_s"] > 0 and entry["cpu_s"] >= 0
+        assert entry["rows_per_s"] == pytest.approx(200_000 / entry["wall_s"], rel=0.01)
+        assert "'suma'" in capsys.readouterr().out
+
+    def test_peak_memory_is_per_stage(self):
+        """El pico de RSS de una etapa no arrastra el de una etapa anterior más pesada."""
+        # Arrange
+        profile = []
+        with profile_stage("pesada", profile):
+            block = np.ones(40_000_000)  # ~305 MB
+            del block
+
+        # Act
+        with profile_stage("liviana", profile):
+            pass
+
+        # Assert
+        heavy, light = profile
+        assert heavy["rss_delta_mb"] > 250
+        assert light["rss_delta_mb"] < 50
+        assert light["peak_rss_mb"] < heavy["peak_rss_mb"] - 200
+
+    def test_failed_stage_is_not_recorded(self):
+        """Una etapa que lanza excepción no agrega registro al perfil."""
+        # Arrange
+        profile = []
+
+        # Act
+        with pytest.raises(RuntimeError):
+            with profile_stage("falla", profile, rows=10):
+                raise RuntimeError("boom")
+
+        # Assert
+        assert profile == []
+
+
+def _shard_summary(shard: pd.DataFrame) -> pd.DataFrame:
+    """Resume un shard (función de módulo para poder enviarla a otro proceso)."""
+    return pd.DataFrame({"shop_id": shard["shop_id"].unique(), "shard": shard.index[0]})
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,68 @@
+"""
+Tests de presupuesto de tiempo de importación (API, app y CLIs).
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Segundos máximos para importar cada módulo en un proceso nuevo
+IMPORT_BUDGET_SECONDS = 3.0
+
+# Dependencias pesadas que sólo deben cargarse en las funciones que las usan
+HEAVY_MODULES = ["tensorflow", "kagglehub", "imblearn", "sklearn.cluster", "shap"]
+
+LIGHT_ENTRYPOINTS = [
+    "src",
+    "src.api",
+    "src.data_processing",
+    "src.inference",
+    "src.pipeline",
+    "app.services.data_exporter",
+]
+
+
+def _measure_import(module: str) -> dict:
+    """Importa `module` en un intérprete nuevo y retorna duración y módulos pesados cargados."""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'seconds': elapsed, 'heavy': heavy}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestImportTime:
+    """Importar los puntos de entrada livianos no debe cargar dependencias pesadas."""
+
+    @pytest.mark.parametrize("module", LIGHT_ENTRYPOINTS)
+    def test_does_not_import_heavy_modules(self, module):
+        """TensorFlow, kagglehub, imblearn, K-Means y SHAP se importan de forma diferida."""
+        # Act
+        result = _measure_import(module)
+
+        # Assert
+        assert result["heavy"] == []
+
+    @pytest.mark.parametrize("module", ["src.api", "src.data_processing"])
+    def test_import_within_budget(self, module):
+        """La importación debe caber en el presupuesto (se reintenta una vez en frío)."""
+        # Act
+        seconds = _measure_import(module)["seconds"]
+        if seconds > IMPORT_BUDGET_SECONDS:
+            seconds = _measure_import(module)["seconds"]
+
+        # Assert
+        assert seconds < IMPORT_BUDGET_SECONDS
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,253 @@
+"""
+Tests para src/orchestrator.py
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from src.data_processing import get_model_features
+from src.orchestrator import (
+    SHAP_MODEL_NAME,
+    STACKING_MODEL_NAME,
+    completed_stage,
+    promote_run,
+    run_training_jobs,
+    split_cpu_budget,
+)
+from src.train import evaluate_model
+
+
+class TestSplitCpuBudget:
+    """Tests para el reparto de núcleos entre trabajos."""
+
+    def test_threads_split_between_workers(self):
+        """Procesos × hilos no debe superar los núcleos disponibles."""
+        # Act
+        workers, threads = split_cpu_budget(n_jobs=-1, n_tasks=6, n_cpus=8)
+
+        # Assert
+        assert (workers, threads) == (6, 1)
+
+    def test_fewer_tasks_get_more_threads(self):
+        """Con menos trabajos que núcleos cada proceso recibe más hilos."""
+        # Act
+        workers, threads = split_cpu_budget(n_jobs=-1, n_tasks=3, n_cpus=8)
+
+        # Assert
+        assert (workers, threads) == (3, 2)
+
+    def test_n_jobs_caps_workers(self):
+        """n_jobs limita los procesos concurrentes."""
+        # Act
+        workers, threads = split_cpu_budget(n_jobs=1, n_tasks=6, n_cpus=8)
+
+        # Assert
+        assert (workers, threads) == (1, 8)
+
+
+class TestRunTrainingJobs:
+    """Tests para el entrenamiento concurrente de modelos."""
+
+    @pytest.fixture
+    def matrices(self):
+        """Matrices sintéticas de entrenamiento y validación."""
+        rng = np.random.default_rng(7)
+        features = get_model_features([3, 6])
+        X = rng.normal(size=(300, len(features)))
+        y = np.log1p(np.abs(X[:, 0]) * 3)
+        return X[:240], y[:240], X[240:], y[240:], features
+
+    def test_trains_jobs_and_writes_artifacts(self, matrices, tmp_path):
+        """Cada trabajo retorna métricas y predicciones; los artefactos quedan en run_dir."""
+        # Arrange
+        X_train, y_train, X_val, y_val, features = matrices
+        jobs = ["Random Forest", SHAP_MODEL_NAME]
+
+        # Act
+        results = run_training_jobs(
+            str(tmp_path), X_train, y_train, X_val, y_val, features, jobs=jobs, n_jobs=1
+        )
+
+        # Assert
+        assert list(results) == jobs
+        assert results["Random Forest"]["artifact"] is None
+        assert len(results["Random Forest"]["val_preds"]) == len(y_val)
+        shap_model = joblib.load(tmp_path / results[SHAP_MODEL_NAME]["artifact"])
+        assert shap_model.n_estimators == shap_model.get_booster().num_boosted_rounds() <= 50
+        assert shap_model.get_params()["early_stopping_rounds"] is None
+        np.testing.assert_allclose(
+            shap_model.predict(X_val), results[SHAP_MODEL_NAME]["val_preds"], rtol=1e-6
+        )
+
+    def test_metrics_are_reported_on_test(self, matrices, tmp_path):
+        """Con test las métricas no usan validación, que ya eligió la mejor iteración."""
+        # Arrange
+        X_train, y_train, X_val, y_val, features = matrices
+        X_test, y_test = X_val[:30], y_val[:30]
+        jobs = [SHAP_MODEL_NAME, STACKING_MODEL_NAME]
+
+        # Act
+        results = run_training_jobs(
+            str(tmp_path),
+            X_train,
+            y_train,
+            X_val[30:],
+            y_val[30:],
+            features,
+            jobs,
+            n_jobs=1,
+            X_test=X_test,
+            y_test=y_test,
+        )
+
+        # Assert
+        for name in jobs:
+            model = joblib.load(tmp_path / results[name]["artifact"])
+            expected = evaluate_model(np.expm1(y_test), np.expm1(model.predict(X_test)), name)
+            assert results[name]["metrics"]["rmse"] == pytest.approx(expected["rmse"], rel=1e-5)
+            assert len(results[name]["val_preds"]) == len(y_val) - 30
+            assert results[name]["profile"]["predict"]["rows"] == len(y_test)
+
+    def test_metrics_include_profile(self, matrices, tmp_path):
+        """Las métricas incluyen tiempos, latencia de inferencia y tamaño del artefacto."""
+        # Arrange
+        X_train, y_train, X_val, y_val, features = matrices
+
+        # Act
+        results = run_training_jobs(
+            str(tmp_path), X_train, y_train, X_val, y_val, features, [STACKING_MODEL_NAME], n_jobs=1
+        )
+
+        # Assert
+        base, stacking = results["Random Forest"], results[STACKING_MODEL_NAME]
+        assert base["profile"]["fit"]["rows"] == len(X_train)
+        assert base["metrics"]["train_time"] == pytest.approx(base["fit_seconds"], abs=1e-3)
+        assert base["metrics"]["inference_ms_per_1k"] > 0
+        assert stacking["metrics"]["train_time"] > base["metrics"]["train_time"]
+        assert stacking["metrics"]["model_size_mb"] == pytest.approx(
+            os.path.getsize(tmp_path / "stacking_model.pkl") / 1024**2, abs=1e-3
+        )
+
+    def test_parallel_matches_serial(self, matrices, tmp_path, monkeypatch):
+        """Entrenar en procesos con hilos repartidos debe dar las mismas métricas."""
+        # Arrange
+        X_train, y_train, X_val, y_val, features = matrices
+        jobs = ["Random Forest", "XGBoost"]
+        monkeypatch.setattr(os, "cpu_count", lambda: 4)
+
+        # Act
+        serial = run_training_jobs(
+            str(tmp_path / "serial"), X_train, y_train, X_val, y_val, features, jobs, n_jobs=1
+        )
+        parallel = run_training_jobs(
+            str(tmp_path / "parallel"), X_train, y_train, X_val, y_val, features, jobs, n_jobs=2
+        )
+
+        # Assert
+        for name in jobs:
+            np.testing.assert_allclose(
+                parallel[name]["val_preds"], serial[name]["val_preds"], rtol=1e-6
+            )
+
+    def test_stacking_reuses_base_jobs(self, matrices, tmp_path):
+        """El Stacking agrega sus modelos base y reutiliza los ya entrenados."""
+        # Arrange
+        X_train, y_train, X_val, y_val, features = matrices
+
+        # Act
+        results = run_training_jobs(
+            str(tmp_path), X_train, y_train, X_val, y_val, features, [STACKING_MODEL_NAME], n_jobs=1
+        )
+
+        # Assert
+        assert list(results) == [STACKING_MODEL_NAME, "Random Forest", "XGBoost"]
+        stacking = joblib.load(tmp_path / results[STACKING_MODEL_NAME]["artifact"])
+        np.testing.assert_allclose(
+            stacking.estimators_[0].predict(X_val), results["Random Forest"]["val_preds"]
+        )
+        np.testing.assert_allclose(
+            stacking.predict(X_val), results[STACKING_MODEL_NAME]["val_preds"], rtol=1e-6
+        )
+        assert results[STACKING_MODEL_NAME]["metrics"]["model"] == STACKING_MODEL_NAME
+
+    def test_xgb_external_memory_matches_in_memory(self, matrices, tmp_path):
+        """Los modelos XGBoost entrenados desde chunks Parquet deben predecir igual."""
+        # Arrange
+        X_train, y_train, X_val, y_val, features = matrices
+        X_train, X_val = X_train.astype(np.float32), X_val.astype(np.float32)
+        jobs = ["XGBoost", SHAP_MODEL_NAME]
+
+        # Act
+        in_memory = run_training_jobs(
+            str(tmp_path / "memory"), X_train, y_train, X_val, y_val, features, jobs, n_jobs=1
+        )
+        external = run_training_jobs(
+            str(tmp_path / "external"),
+            X_train,
+            y_train,
+            X_val,
+            y_val,
+            features,
+            jobs,
+            n_jobs=1,
+            xgb_external_memory=True,
+        )
+
+        # Assert
+        assert (tmp_path / "external" / "train_chunks.parquet").exists()
+        for name in jobs:
+            np.testing.assert_allclose(
+                external[name]["val_preds"], in_memory[name]["val_preds"], atol=1e-5
+            )
+
+    def test_resumes_completed_stages(self, matrices, tmp_path, capsys):
+        """Al repetir la corrida sólo se entrenan los modelos sin marcador de completitud."""
+        # Arrange
+        X_train, y_train, X_val, y_val, features = matrices
+        jobs = ["Random Forest", SHAP_MODEL_NAME]
+        first = run_training_jobs(
+            str(tmp_path), X_train, y_train, X_val, y_val, features, jobs=jobs, n_jobs=1
+        )
+        os.remove(tmp_path / "xgboost_shap.done")
+        capsys.readouterr()
+
+        # Act
+        second = run_training_jobs(
+            str(tmp_path), X_train, y_train, X_val, y_val, features, jobs=jobs, n_jobs=1
+        )
+
+        # Assert
+        assert "reutilizados" in capsys.readouterr().out
+        assert second["Random Forest"]["fit_seconds"] == first["Random Forest"]["fit_seconds"]
+        np.testing.assert_allclose(
+            second["Random Forest"]["val_preds"], first["Random Forest"]["val_preds"]
+        )
+        assert completed_stage(str(tmp_path), SHAP_MODEL_NAME, ["xgb_simple_shap.pkl"])[0]
+
+    def test_promotion_requires_every_artifact(self, tmp_path):
+        """Si falta un artefacto no se mueve ninguno al directorio destino."""
+        # Arrange
+        run_dir, target = tmp_path / "run", tmp_path / "models"
+        run_dir.mkdir()
+        (run_dir / "stacking_model.pkl").write_bytes(b"model")
+
+        # Act
+        with pytest.raises(FileNotFoundError, match="metrics.json"):
+            promote_run(str(run_dir), ["stacking_model.pkl", "metrics.json"], str(target))
+
+        # Assert
+        assert (run_dir / "stacking_model.pkl").exists()
+        assert not target.exists()
+
+    def test_unknown_job_raises_error(self, matrices, tmp_path):
+        """Un modelo desconocido debe lanzar ValueError."""
+        X_train, y_train, X_val, y_val, features = matrices
+        with pytest.raises(ValueError, match="desconocidos"):
+            run_training_jobs(str(tmp_path), X_train, y_train, X_val, y_val, features, jobs=["SVM"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,133 @@
+"""
+Tests para src/pipeline.py
+"""
+
+import pytest
+import pandas as pd
+import src.pipeline as pipeline_module
+from src.pipeline import Stage, StagePipeline
+
+
+class TestStagePipeline:
+    """Tests para el ejecutor de etapas con caché."""
+
+    @pytest.fixture
+    def calls(self):
+        """Registro de ejecuciones reales de cada etapa."""
+        return []
+
+    @pytest.fixture
+    def make_pipeline(self, tmp_path, calls):
+        """Fábrica de pipelines source → double → add con caché en tmp_path."""
+
+        def _make(offset: int = 1, source_version: str = "v1") -> StagePipeline:
+            def source(version):
+                calls.append("source")
+                return pd.DataFrame({"x": [1, 2, 3]})
+
+            def double(df):
+                calls.append("double")
+                return df.assign(x=df["x"] * 2)
+
+            def add(df, offset):
+                calls.append("add")
+                return df.assign(x=df["x"] + offset)
+
+            pipeline = StagePipeline(cache_dir=str(tmp_path))
+            pipeline.add(Stage("source", source, params={"version": source_version}))
+            pipeline.add(Stage("double", double, ["source"]))
+            pipeline.add(Stage("add", add, ["double"], {"offset": offset}))
+            return pipeline
+
+        return _make
+
+    def test_computes_result(self, make_pipeline):
+        """Debe encadenar las etapas en orden."""
+        # Act
+        result = make_pipeline(offset=1).get("add")
+
+        # Assert
+        assert result["x"].tolist() == [3, 5, 7]
+
+    def test_reuses_cached_stages(self, make_pipeline, calls):
+        """Una segunda ejecución con los mismos parámetros no recalcula nada."""
+        # Arrange
+        make_pipeline().get("add")
+        calls.clear()
+
+        # Act
+        pipeline = make_pipeline()
+        result = pipeline.get("add")
+
+        # Assert
+        assert calls == []
+        assert pipeline.reused == ["add"]
+        assert result["x"].tolist() == [3, 5, 7]
+
+    def test_profiles_executed_and_cached_stages(self, make_pipeline):
+        """El perfil registra filas y tiempos de las etapas ejecutadas y leídas del caché."""
+        # Arrange
+        make_pipeline(offset=1).get("add")
+
+        # Act
+        pipeline = make_pipeline(offset=2)
+        pipeline.get("add")
+
+        # Assert
+        stages = {entry["stage"]: entry for entry in pipeline.profile}
+        assert list(stages) == ["double", "add"]
+        assert stages["double"]["cached"] and not stages["add"]["cached"]
+        assert all(entry["rows"] == 3 and entry["wall_s"] >= 0 for entry in stages.values())
+
+    def test_param_change_recomputes_only_downstream(self, make_pipeline, calls):
+        """Cambiar un parámetro sólo recalcula la etapa afectada."""
+        # Arrange
+        make_pipeline(offset=1).get("add")
+        calls.clear()
+
+        # Act
+        pipeline = make_pipeline(offset=10)
+        result = pipeline.get("add")
+
+        # Assert
+        assert calls == ["add"]
+        assert pipeline.executed == ["add"]
+        assert result["x"].tolist() == [12, 14, 16]
+
+    def test_upstream_change_invalidates_all(self, make_pipeline, calls):
+        """Cambiar la huella de la raíz invalida todas las etapas posteriores."""
+        # Arrange
+        make_pipeline(source_version="v1").get("add")
+        calls.clear()
+
+        # Act
+        make_pipeline(source_version="v2").get("add")
+
+        # Assert
+        assert calls == ["source", "double", "add"]
+
+    def test_source_change_invalidates_all(self, make_pipeline, calls, monkeypatch):
+        """Cambiar el código de las etapas invalida el caché aunque no cambie la versión."""
+        # Arrange
+        make_pipeline().get("add")
+        calls.clear()
+        monkeypatch.setattr(pipeline_module, "_source_fingerprint", lambda: "otro-codigo")
+
+        # Act
+        make_pipeline().get("add")
+
+        # Assert
+        assert calls == ["source", "double", "add"]
+
+    def test_unregistered_input_raises_error(self, tmp_path):
+        """Registrar una etapa con entradas inexistentes debe lanzar ValueError."""
+        # Arrange
+        pipeline = StagePipeline(cache_dir=str(tmp_path))
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="no registradas"):
+            pipeline.add(Stage("add", lambda df: df, ["missing"]))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
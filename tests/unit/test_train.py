@@ -0,0 +1,381 @@
+"""
+Tests para src/train.py
+"""
+
+import json
+import pickle
+import subprocess
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.tree import DecisionTreeRegressor
+from xgboost import XGBRegressor
+
+import src.train as train_module
+from src.data_processing import build_item_price_max, get_model_features
+from src.orchestrator import SHAP_MODEL_NAME
+from src.train import (
+    PRODUCTION_MODELS,
+    KerasRegressor,
+    TimeSeriesStackingRegressor,
+    build_mlp_model,
+    make_tf_dataset,
+    merge_metrics,
+    resolve_model_jobs,
+    time_series_oof_predictions,
+)
+
+
+class TestTimeSeriesStacking:
+    """Tests para el Stacking con predicciones OOF temporales."""
+
+    @pytest.fixture
+    def data(self):
+        """Datos sintéticos ordenados en el tiempo."""
+        rng = np.random.default_rng(3)
+        X = rng.normal(size=(240, 4))
+        y = 2 * X[:, 0] - X[:, 1] + rng.normal(scale=0.1, size=240)
+        return X, y
+
+    @pytest.fixture
+    def estimators(self):
+        """Modelos base deterministas."""
+        return [
+            ("tree", DecisionTreeRegressor(max_depth=4, random_state=0)),
+            ("linear", LinearRegression()),
+        ]
+
+    def test_oof_predictions_only_use_past_rows(self, data, estimators):
+        """El primer bloque no tiene predicción OOF; el resto sí."""
+        # Arrange
+        X, y = data
+
+        # Act
+        predictions, mask = time_series_oof_predictions(estimators, X, y, n_splits=5)
+
+        # Assert
+        assert predictions.shape == (240, 2)
+        assert not mask[:40].any() and mask[40:].all()
+        assert np.isnan(predictions[~mask]).all()
+        assert np.isfinite(predictions[mask]).all()
+
+    def test_oof_predictions_are_cached(self, data, estimators, tmp_path, capsys):
+        """La segunda llamada con los mismos datos y modelos lee el caché."""
+        # Arrange
+        X, y = data
+        first = time_series_oof_predictions(estimators, X, y, cache_dir=str(tmp_path))
+
+        # Act
+        second = time_series_oof_predictions(estimators, X, y, cache_dir=str(tmp_path))
+
+        # Assert
+        assert "caché" in capsys.readouterr().out
+        np.testing.assert_array_equal(first[0], second[0])
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_oof_folds_follow_months_not_row_order(self):
+        """Con el mes de cada fila, toda predicción OOF sale de modelos de meses anteriores."""
+
+        class LastMonthSeen(BaseEstimator, RegressorMixin):
+            """Predice el último mes (columna 0) visto en el entrenamiento."""
+
+            def fit(self, X, y, sample_weight=None):
+                self.last_month_ = X[:, 0].max()
+                return self
+
+            def predict(self, X):
+                return np.full(len(X), self.last_month_)
+
+        # Arrange: filas barajadas, como las del train balanceado con filas sintéticas al final
+        rng = np.random.default_rng(0)
+        months = rng.permutation(np.repeat(np.arange(10), 30))
+        X = np.column_stack([months, rng.normal(size=len(months))])
+
+        # Act
+        predictions, mask = time_series_oof_predictions(
+            [("last", LastMonthSeen())], X, X[:, 1], n_splits=4, groups=months
+        )
+
+        # Assert
+        assert mask.any()
+        assert (predictions[mask, 0] < months[mask]).all()
+        assert not mask[months < months[mask].min()].any()
+
+    def test_oof_xgboost_uses_early_stopping(self, data, tmp_path):
+        """Con eval_set cada fold de XGBoost se detiene en su mejor iteración."""
+        # Arrange
+        X, y = data
+        X_val, y_val = X[-40:] + 0.5, y[-40:]
+        xgb = XGBRegressor(n_estimators=300, learning_rate=0.5, early_stopping_rounds=3)
+        train_idx, test_idx = list(TimeSeriesSplit(n_splits=5).split(X))[-1]
+        expected = xgb.fit(X[train_idx], y[train_idx], eval_set=[(X_val, y_val)], verbose=False)
+
+        # Act
+        predictions, _ = time_series_oof_predictions(
+            [("xgb", xgb)], X, y, cache_dir=str(tmp_path), eval_set=(X_val, y_val)
+        )
+        time_series_oof_predictions(
+            [("xgb", xgb)], X, y, cache_dir=str(tmp_path), eval_set=(X_val, y_val + 1)
+        )
+
+        # Assert
+        assert expected.best_iteration < 299
+        np.testing.assert_allclose(predictions[test_idx, 0], expected.predict(X[test_idx]))
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_reuses_fitted_estimators(self, data, estimators):
+        """Con set_fitted_estimators el Stacking predice con los modelos ya entrenados."""
+        # Arrange
+        X, y = data
+        fitted = [LinearRegression().fit(X, y), LinearRegression().fit(X, y)]
+        stacking = TimeSeriesStackingRegressor(estimators).fit_final_estimator(X, y)
+
+        # Act
+        stacking.set_fitted_estimators(fitted)
+
+        # Assert
+        assert stacking.estimators_[0] is fitted[0]
+        assert stacking.named_estimators_["linear"] is fitted[1]
+        expected = stacking.final_estimator_.predict(np.column_stack([fitted[0].predict(X)] * 2))
+        np.testing.assert_allclose(stacking.predict(X), expected)
+
+    def test_fit_is_pickle_compatible(self, data, estimators):
+        """El Stacking entrenado con fit se serializa y predice igual."""
+        # Arrange
+        X, y = data
+        stacking = TimeSeriesStackingRegressor(estimators).fit(X, y)
+
+        # Act
+        restored = pickle.loads(pickle.dumps(stacking))
+
+        # Assert
+        np.testing.assert_allclose(restored.predict(X), stacking.predict(X))
+
+
+class TestKerasTraining:
+    """Tests para el pipeline tf.data y el early stopping por validación de Keras."""
+
+    def test_dataset_batches_cover_all_rows(self):
+        """El barajado por índices debe entregar cada fila una vez por época."""
+        # Arrange
+        X = np.arange(10, dtype=np.float32).reshape(-1, 1)
+        y = np.arange(10, dtype=np.float32)
+
+        # Act
+        batches = list(make_tf_dataset(X, y, batch_size=4))
+
+        # Assert
+        assert [len(batch_y) for _, batch_y in batches] == [4, 4, 2]
+        seen = np.concatenate([batch_y.numpy() for _, batch_y in batches])
+        assert sorted(seen) == list(range(10))
+        np.testing.assert_array_equal(
+            np.concatenate([batch_X.numpy()[:, 0] for batch_X, _ in batches]), seen
+        )
+
+    def test_fit_with_validation_data(self):
+        """Con validation_data el modelo se entrena y predice una fila por muestra."""
+        # Arrange
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(300, 5))
+        y = X[:, 0] * 2
+        model = KerasRegressor(build_mlp_model, epochs=3, patience=1)
+
+        # Act
+        model.fit(X[:240], y[:240], validation_data=(X[240:], y[240:]))
+
+        # Assert
+        assert 1 <= model.epochs_trained_ <= 3
+        assert model.predict(X[240:]).shape == (60,)
+
+
+class TestModelSelection:
+    """Tests para el entrenamiento de un subconjunto de modelos."""
+
+    def test_resolves_keys_and_names(self):
+        """Las claves cortas y los nombres completos se traducen a trabajos sin repetir."""
+        # Act
+        jobs = resolve_model_jobs(PRODUCTION_MODELS + ["Stacking Ensemble"])
+
+        # Assert
+        assert jobs == ["Stacking Ensemble", SHAP_MODEL_NAME]
+        assert resolve_model_jobs(None) is None
+
+    @pytest.mark.parametrize("models", [[], ["stacking", "svm"]])
+    def test_invalid_subset_raises_error(self, models):
+        """Un subconjunto vacío o con modelos desconocidos debe lanzar ValueError."""
+        with pytest.raises(ValueError):
+            resolve_model_jobs(models)
+
+    def test_merge_keeps_metrics_of_untrained_models(self, tmp_path):
+        """Los modelos no reentrenados conservan sus métricas en metrics.json."""
+        # Arrange
+        metrics_path = tmp_path / "metrics.json"
+        previous = [
+            {"model": "MLP", "r2": 0.5},
+            {"model": "Stacking Ensemble", "r2": 0.7},
+        ]
+        metrics_path.write_text(json.dumps(previous))
+
+        # Act
+        merged = merge_metrics(
+            str(metrics_path), {"Stacking Ensemble": {"model": "Stacking Ensemble", "r2": 0.8}}
+        )
+
+        # Assert
+        assert merged == [{"model": "MLP", "r2": 0.5}, {"model": "Stacking Ensemble", "r2": 0.8}]
+
+    def test_production_subset_skips_tensorflow(self, tmp_path):
+        """Entrenar Stacking y XGBoost SHAP no importa TensorFlow ni ajusta el scaler."""
+        # Arrange: proceso nuevo, para que otros tests no hayan cargado TensorFlow
+        code = (
+            "import sys, numpy as np\n"
+            "from src.data_processing import get_model_features\n"
+            "from src.orchestrator import run_training_jobs\n"
+            "from src.train import PRODUCTION_MODELS, resolve_model_jobs\n"
+            "features = get_model_features([3, 6])\n"
+            "X = np.random.default_rng(0).normal(size=(200, len(features)))\n"
+            "y = np.abs(X[:, 0])\n"
+            f"run_training_jobs({str(tmp_path)!r}, X[:160], y[:160], X[160:], y[160:], "
+            "features, resolve_model_jobs(PRODUCTION_MODELS), n_jobs=1)\n"
+            "print('tensorflow' in sys.modules)\n"
+        )
+
+        # Act
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+
+        # Assert
+        assert output.strip().splitlines()[-1] == "False"
+        assert not (tmp_path / "scaler.pkl").exists()
+        assert (tmp_path / "stacking_model.pkl").exists()
+
+    def test_subset_with_new_features_is_rejected(self, tmp_path, monkeypatch):
+        """Un subconjunto no puede cambiar las features con las que se entrenó el resto."""
+        # Arrange
+        joblib.dump(get_model_features([3, 6]), tmp_path / "features.pkl")
+        monkeypatch.setattr(train_module, "MODELS_DIR", str(tmp_path))
+
+        def fail_pipeline(*args, **kwargs):
+            raise AssertionError("no debe procesar datos")
+
+        monkeypatch.setattr(train_module, "prepare_full_pipeline", fail_pipeline)
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="features"):
+            train_module.train_models(rolling_windows=[2, 4], models=PRODUCTION_MODELS)
+        train_module.check_subset_features(
+            resolve_model_jobs(PRODUCTION_MODELS), get_model_features([3, 6])
+        )
+        train_module.check_subset_features(None, get_model_features([2, 4]))
+
+    def test_defaults_train_sequentially_without_caches(self, tmp_path, monkeypatch):
+        """train_models() sin opciones no abre procesos ni escribe cachés de etapas u OOF."""
+        # Arrange
+        split = TestPriceMetadata._split
+        calls = {}
+
+        def fake_pipeline(**kwargs):
+            calls["pipeline"] = kwargs
+            return split(200), split(40), split(40), None
+
+        def stop_training(*args, **kwargs):
+            calls["jobs"] = kwargs
+            raise RuntimeError("sólo se verifican los parámetros")
+
+        monkeypatch.setattr(train_module, "prepare_full_pipeline", fake_pipeline)
+        monkeypatch.setattr(train_module, "run_training_jobs", stop_training)
+        monkeypatch.setattr(train_module, "RUNS_DIR", str(tmp_path))
+
+        # Act
+        with pytest.raises(RuntimeError):
+            train_module.train_models(rolling_windows=[3, 6])
+
+        # Assert
+        assert calls["pipeline"]["cache_stages"] is False
+        assert calls["pipeline"]["n_jobs"] == 1 and calls["pipeline"]["features"] is None
+        assert calls["jobs"]["n_jobs"] == 1 and calls["jobs"]["oof_cache_dir"] is None
+
+
+class TestPriceMetadata:
+    """Tests para los metadatos de precios que usa la inferencia."""
+
+    @staticmethod
+    def _split(n_rows: int, item_offset: int = 0) -> pd.DataFrame:
+        """Split sintético con todas las features del modelo."""
+        rng = np.random.default_rng(n_rows)
+        frame = pd.DataFrame(0.0, index=range(n_rows), columns=get_model_features([3, 6]))
+        frame["item_id"] = np.arange(n_rows) % 20 + item_offset
+        frame["item_category_id"] = frame["item_id"] % 4
+        frame["date_block_num"] = np.arange(n_rows) * 10 // n_rows
+        frame["item_price"] = rng.uniform(100, 500, n_rows)
+        frame["target_log"] = rng.uniform(0, 2, n_rows)
+        return frame
+
+    def test_smote_rows_do_not_change_price_metadata(self, tmp_path, monkeypatch):
+        """item_price_max y category_prices salen del train sin las filas sintéticas."""
+        # Arrange
+        train, val, test = self._split(200), self._split(40), self._split(40)
+        synthetic = self._split(60).assign(item_id=7.6, item_price=99_999.0)
+        balanced = pd.concat([train, synthetic], ignore_index=True)
+
+        def fake_pipeline(use_balancing=False, **kwargs):
+            return balanced if use_balancing else train, val, test, None
+
+        def stop_training(*args, **kwargs):
+            raise RuntimeError("sólo se verifican los metadatos")
+
+        monkeypatch.setattr(train_module, "prepare_full_pipeline", fake_pipeline)
+        monkeypatch.setattr(train_module, "run_training_jobs", stop_training)
+        monkeypatch.setattr(train_module, "RUNS_DIR", str(tmp_path))
+
+        # Act
+        with pytest.raises(RuntimeError):
+            train_module.train_models(use_balancing=True, rolling_windows=[3, 6], cache_stages=True)
+
+        # Assert
+        (run_dir,) = tmp_path.iterdir()
+        expected = build_item_price_max(pd.concat([train, val, test])).to_dict()
+        assert joblib.load(run_dir / "item_price_max.pkl") == expected
+        category_prices = joblib.load(run_dir / "category_prices.pkl")
+        assert category_prices == train.groupby("item_category_id")["item_price"].median().to_dict()
+
+
+class TestRunStaging:
+    """Tests para el staging de corridas en models/.runs."""
+
+    def test_fresh_run_keeps_other_runs_staging(self, tmp_path, monkeypatch):
+        """Sin resume sólo se descarta el staging de la misma corrida."""
+        # Arrange
+        split = TestPriceMetadata._split
+        other_run = tmp_path / "otra_corrida"
+        other_run.mkdir()
+        (other_run / "matrices.done").write_bytes(b"")
+
+        def fake_pipeline(use_balancing=False, **kwargs):
+            return split(200), split(40), split(40), None
+
+        def stop_training(*args, **kwargs):
+            raise RuntimeError("sólo se verifica el staging")
+
+        monkeypatch.setattr(train_module, "prepare_full_pipeline", fake_pipeline)
+        monkeypatch.setattr(train_module, "run_training_jobs", stop_training)
+        monkeypatch.setattr(train_module, "RUNS_DIR", str(tmp_path))
+
+        # Act
+        with pytest.raises(RuntimeError):
+            train_module.train_models(rolling_windows=[3, 6])
+
+        # Assert
+        assert (other_run / "matrices.done").exists()
+        assert len(list(tmp_path.iterdir())) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,111 @@
+"""
+Tests para src/tuning.py
+"""
+
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from src.data_processing import get_model_features
+from src.train import build_estimator, load_hyperparams, tree_params
+from src.tuning import SEARCH_SPACES, sample_candidates, tune_hyperparams
+
+
+class TestSampleCandidates:
+    """Tests para el muestreo de candidatos alrededor de la semilla."""
+
+    def test_seed_first_and_distinct(self):
+        """La configuración semilla va primero y no hay candidatos repetidos."""
+        # Arrange
+        seed = tree_params("XGBoost")
+
+        # Act
+        candidates = sample_candidates("XGBoost", seed, n_candidates=12)
+
+        # Assert
+        assert candidates[0] == seed
+        assert len({json.dumps(c, sort_keys=True) for c in candidates}) == 12
+        for candidate in candidates[1:]:
+            for key, values in SEARCH_SPACES["XGBoost"].items():
+                assert candidate[key] in values
+
+    def test_seed_from_grid_stops_at_grid_size(self):
+        """Con una semilla de la grilla no hay más candidatos que combinaciones (sin colgarse)."""
+        # Arrange
+        space = SEARCH_SPACES["Random Forest"]
+        seed = {**tree_params("Random Forest"), **{key: values[0] for key, values in space.items()}}
+        n_combinations = len(list(itertools.product(*space.values())))
+
+        # Act
+        candidates = sample_candidates("Random Forest", seed, n_candidates=n_combinations + 1)
+
+        # Assert
+        assert candidates[0] == seed
+        assert len(candidates) == n_combinations
+        assert len({json.dumps(c, sort_keys=True) for c in candidates}) == n_combinations
+
+
+class TestTreeParams:
+    """Tests para la lectura de hiperparámetros desde JSON."""
+
+    def test_ignores_unknown_keys_and_monotone_constraints(self):
+        """Las claves inválidas y las restricciones del notebook no pasan al estimador."""
+        # Arrange
+        hyperparams = {"XGBoost": {"max_depth": 4, "monotone_constraints": "(1)", "cv": 5}}
+
+        # Act
+        params = tree_params("XGBoost", hyperparams)
+
+        # Assert
+        assert params["max_depth"] == 4
+        assert "cv" not in params and "monotone_constraints" not in params
+
+
+class TestTuneHyperparams:
+    """Tests para la búsqueda por successive halving."""
+
+    @pytest.fixture
+    def matrices(self):
+        """Matrices sintéticas de entrenamiento y validación."""
+        rng = np.random.default_rng(2)
+        features = get_model_features([3, 6])
+        X = rng.normal(size=(900, len(features))).astype(np.float32)
+        y = np.log1p(np.abs(X[:, 0]) * 3 + X[:, 1] ** 2)
+        return {"X_train": X[:720], "y_train": y[:720], "X_val": X[720:], "y_val": y[720:]}
+
+    def test_writes_winner_in_same_json_format(self, matrices, tmp_path):
+        """El ganador se escribe conservando las claves existentes y train lo consume."""
+        # Arrange
+        seed_path = tmp_path / "hyperparams_xgboost.json"
+        seed_path.write_text(json.dumps({"n_estimators": 30, "monotone_constraints": "(0)"}))
+
+        # Act
+        results = tune_hyperparams(
+            models=["XGBoost"],
+            n_candidates=9,
+            n_jobs=1,
+            exports_dir=str(tmp_path),
+            matrices=matrices,
+        )
+
+        # Assert
+        saved = json.loads(seed_path.read_text())
+        assert saved["monotone_constraints"] == "(0)"
+        assert {k: saved[k] for k in results["XGBoost"]["params"]} == results["XGBoost"]["params"]
+        assert [round["candidates"] for round in results["XGBoost"]["history"]] == [9, 3, 1]
+        estimator = build_estimator(
+            "XGBoost", get_model_features([3, 6]), load_hyperparams(str(tmp_path))
+        )
+        assert estimator.get_params()["max_depth"] == saved["max_depth"]
+        assert estimator.get_params()["n_estimators"] == 30
+
+    def test_unknown_model_raises_error(self, matrices, tmp_path):
+        """Un modelo sin espacio de búsqueda debe lanzar ValueError."""
+        with pytest.raises(ValueError, match="espacio de búsqueda"):
+            tune_hyperparams(models=["MLP"], exports_dir=str(tmp_path), matrices=matrices)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
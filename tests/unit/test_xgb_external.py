@@ -0,0 +1,123 @@
+"""
+Tests para src/xgb_external.py
+"""
+
+import pickle
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from src.data_processing import get_model_features
+from src.train import build_estimator
+from src.xgb_external import (
+    ParquetChunkIter,
+    fit_xgb_external,
+    truncate_to_best_iteration,
+    write_feature_chunks,
+)
+
+
+class TestXgbExternalMemory:
+    """Tests para el entrenamiento de XGBoost sobre chunks Parquet."""
+
+    @pytest.fixture
+    def data(self):
+        """Matriz sintética con relación decreciente respecto al precio."""
+        rng = np.random.default_rng(11)
+        features = get_model_features([3, 6])
+        X = rng.normal(size=(3000, len(features)))
+        price = X[:, features.index("item_price_log")]
+        y = np.log1p(np.abs(X[:, 0]) * 3 + np.exp(-price))
+        weights = rng.uniform(0.5, 2.0, len(y))
+        return X, y, weights, features
+
+    def test_writes_one_row_group_per_chunk(self, data, tmp_path):
+        """Cada chunk debe quedar como un row group con features en float32."""
+        # Arrange
+        X, y, weights, features = data
+        path = str(tmp_path / "chunks.parquet")
+
+        # Act
+        write_feature_chunks(X, y, features, path, weights, chunk_rows=1000)
+
+        # Assert
+        parquet = pq.ParquetFile(path)
+        assert parquet.num_row_groups == 3
+        assert str(parquet.schema_arrow.field(features[0]).type) == "float"
+        assert ParquetChunkIter(path, features)._has_weight
+
+    def test_matches_in_memory_training(self, data, tmp_path):
+        """El modelo de memoria externa debe predecir igual que el entrenado en memoria."""
+        # Arrange
+        X, y, weights, features = data
+        path = str(tmp_path / "chunks.parquet")
+        write_feature_chunks(X, y, features, path, weights, chunk_rows=1000)
+        X32 = X.astype(np.float32)
+        in_memory = build_estimator("XGBoost", features).fit(
+            X32, y.astype(np.float32), sample_weight=weights.astype(np.float32)
+        )
+
+        # Act
+        external = fit_xgb_external(
+            build_estimator("XGBoost", features), path, features, str(tmp_path / "cache")
+        )
+
+        # Assert
+        np.testing.assert_allclose(external.predict(X32), in_memory.predict(X32), atol=1e-5)
+        restored = pickle.loads(pickle.dumps(external))
+        np.testing.assert_allclose(restored.predict(X32), external.predict(X32))
+
+    def test_preserves_monotone_constraints(self, data, tmp_path):
+        """A mayor precio la predicción no debe aumentar."""
+        # Arrange
+        X, y, _, features = data
+        path = str(tmp_path / "chunks.parquet")
+        write_feature_chunks(X, y, features, path, chunk_rows=1000)
+        model = fit_xgb_external(
+            build_estimator("XGBoost", features), path, features, str(tmp_path / "cache")
+        )
+        grid = np.repeat(X[:1], 50, axis=0).astype(np.float32)
+        grid[:, features.index("item_price_log")] = np.linspace(-3, 3, 50)
+
+        # Act
+        preds = model.predict(grid)
+
+        # Assert
+        assert (np.diff(preds) <= 1e-6).all()
+
+    def test_early_stopping_truncates_to_best_iteration(self, data, tmp_path):
+        """Con eval_set se conservan sólo los árboles hasta la mejor iteración."""
+        # Arrange
+        X, y, _, features = data
+        path = str(tmp_path / "chunks.parquet")
+        write_feature_chunks(X[:2000], y[:2000], features, path, chunk_rows=1000)
+        estimator = build_estimator("XGBoost", features).set_params(
+            n_estimators=400, learning_rate=0.5, early_stopping_rounds=5
+        )
+        in_memory = build_estimator("XGBoost", features).set_params(
+            n_estimators=400, learning_rate=0.5, early_stopping_rounds=5
+        )
+        in_memory.fit(
+            X[:2000].astype(np.float32),
+            y[:2000].astype(np.float32),
+            eval_set=[(X[2000:], y[2000:])],
+            verbose=False,
+        )
+
+        # Act
+        external = fit_xgb_external(
+            estimator, path, features, str(tmp_path / "cache"), eval_set=(X[2000:], y[2000:])
+        )
+        truncated = truncate_to_best_iteration(in_memory)
+
+        # Assert
+        for model in (external, truncated):
+            assert model.n_estimators == model.get_booster().num_boosted_rounds() < 400
+            assert model.get_params()["early_stopping_rounds"] is None
+        np.testing.assert_allclose(truncated.predict(X), in_memory.predict(X), atol=1e-6)
+        np.testing.assert_allclose(external.predict(X), truncated.predict(X), atol=1e-5)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])